@@ -0,0 +1,98 @@
+"""
+Local airport distance index for multi-origin searches.
+
+A request with "originRadiusKm" searches from every airport within that many
+kilometres of its origin, e.g. EMA with 100 km adds BHX and MAN. No lookup
+service is involved: the airports below (UK, Ireland and the Channel Islands,
+where searches start) are kept sorted by latitude. A radius query bisects to
+the latitude band that can be in range and measures great-circle distance
+only for the airports inside it.
+"""
+import math
+from bisect import bisect_left, bisect_right
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+# IATA code -> (name, latitude, longitude)
+AIRPORTS = {
+    "ABZ": ("Aberdeen", 57.2019, -2.1978),
+    "BFS": ("Belfast International", 54.6575, -6.2158),
+    "BHD": ("Belfast City", 54.6181, -5.8725),
+    "BHX": ("Birmingham", 52.4539, -1.7480),
+    "BOH": ("Bournemouth", 50.7800, -1.8425),
+    "BRS": ("Bristol", 51.3827, -2.7191),
+    "CWL": ("Cardiff", 51.3967, -3.3433),
+    "DUB": ("Dublin", 53.4213, -6.2701),
+    "EDI": ("Edinburgh", 55.9500, -3.3725),
+    "EMA": ("East Midlands", 52.8311, -1.3281),
+    "EXT": ("Exeter", 50.7344, -3.4139),
+    "GCI": ("Guernsey", 49.4350, -2.6020),
+    "GLA": ("Glasgow", 55.8719, -4.4331),
+    "HUY": ("Humberside", 53.5744, -0.3508),
+    "INV": ("Inverness", 57.5425, -4.0475),
+    "IOM": ("Isle of Man", 54.0833, -4.6239),
+    "JER": ("Jersey", 49.2079, -2.1955),
+    "LBA": ("Leeds Bradford", 53.8659, -1.6606),
+    "LCY": ("London City", 51.5048, 0.0495),
+    "LGW": ("London Gatwick", 51.1537, -0.1821),
+    "LHR": ("London Heathrow", 51.4700, -0.4543),
+    "LPL": ("Liverpool", 53.3336, -2.8497),
+    "LTN": ("London Luton", 51.8747, -0.3683),
+    "MAN": ("Manchester", 53.3537, -2.2750),
+    "MME": ("Teesside", 54.5092, -1.4294),
+    "NCL": ("Newcastle", 55.0375, -1.6917),
+    "NQY": ("Newquay", 50.4406, -4.9954),
+    "NWI": ("Norwich", 52.6758, 1.2828),
+    "ORK": ("Cork", 51.8413, -8.4911),
+    "PIK": ("Glasgow Prestwick", 55.5094, -4.5867),
+    "SEN": ("London Southend", 51.5703, 0.6933),
+    "SNN": ("Shannon", 52.7020, -8.9248),
+    "SOU": ("Southampton", 50.9503, -1.3568),
+    "STN": ("London Stansted", 51.8860, 0.2389),
+}
+
+
+def distance_km(lat1, lon1, lat2, lon2) -> float:
+    """Great-circle (haversine) distance in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class AirportIndex:
+    def __init__(self, airports=None):
+        airports = AIRPORTS if airports is None else airports
+        self.airports = {code.upper(): entry for code, entry in airports.items()}
+        rows = sorted((lat, lon, code) for code, (_, lat, lon) in self.airports.items())
+        self._lats = [lat for lat, _, _ in rows]
+        self._rows = rows
+
+    def __contains__(self, code):
+        return (code or "").upper() in self.airports
+
+    def nearby(self, code, radius_km) -> list:
+        """
+        (code, km) for every airport within radius_km of `code`, nearest first,
+        starting with `code` itself at 0 km. Unknown codes only match themselves.
+        """
+        code = (code or "").upper()
+        if code not in self.airports:
+            return [(code, 0.0)]
+        _, lat, lon = self.airports[code]
+        band = radius_km / KM_PER_DEGREE_LAT
+        lo, hi = bisect_left(self._lats, lat - band), bisect_right(self._lats, lat + band)
+        found = []
+        for other_lat, other_lon, other in self._rows[lo:hi]:
+            km = 0.0 if other == code else distance_km(lat, lon, other_lat, other_lon)
+            if km <= radius_km:
+                found.append((other, km))
+        return sorted(found, key=lambda x: (x[1], x[0]))
+
+
+_index = AirportIndex()
+
+
+def get_index() -> AirportIndex:
+    return _index
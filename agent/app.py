@@ -1,18 +1,46 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import re
-import requests
 from dotenv import load_dotenv
 
+try:
+    from providers import breakers, cache, quota, sessions
+    from providers.cache import cached
+    from singleflight import SingleFlight, body_key
+    from hedging import MODES as SEARCH_MODES, run_hedged
+    from hotel_attributes import AttributeIndex
+except ImportError:
+    # Imported as agent.app (e.g. via wsgi.py)
+    from agent.providers import breakers, cache, quota, sessions
+    from agent.providers.cache import cached
+    from agent.singleflight import SingleFlight, body_key
+    from agent.hedging import MODES as SEARCH_MODES, run_hedged
+    from agent.hotel_attributes import AttributeIndex
+
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
 
+# Expired provider results would otherwise stay in the L2 file forever
+cache.purge_expired()
+
+# Identical concurrent search bodies share one computation (see /api/diagnostics)
+coalescer = SingleFlight()
+
+# Real-time flight search: per-call HTTP timeout and fallback chain strategy.
+# FLIGHT_SEARCH_MODE is sequential, hedged or race; requests may override it
+# with "searchMode" / "hedgeDelay" in the body.
+REALTIME_TIMEOUT = float(os.getenv('REALTIME_SEARCH_TIMEOUT', '20'))
+FLIGHT_SEARCH_MODE = os.getenv('FLIGHT_SEARCH_MODE', 'sequential')
+FLIGHT_HEDGE_DELAY = float(os.getenv('FLIGHT_HEDGE_DELAY', '3'))
+realtime_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='realtime')
+
 # Import configuration
 try:
     from config import RAPIDAPI_KEY, RAPIDAPI_HOSTS
@@ -28,6 +56,13 @@ except ImportError:
         'flights_sky': 'flights-sky.p.rapidapi.com'
     }
 
+# Host behind each real-time search in the fallback chain, for its circuit breaker
+REALTIME_HOSTS = {
+    'Google Flights': RAPIDAPI_HOSTS['google_flights'],
+    'Flights Sky': RAPIDAPI_HOSTS['flights_sky'],
+    'Booking.com Tipsters': RAPIDAPI_HOSTS['booking_com_tipsters'],
+}
+
 def get_mock_flight_data(origin, destination, date, adults=1):
     """Generate mock flight data for demo mode"""
     return [
@@ -152,14 +187,24 @@ def get_rapidapi_headers(service):
         'X-RapidAPI-Host': RAPIDAPI_HOSTS.get(service, 'google-flights2.p.rapidapi.com')
     }
 
+def _flight_search_key(origin, destination, date, adults=1, currency='GBP'):
+    """Cache key fields shared by the real-time flight search functions"""
+    return {'origin': origin, 'destination': destination, 'date': date,
+            'adults': adults, 'currency': currency}
+
 def search_flights_realtime(origin, destination, date, adults=1, currency='GBP'):
     """Search for real-time flights using RapidAPI"""
+    # Check if we have valid API credentials
+    if not get_rapidapi_headers('google_flights'):
+        print("⚠️ Demo mode: Returning mock flight data")
+        return get_mock_flight_data(origin, destination, date, adults)
+    return search_google_flights_api(origin, destination, date, adults, currency)
+
+@cached("google_flights_api", key=_flight_search_key)
+def search_google_flights_api(origin, destination, date, adults=1, currency='GBP'):
+    """Call the Google Flights RapidAPI search (demo mode is handled by the caller)"""
     try:
-        # Check if we have valid API credentials
         headers = get_rapidapi_headers('google_flights')
-        if not headers:
-            print("⚠️ Demo mode: Returning mock flight data")
-            return get_mock_flight_data(origin, destination, date, adults)
         
         # Convert date to proper format for Google Flights API
         try:
@@ -190,10 +235,11 @@ def search_flights_realtime(origin, destination, date, adults=1, currency='GBP')
         
         print(f"🔍 Google Flights API request: {google_params}")
         
-        google_response = requests.get(
+        google_response = sessions.get(
             google_url, 
             headers=headers,
-            params=google_params
+            params=google_params,
+            timeout=REALTIME_TIMEOUT
         )
         
         if google_response.status_code == 200:
@@ -208,6 +254,7 @@ def search_flights_realtime(origin, destination, date, adults=1, currency='GBP')
         print(f"Error searching real-time flights: {e}")
         return None
 
+@cached("flights_sky_api", key=_flight_search_key)
 def search_flights_sky(origin, destination, date, adults=1, currency='GBP'):
     """Search for real-time flights using Flights Sky API"""
     try:
@@ -243,10 +290,11 @@ def search_flights_sky(origin, destination, date, adults=1, currency='GBP'):
         
         print(f"🔍 Flights Sky API request: {sky_params}")
         
-        sky_response = requests.get(
+        sky_response = sessions.get(
             sky_url, 
             headers=sky_headers,
-            params=sky_params
+            params=sky_params,
+            timeout=REALTIME_TIMEOUT
         )
         
         if sky_response.status_code == 200:
@@ -260,6 +308,7 @@ def search_flights_sky(origin, destination, date, adults=1, currency='GBP'):
         print(f"Error searching Flights Sky: {e}")
         return None
 
+@cached("booking_tipsters_api", key=_flight_search_key)
 def search_booking_com_tipsters(origin, destination, date, adults=1, currency='GBP'):
     """Search for real-time flights using Booking.com Tipsters API"""
     try:
@@ -295,10 +344,11 @@ def search_booking_com_tipsters(origin, destination, date, adults=1, currency='G
         
         print(f"🔍 Booking.com Tipsters API request: {booking_params}")
         
-        booking_response = requests.get(
+        booking_response = sessions.get(
             booking_url, 
             headers=booking_headers,
-            params=booking_params
+            params=booking_params,
+            timeout=REALTIME_TIMEOUT
         )
         
         if booking_response.status_code == 200:
@@ -319,10 +369,11 @@ def get_booking_url(flight_token):
         url = "https://google-flights2.p.rapidapi.com/api/v1/getBookingURL"
         data = {'token': flight_token}
         
-        response = requests.post(
+        response = sessions.post(
             url,
             headers=get_rapidapi_headers('google_flights'),
-            json=data
+            json=data,
+            timeout=REALTIME_TIMEOUT
         )
         
         if response.status_code == 200:
@@ -381,6 +432,9 @@ def generate_working_booking_links(carrier, airline_code, origin="EMA", destinat
         if re.match(r'\d{2}-\d{2}-\d{4}', date_str):
             day, month, year = date_str.split(' ')[0].split('-')
             formatted_date = f"{year}-{month}-{day}"
+        # Offer records give ISO datetimes like "2025-08-25T17:00:00"
+        elif re.match(r'\d{4}-\d{2}-\d{2}', date_str):
+            formatted_date = date_str[:10]
         else:
             formatted_date = date_str
     except:
@@ -457,6 +511,44 @@ def generate_working_booking_links(carrier, airline_code, origin="EMA", destinat
 
 
 
+# Saved deals indexed by hotel stars/board and per-person price, per results file
+# and rebuilt when the agent rewrites it
+_saved_deals = {}
+
+def _index_deals(deals):
+    """AttributeIndex over (position, deal) rows so filtered deals keep their file order"""
+    return AttributeIndex(enumerate(deals),
+                          stars=lambda row: (row[1].get('hotel') or {}).get('stars', 0),
+                          board=lambda row: (row[1].get('hotel') or {}).get('board', ''),
+                          price=lambda row: row[1].get('perPerson') or 0)
+
+def load_saved_deals(results_path):
+    """Deals from a results file and their attribute index, reloaded only when the file changes"""
+    mtime = os.path.getmtime(results_path)
+    cached_entry = _saved_deals.get(results_path)
+    if cached_entry and cached_entry[0] == mtime:
+        return cached_entry[1], cached_entry[2]
+    with open(results_path, 'r') as f:
+        deals = json.load(f).get('deals', [])
+    index = _index_deals(deals)
+    _saved_deals[results_path] = (mtime, deals, index)
+    return deals, index
+
+def filter_deals(deals, index=None, min_stars=None, board=None, max_price=None):
+    """Deals with at least min_stars, a matching board and perPerson <= max_price; unparseable numbers are ignored"""
+    try:
+        max_price = float(max_price) if max_price else None
+    except ValueError:
+        max_price = None
+    try:
+        min_stars = int(min_stars) if min_stars else 0
+    except ValueError:
+        min_stars = 0
+    if not (min_stars or board or max_price is not None):
+        return deals
+    rows = (_index_deals(deals) if index is None else index).query(min_stars=min_stars, board=board, max_price=max_price)
+    return [deal for _, deal in sorted(rows, key=lambda row: row[0])]
+
 @app.route('/api/deals', methods=['GET'])
 def get_deals():
     """Get travel deals from the latest results"""
@@ -475,17 +567,14 @@ def get_deals():
                 'source': 'mock_data'
             })
         
-        with open(results_path, 'r') as f:
-            data = json.load(f)
-        
-        # Filter deals based on query parameters if provided
-        deals = data.get('deals', [])
+        deals, index = load_saved_deals(results_path)
         
         # Apply filters if query parameters are provided
         origin = request.args.get('origin')
         destination = request.args.get('destination')
-        max_price = request.args.get('max_price')
-        min_stars = request.args.get('min_stars')
+        
+        deals = filter_deals(deals, index, min_stars=request.args.get('min_stars'),
+                             board=request.args.get('board'), max_price=request.args.get('max_price'))
         
         if origin:
             deals = [deal for deal in deals if deal.get('flight', {}).get('origin') == origin]
@@ -493,20 +582,6 @@ def get_deals():
         if destination:
             deals = [deal for deal in deals if deal.get('flight', {}).get('destination') == destination]
         
-        if max_price:
-            try:
-                max_price = float(max_price)
-                deals = [deal for deal in deals if deal.get('perPerson', 0) <= max_price]
-            except ValueError:
-                pass
-        
-        if min_stars:
-            try:
-                min_stars = int(min_stars)
-                deals = [deal for deal in deals if deal.get('hotel', {}).get('stars', 0) >= min_stars]
-            except ValueError:
-                pass
-        
         return jsonify({
             'deals': deals,
             'total': len(deals),
@@ -521,136 +596,179 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
+@app.route('/api/diagnostics', methods=['GET'])
+def diagnostics():
+    """Runtime counters for this worker process"""
+    return jsonify({
+        'coalescing': coalescer.snapshot(),
+        'breakers': breakers.snapshot(),
+        'quota': quota.snapshot(),
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/api/search', methods=['POST'])
 def search_deals():
     """Search for deals based on search parameters"""
     try:
         data = request.get_json()
-        
-        # Load the latest results
-        results_path = os.path.join(os.path.dirname(__file__), '..', 'results', 'latest.json')
-        
-        if not os.path.exists(results_path):
-            # Return mock data instead of error when no results file exists
-            mock_deals = get_mock_deals_data()
-            
-            # Apply search filters to mock data
-            if data.get('budgetPerPerson'):
-                try:
-                    budget = float(data['budgetPerPerson'])
-                    mock_deals = [deal for deal in mock_deals if deal.get('perPerson', 0) <= budget]
-                except ValueError:
-                    pass
-            
-            if data.get('minStars'):
-                try:
-                    min_stars = int(data['minStars'])
-                    mock_deals = [deal for deal in mock_deals if deal.get('hotel', {}).get('stars', 0) >= min_stars]
-                except ValueError:
-                    pass
+        payload = coalescer.do(body_key('/api/search', data), lambda: _search_deals_payload(data))
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _search_deals_payload(data):
+    """Filter and enhance saved deals for a search body; shared by coalesced duplicates"""
+    # Load the latest results
+    results_path = os.path.join(os.path.dirname(__file__), '..', 'results', 'latest.json')
+    
+    if not os.path.exists(results_path):
+        # Return mock data instead of error when no results file exists
+        mock_deals = get_mock_deals_data()
+        
+        # Apply search filters to mock data
+        # (the demo deals carry no hotel board, so board isn't filtered here)
+        mock_deals = filter_deals(mock_deals, min_stars=data.get('minStars'), max_price=data.get('budgetPerPerson'))
+        
+        return {
+            'deals': mock_deals,
+            'total': len(mock_deals),
+            'timestamp': datetime.now().isoformat(),
+            'source': 'mock_data'
+        }
+    
+    # If we have real data, load it
+    deals, index = load_saved_deals(results_path)
+    
+    # Apply search filters based on available data
+    deals = filter_deals(deals, index, min_stars=data.get('minStars'), board=data.get('board'),
+                         max_price=data.get('budgetPerPerson'))
+    
+    # NEW: Filter by departure date if provided
+    if data.get('departureDate'):
+        try:
+            # Parse the search date (format: "2025-08-28")
+            search_date = datetime.strptime(data['departureDate'], '%Y-%m-%d')
             
-            return jsonify({
-                'deals': mock_deals,
-                'total': len(mock_deals),
-                'timestamp': datetime.now().isoformat(),
-                'source': 'mock_data'
-            })
-        
-        # If we have real data, load it
-        with open(results_path, 'r') as f:
-            results_data = json.load(f)
-        
-        deals = results_data.get('deals', [])
-        
-        # Apply search filters based on available data
-        if data.get('budgetPerPerson'):
-            try:
-                budget = float(data['budgetPerPerson'])
-                deals = [deal for deal in deals if deal.get('perPerson', 0) <= budget]
-            except ValueError:
-                pass
-        
-        if data.get('minStars'):
-            try:
-                min_stars = int(data['minStars'])
-                deals = [deal for deal in deals if deal.get('hotel', {}).get('stars', 0) >= min_stars]
-            except ValueError:
-                pass
-        
-        # NEW: Filter by departure date if provided
-        if data.get('departureDate'):
-            try:
-                # Parse the search date (format: "2025-08-28")
-                search_date = datetime.strptime(data['departureDate'], '%Y-%m-%d')
+            # Filter deals by departure date
+            filtered_deals = []
+            for deal in deals:
+                flight = deal.get('flight', {})
+                departure_str = flight.get('departure', '')
                 
-                # Filter deals by departure date
-                filtered_deals = []
-                for deal in deals:
-                    flight = deal.get('flight', {})
-                    departure_str = flight.get('departure', '')
-                    
-                    if departure_str:
-                        # Parse the deal's departure date
-                        deal_date, _ = parse_flight_date(departure_str)
-                        if deal_date and deal_date.date() == search_date.date():
-                            filtered_deals.append(deal)
-                
-                deals = filtered_deals
-                print(f"Date filtering: search for {data['departureDate']}, found {len(filtered_deals)} deals")
-            except Exception as e:
-                print(f"Date filtering error: {e}")
-                # If date filtering fails, continue with all deals
-        
-        # Enhance the deals with booking links and date validation
-        enhanced_deals = []
-        for deal in deals:
-            flight = deal.get('flight', {})
-            
-            # Parse and validate flight dates
-            departure_date, departure_error = parse_flight_date(flight.get('departure', ''))
-            arrival_date, arrival_error = parse_flight_date(flight.get('arrival', ''))
-            
-            # Extract airline code
-            airline_code = extract_airline_code(flight.get('carrier', ''))
-            
-            # Generate direct booking links
-            booking_links = generate_working_booking_links(
-                flight.get('carrier', ''),
-                airline_code,
-                origin="EMA",  # Default from your data
-                destination="ALC",  # Default from your data
-                date_str=flight.get('departure', ''),
-                adults=data.get('adults', 2),  # Get from search params or default to 2
-                nights=data.get('nights', 4)   # Get from search params or default to 4
-            )
-            
-            # Create enhanced deal
-            enhanced_deal = {
-                **deal,
-                'flight': {
-                    **flight,
-                    'departureDate': departure_date.isoformat() if departure_date else None,
-                    'departureError': departure_error,
-                    'arrivalDate': arrival_date.isoformat() if arrival_date else None,
-                    'arrivalError': arrival_error,
-                    'airlineCode': airline_code,
-                    'bookingLinks': booking_links,
-                    'isDateValid': departure_date is not None and arrival_date is not None
-                }
-            }
+                if departure_str:
+                    # Parse the deal's departure date
+                    deal_date, _ = parse_flight_date(departure_str)
+                    if deal_date and deal_date.date() == search_date.date():
+                        filtered_deals.append(deal)
             
-            enhanced_deals.append(enhanced_deal)
+            deals = filtered_deals
+            print(f"Date filtering: search for {data['departureDate']}, found {len(filtered_deals)} deals")
+        except Exception as e:
+            print(f"Date filtering error: {e}")
+            # If date filtering fails, continue with all deals
+    
+    # Enhance the deals with booking links and date validation
+    enhanced_deals = []
+    for deal in deals:
+        flight = deal.get('flight', {})
+        
+        # Parse and validate flight dates
+        departure_date, departure_error = parse_flight_date(flight.get('departure', ''))
+        arrival_date, arrival_error = parse_flight_date(flight.get('arrival', ''))
+        
+        # Extract airline code
+        airline_code = extract_airline_code(flight.get('carrier', ''))
+        
+        # Generate direct booking links
+        booking_links = generate_working_booking_links(
+            flight.get('carrier', ''),
+            airline_code,
+            origin="EMA",  # Default from your data
+            destination="ALC",  # Default from your data
+            date_str=flight.get('departure', ''),
+            adults=data.get('adults', 2),  # Get from search params or default to 2
+            nights=data.get('nights', 4)   # Get from search params or default to 4
+        )
         
-        return jsonify({
-            'deals': enhanced_deals,
-            'total': len(enhanced_deals),
-            'searchParams': data,
-            'timestamp': datetime.now().isoformat()
-        })
+        # Create enhanced deal
+        enhanced_deal = {
+            **deal,
+            'flight': {
+                **flight,
+                'departureDate': departure_date.isoformat() if departure_date else None,
+                'departureError': departure_error,
+                'arrivalDate': arrival_date.isoformat() if arrival_date else None,
+                'arrivalError': arrival_error,
+                'airlineCode': airline_code,
+                'bookingLinks': booking_links,
+                'isDateValid': departure_date is not None and arrival_date is not None
+            }
+        }
         
+        enhanced_deals.append(enhanced_deal)
+    
+    return {
+        'deals': enhanced_deals,
+        'total': len(enhanced_deals),
+        'searchParams': data,
+        'timestamp': datetime.now().isoformat()
+    }
+
+LIVE_SEARCH_FIELDS = ('origin', 'destination', 'startDate', 'nights', 'adults', 'minStars', 'board', 'budgetPerPerson')
+
+# Live streams search one fixed stay: fields that widen the provider fan-out
+# (date windows, nearby origins, transfers) or write files are refused
+LIVE_REFUSED_FIELDS = ('flexibility', 'nightsRange', 'originRadiusKm', 'maxOrigins', 'groundTransfer',
+                       'incremental', 'snapshotPath')
+LIVE_MAX_TOP_K = int(os.getenv('LIVE_STREAM_MAX_TOP_K', '200'))
+
+def _live_search_params(data):
+    """(params, error) for a stream body: only LIVE_SEARCH_FIELDS plus topK, capped at LIVE_MAX_TOP_K"""
+    missing = [field for field in LIVE_SEARCH_FIELDS if field not in data]
+    if missing:
+        return None, f"Missing fields: {', '.join(missing)}"
+    refused = [field for field in LIVE_REFUSED_FIELDS if data.get(field)]
+    if refused:
+        return None, f"Not supported for live streams: {', '.join(refused)}"
+    try:
+        top_k = LIVE_MAX_TOP_K if data.get('topK') is None else int(data['topK'])
+    except (TypeError, ValueError):
+        return None, "topK must be a number"
+    if top_k < 1:
+        return None, "topK must be at least 1"
+    params = {field: data[field] for field in LIVE_SEARCH_FIELDS}
+    params['topK'] = min(top_k, LIVE_MAX_TOP_K)
+    return params, None
+
+@app.route('/api/deals/stream', methods=['POST'])
+def stream_live_deals():
+    """Run a live package search for a request body and stream the deals as NDJSON, cheapest first"""
+    params, error = _live_search_params(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        import travel_deal_agent as agent_module
+    except ImportError:
+        from agent import travel_deal_agent as agent_module
+
+    # Identical concurrent searches share one provider fan-out; topK only bounds matching
+    search = {field: params[field] for field in LIVE_SEARCH_FIELDS}
+    try:
+        flights, hotels = coalescer.do(body_key('/api/deals/stream', search),
+                                       lambda: agent_module.fetch_offers(params))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    def generate():
+        # Deals are matched lazily as the client reads; topK bounds the work
+        try:
+            for deal in agent_module.iter_deals(params, flights, hotels, limit=params['topK']):
+                yield json.dumps(deal) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/deals/enhanced', methods=['GET'])
 def get_enhanced_deals():
     """Get travel deals with enhanced booking information and date validation"""
@@ -712,57 +830,87 @@ def get_enhanced_deals():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _hedge_options(data):
+    """((mode, hedge_delay), error) for a search body's searchMode / hedgeDelay overrides"""
+    mode = data.get('searchMode', FLIGHT_SEARCH_MODE)
+    if mode not in SEARCH_MODES:
+        return None, f"searchMode must be one of: {', '.join(SEARCH_MODES)}"
+    try:
+        hedge_delay = float(data.get('hedgeDelay', FLIGHT_HEDGE_DELAY))
+    except (TypeError, ValueError):
+        return None, "hedgeDelay must be a number of seconds"
+    if not 0 <= hedge_delay < float('inf'):
+        return None, "hedgeDelay must be a number of seconds"
+    return (mode, hedge_delay), None
+
 @app.route('/api/flights/search', methods=['POST'])
 def search_realtime_flights():
     """Search for real-time flights using RapidAPI"""
     try:
         data = request.get_json()
-        
-        # Extract search parameters
-        origin = data.get('origin', 'EMA')
-        destination = data.get('destination', 'ALC')
-        date = data.get('date')
-        adults = data.get('adults', 1)
-        currency = data.get('currency', 'GBP')
-        
-        # Try Google Flights first
-        print(f"🔍 Searching Google Flights: {origin} → {destination} on {date}")
-        flight_results = search_flights_realtime(origin, destination, date, adults, currency)
-        
-        # If Google Flights fails, try Flights Sky as fallback
-        if not flight_results:
-            print(f"🔄 Google Flights failed, trying Flights Sky API...")
-            flight_results = search_flights_sky(origin, destination, date, adults, currency)
-            
-            if flight_results:
-                print(f"✅ Flights Sky API successful!")
-            else:
-                print(f"🔄 Flights Sky failed, trying Booking.com Tipsters API...")
-                flight_results = search_booking_com_tipsters(origin, destination, date, adults, currency)
-                
-                if flight_results:
-                    print(f"✅ Booking.com Tipsters API successful!")
-                else:
-                    print(f"❌ All three APIs failed")
-        
-        if flight_results:
-            return jsonify({
-                'success': True,
-                'data': flight_results,
-                'searchParams': data,
-                'timestamp': datetime.now().isoformat()
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'No flights found or API error',
-                'searchParams': data,
-                'timestamp': datetime.now().isoformat()
-            })
-            
+        _, error = _hedge_options(data)
+        if error:
+            return jsonify({'error': error}), 400
+        payload = coalescer.do(body_key('/api/flights/search', data), lambda: _realtime_flights_payload(data))
+        return jsonify(payload)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _realtime_flights_payload(data):
+    """Run the real-time provider fallback chain for a search body; shared by coalesced duplicates"""
+    # Extract search parameters
+    origin = data.get('origin', 'EMA')
+    destination = data.get('destination', 'ALC')
+    date = data.get('date')
+    adults = data.get('adults', 1)
+    currency = data.get('currency', 'GBP')
+    
+    (mode, hedge_delay), _ = _hedge_options(data)
+    
+    # Google Flights first, then Flights Sky, then Booking.com Tipsters
+    print(f"🔍 Searching flights ({mode}): {origin} → {destination} on {date}")
+    attempts = [
+        ('Google Flights', lambda: search_flights_realtime(origin, destination, date, adults, currency)),
+        ('Flights Sky', lambda: search_flights_sky(origin, destination, date, adults, currency)),
+        ('Booking.com Tipsters', lambda: search_booking_com_tipsters(origin, destination, date, adults, currency)),
+    ]
+    # Skip hosts whose circuit is open or whose key is out of quota (fallbacks
+    # also keep the quota reserve); unhealthy ones drop to the end of the chain
+    board, ledger = breakers.get_board(), quota.get_ledger()
+    attempts = board.rank(attempts, host=lambda a: REALTIME_HOSTS[a[0]])
+    skipped = {}
+    for position, (name, _) in enumerate(attempts):
+        if not board.available(REALTIME_HOSTS[name]):
+            skipped[name] = 'circuit_open'
+        elif not ledger.allows(REALTIME_HOSTS[name], optional=position > 0):
+            skipped[name] = 'quota'
+    attempts = [a for a in attempts if a[0] not in skipped]
+    provider, flight_results, attempt_log = run_hedged(attempts, realtime_executor, mode, hedge_delay)
+    attempt_log += [{'provider': name, 'status': status, 'latencyMs': None} for name, status in skipped.items()]
+    
+    if flight_results:
+        print(f"✅ {provider} won: " + ", ".join(f"{a['provider']}={a['status']}" for a in attempt_log))
+    else:
+        print(f"❌ All three APIs failed")
+    
+    meta = {'mode': mode, 'provider': provider, 'attempts': attempt_log}
+    if flight_results:
+        return {
+            'success': True,
+            'data': flight_results,
+            'searchParams': data,
+            'meta': meta,
+            'timestamp': datetime.now().isoformat()
+        }
+    else:
+        return {
+            'success': False,
+            'error': 'No flights found or API error',
+            'searchParams': data,
+            'meta': meta,
+            'timestamp': datetime.now().isoformat()
+        }
+
 @app.route('/api/flights/booking-url', methods=['POST'])
 def get_flight_booking_url():
     """Get booking URL for a specific flight"""
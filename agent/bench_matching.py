@@ -0,0 +1,102 @@
+"""
+Benchmark: select_deals' package matchers on synthetic offers, against the
+nested loop they replaced.
+
+    cd agent
+    python bench_matching.py                # 10k flights x 10k hotels
+    python bench_matching.py --n 2000 --budget 300
+    python bench_matching.py --top 100      # top-K only (nested loop: sort, then slice)
+
+The NumPy engine (matching_numpy.py) is included when NumPy is installed.
+
+Prices are uniform random; --budget sets the per-person limit for two adults.
+The default keeps about 0.5% of the pairs. The gain shrinks as the budget
+admits more of them, since building the deal dicts then dominates both
+matchers. Both must return the same deals in the same order.
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from itertools import islice
+
+from matching import iter_matches
+from providers.offers import MINOR_UNITS, FlightOffer, HotelOffer
+
+
+def synthetic_offers(n, seed=0):
+    rng = random.Random(seed)
+    flights = sorted((FlightOffer(provider="Bench", carrier=f"FR {i}", price_minor=rng.randint(4000, 60000))
+                      for i in range(n)), key=lambda f: f.price_minor)
+    hotels = sorted((HotelOffer(provider="Bench", name=f"Hotel {i}", stars=4, board="Room Only",
+                                price_minor=rng.randint(15000, 250000)) for i in range(n)),
+                    key=lambda h: h.price_minor)
+    return flights, hotels
+
+
+def _deals(matches, timestamp):
+    return [{"timestamp": timestamp, "perPerson": round(per_person, 2),
+             "total": round(total / MINOR_UNITS, 2), "flight": flight, "hotel": hotel}
+            for per_person, flight, hotel, total in matches]
+
+
+def nested_loop(flights, hotels, adults, budget, timestamp, limit):
+    """The matcher select_deals used before: every pair under budget, then a stable sort."""
+    results = []
+    for flight in flights:
+        for hotel in hotels:
+            total = flight.price_minor + hotel.price_minor
+            per_person = total / adults / MINOR_UNITS
+            if per_person <= budget:
+                results.append({"timestamp": timestamp, "perPerson": round(per_person, 2),
+                                "total": round(total / MINOR_UNITS, 2), "flight": flight, "hotel": hotel})
+    return sorted(results, key=lambda x: x["perPerson"])[:limit]
+
+
+def sort_and_prune(flights, hotels, adults, budget, timestamp, limit):
+    return _deals(islice(iter_matches(flights, hotels, adults, budget), limit), timestamp)
+
+
+def vectorized(flights, hotels, adults, budget, timestamp, limit):
+    import matching_numpy
+    params = {"adults": adults, "budgetPerPerson": budget, "minStars": 0, "board": ""}
+    return _deals(matching_numpy.match(flights, hotels, params, limit), timestamp)
+
+
+def matchers():
+    found = [("nested loop", nested_loop), ("sort & prune", sort_and_prune)]
+    try:
+        import numpy  # noqa: F401
+        found.append(("numpy", vectorized))
+    except ImportError:
+        print("[WARN] NumPy not installed, skipping the numpy engine")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=10000, help="Flights and hotels each")
+    parser.add_argument("--budget", type=float, default=150, help="Budget per person, two adults")
+    parser.add_argument("--top", type=int, default=None, help="Only the K cheapest deals")
+    args = parser.parse_args()
+
+    flights, hotels = synthetic_offers(args.n)
+    timestamp = datetime.utcnow().isoformat()
+    timings = {}
+    outputs = {}
+    for name, matcher in matchers():
+        started = time.perf_counter()
+        outputs[name] = matcher(flights, hotels, 2, args.budget, timestamp, args.top)
+        timings[name] = time.perf_counter() - started
+
+    reference = outputs["nested loop"]
+    assert all(output == reference for output in outputs.values()), "matchers disagree"
+    print(f"=== {args.n} flights x {args.n} hotels, budget {args.budget:g} pp, "
+          f"{len(reference)} deals{'' if args.top is None else f' (top {args.top})'} ===")
+    for name, seconds in timings.items():
+        print(f"{name:<14} {seconds:8.3f} s   {timings['nested loop'] / max(seconds, 1e-9):6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: per-call latency against a local HTTPS stub, with and without
+the pooled sessions in providers.sessions.
+
+    cd agent
+    python bench_sessions.py --calls 200
+
+Needs the `openssl` CLI to mint a throwaway self-signed certificate.
+"""
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import urllib3
+
+from providers import sessions
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+BODY = json.dumps({"data": {"itineraries": {"topFlights": [], "otherFlights": []}}}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive capable
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _self_signed_cert(workdir):
+    cert = os.path.join(workdir, "cert.pem")
+    key = os.path.join(workdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def start_stub(workdir):
+    cert, key = _self_signed_cert(workdir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"https://127.0.0.1:{server.server_address[1]}/api/v1/searchFlights"
+
+
+def measure(call, url, calls):
+    call(url)  # warm-up (pooled: opens the connection once)
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        call(url).raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<24} mean {statistics.mean(samples):7.2f} ms   "
+          f"p50 {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200, help="Requests per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server, url = start_stub(workdir)
+        try:
+            unpooled = measure(lambda u: requests.get(u, verify=False, timeout=10), url, args.calls)
+            pooled = measure(lambda u: sessions.get(u, verify=False, timeout=10), url, args.calls)
+        finally:
+            server.shutdown()
+            sessions.close_all()
+
+    print(f"=== {args.calls} GETs against local HTTPS stub ===")
+    report("requests.get (no pool)", unpooled)
+    report("sessions.get (pooled)", pooled)
+    print(f"speed-up: {statistics.mean(unpooled) / statistics.mean(pooled):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: peak RSS of decoding a large Google Flights response with
+response.json() versus the incremental decoder in providers.jsonstream.
+
+    cd agent
+    python bench_streaming.py                      # synthetic ~20 MB payload
+    python bench_streaming.py --payload search.json  # a recorded response body
+
+The body is served from a local HTTP stub; each mode runs in a fresh
+interpreter so the peak RSS of one does not mask the other. Peak RSS comes
+from VmHWM on Linux, ru_maxrss elsewhere (Unix only).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from providers import google_flights, jsonstream, sessions
+
+
+def synthetic_payload(target_mb: float) -> bytes:
+    """A searchFlights-shaped body of roughly target_mb megabytes."""
+    rng = random.Random(0)
+
+    def flight(n):
+        return {
+            "departure_time": f"2024-09-01 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "arrival_time": f"2024-09-01 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "duration": {"raw": rng.randint(120, 900), "text": "3 hr 10 min"},
+            "flights": [{
+                "departure_airport": {"airport_code": "EMA", "airport_name": "East Midlands Airport", "time": "2024-09-01 06:00"},
+                "arrival_airport": {"airport_code": "ALC", "airport_name": "Alicante-Elche Miguel Hernandez Airport", "time": "2024-09-01 09:45"},
+                "duration": {"raw": 165, "text": "2 hr 45 min"},
+                "airline": rng.choice(["Ryanair", "Jet2", "easyJet", "TUI"]),
+                "airline_logo": "https://www.gstatic.com/flights/airline_logos/70px/FR.png",
+                "flight_number": f"FR {rng.randint(100, 9999)}",
+                "aircraft": "Boeing 737",
+                "seat": "Average legroom (30 in)",
+                "legroom": "30 in",
+                "extensions": ["Average legroom (30 in)", "In-seat USB outlet", "Carbon emissions estimate: 96 kg"],
+            } for _ in range(rng.randint(1, 3))],
+            "layovers": None,
+            "bags": {"carry_on": 1, "checked": 0},
+            "carbon_emissions": {"difference_percent": rng.randint(-30, 30), "CO2e": rng.randint(60000, 200000)},
+            "stops": rng.randint(0, 2),
+            "price": rng.randint(40, 600),
+            "booking_token": "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(300)),
+            "id": n,
+        }
+
+    sample = sum(len(json.dumps(flight(n)).encode()) for n in range(50)) / 50
+    count = int(target_mb * 1024 * 1024 / sample)
+    body = {"status": True, "message": "Success",
+            "data": {"itineraries": {"topFlights": [flight(n) for n in range(count // 10)],
+                                     "otherFlights": [flight(n) for n in range(count // 10, count)]},
+                     "priceHistory": {"summary": {"current": 120, "low": [40, 90], "high": 600}}}}
+    return json.dumps(body).encode()
+
+
+def start_stub(body: bytes):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/searchFlights"
+
+
+def _status_kb(field):
+    """A memory field from /proc/self/status (Linux), in kB, or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_kb():
+    # VmHWM belongs to this exec'd image; ru_maxrss on Linux also counts the
+    # parent's RSS at fork time, which would hide the child's own peak.
+    peak = _status_kb("VmHWM")
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def _current_kb():
+    """Resident set size now (Linux); elsewhere the peak so far is the best baseline."""
+    current = _status_kb("VmRSS")
+    return _peak_kb() if current is None else current
+
+
+def run_child(mode: str, url: str):
+    """One decode in this (fresh) process; prints JSON with the RSS growth."""
+    before = _current_kb()
+    started = time.perf_counter()
+    if mode == "json":
+        response = sessions.get(url, timeout=60)
+        flights = google_flights._parse_search(response.json())
+    else:
+        response = sessions.get(url, timeout=60, stream=True)
+        flights = google_flights._normalize_flights(
+            jsonstream.iter_response(response, *google_flights.ITINERARY_PATHS))
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"mode": mode, "flights": len(flights), "seconds": elapsed,
+                      "peakDeltaKb": max(0, _peak_kb() - before)}))
+
+
+def measure(mode: str, url: str) -> dict:
+    out = subprocess.run([sys.executable, __file__, "--child", mode, "--url", url],
+                         check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payload", help="Recorded searchFlights response body (default: synthetic)")
+    parser.add_argument("--mb", type=float, default=20, help="Size of the synthetic payload")
+    parser.add_argument("--child", choices=("json", "stream"), help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.url)
+        return
+
+    if args.payload:
+        with open(args.payload, "rb") as f:
+            body = f.read()
+    else:
+        body = synthetic_payload(args.mb)
+    server, url = start_stub(body)
+    try:
+        results = [measure(mode, url) for mode in ("json", "stream")]
+    finally:
+        server.shutdown()
+
+    print(f"=== Google Flights payload, {len(body) / 1024 / 1024:.1f} MB ===")
+    for r in results:
+        print(f"{r['mode']:<8} {r['flights']:6d} flights   {r['seconds']:6.2f} s   "
+              f"peak RSS +{r['peakDeltaKb'] / 1024:7.1f} MB")
+    json_peak, stream_peak = results[0]["peakDeltaKb"], results[1]["peakDeltaKb"]
+    print(f"peak RSS reduction: {json_peak / max(stream_peak, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,8 @@ RAPIDAPI_HOSTS = {
 }
 
 # Individual API Keys (if needed)
-RAPIDAPI_FLIGHTS_SKY_KEY = os.getenv('RAPIDAPI_SKYSCRAPER_KEY', RAPIDAPI_KEY)
-RAPIDAPI_BOOKING_TIPSTERS_KEY = os.getenv('RAPIDAPI_BOOKING_KEY', RAPIDAPI_KEY)  # NEW
+RAPIDAPI_FLIGHTS_SKY_KEY = os.getenv('RAPIDAPI_FLIGHTS_SKY_KEY') or os.getenv('RAPIDAPI_SKYSCRAPER_KEY', RAPIDAPI_KEY)
+RAPIDAPI_BOOKING_TIPSTERS_KEY = os.getenv('RAPIDAPI_BOOKING_TIPSTERS_KEY') or os.getenv('RAPIDAPI_BOOKING_KEY', RAPIDAPI_KEY)  # NEW
 
 # Default settings
 DEFAULT_CURRENCY = 'GBP'
@@ -0,0 +1,85 @@
+"""
+Hedged execution of an ordered provider fallback chain.
+
+Modes:
+  sequential  start the next provider only after the previous one fails or
+              comes back empty (the original behaviour)
+  hedged      additionally start the next provider if the current ones have
+              not answered within `hedge_delay` seconds
+  race        start every provider at once
+
+The first non-empty response wins (ties go to the earlier provider). Providers
+still queued are cancelled; ones already running are abandoned and their late
+results ignored, so each call needs its own HTTP timeout.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+MODES = ("sequential", "hedged", "race")
+
+
+def run_hedged(attempts, executor, mode="hedged", hedge_delay=2.0):
+    """
+    attempts: ordered list of (name, zero-arg callable).
+    Returns (winner_name or None, result or None, attempt log). Each log entry
+    has provider, status (won/lost/empty/error/cancelled/skipped) and latencyMs.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {MODES}")
+
+    log = [{"provider": name, "status": "skipped", "latencyMs": None} for name, _ in attempts]
+    started_at = {}
+    running = {}
+    next_index = 0
+    last_launch = 0.0
+
+    def launch():
+        nonlocal next_index, last_launch
+        index = next_index
+        next_index += 1
+        last_launch = started_at[index] = time.perf_counter()
+        running[executor.submit(attempts[index][1])] = index
+
+    def finish(index, status):
+        log[index]["status"] = status
+        log[index]["latencyMs"] = round((time.perf_counter() - started_at[index]) * 1000)
+
+    if attempts:
+        launch()
+    while mode == "race" and next_index < len(attempts):
+        launch()
+
+    winner = None
+    while running:
+        timeout = None
+        if mode == "hedged" and next_index < len(attempts):
+            timeout = max(0.0, last_launch + hedge_delay - time.perf_counter())
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            launch()  # hedge: the current attempts are slow, start the next one too
+            continue
+
+        for future in sorted(done, key=running.get):
+            index = running.pop(future)
+            try:
+                result = future.result()
+            except Exception:
+                finish(index, "error")
+                continue
+            if result and winner is None:
+                finish(index, "won")
+                winner = (index, result)
+            else:
+                finish(index, "empty" if not result else "lost")
+        if winner:
+            break
+        if not running and next_index < len(attempts):
+            launch()
+
+    for future, index in running.items():
+        future.cancel()
+        finish(index, "cancelled")
+
+    if winner is None:
+        return None, None, log
+    return attempts[winner[0]][0], winner[1], log
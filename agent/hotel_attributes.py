@@ -0,0 +1,120 @@
+"""
+Star/board/price index over hotels (or anything carrying a hotel, e.g. saved deals).
+
+Providers describe boards in their own words: "HB", "Half Board",
+"HALF_BOARD", "Bed & Breakfast", "CONTINENTAL_BREAKFAST". parse_board()
+normalises them to a Board bitmask. Text that doesn't parse keeps the old
+behaviour: the requested board is matched as a case-insensitive substring.
+
+AttributeIndex buckets items by (stars, board) and keeps each bucket's
+postings sorted by price. A query such as ">= 3 stars, HB, under X" picks the
+matching buckets, bisects each at X and merges the slices by price. It never
+scans the items that fail. Items with equal prices come out in the order
+they were given.
+"""
+import enum
+import heapq
+import re
+from bisect import bisect_right
+
+MAX_STARS = 5
+
+
+class Board(enum.IntFlag):
+    RO = 1   # room only
+    BB = 2   # bed and breakfast
+    HB = 4   # half board
+    FB = 8   # full board
+    AI = 16  # all inclusive
+
+
+# Checked in order; the first phrase found decides. Codes only count as whole words.
+_BOARD_PHRASES = (
+    ("ALL INCLUSIVE", Board.AI),
+    ("FULL BOARD", Board.FB),
+    ("HALF BOARD", Board.HB),
+    ("ROOM ONLY", Board.RO),
+    ("NO MEALS", Board.RO),
+    ("BREAKFAST", Board.BB),
+)
+_WORDS = re.compile(r"[A-Z]+")
+
+
+def parse_board(text) -> Board:
+    """Board flags for a board code or description; Board(0) when it isn't recognised."""
+    if isinstance(text, Board):
+        return text
+    words = _WORDS.findall(str(text or "").upper().replace("&", " AND "))
+    flags = Board(0)
+    for word in words:
+        if word in Board.__members__:
+            flags |= Board[word]
+    if flags:
+        return flags
+    phrase = " ".join(words)
+    for needle, board in _BOARD_PHRASES:
+        if needle in phrase:
+            return board
+    return Board(0)
+
+
+def board_matches(wanted: str, board: str) -> bool:
+    """
+    Whether a hotel's `board` satisfies the requested board. Both sides parsed:
+    any shared flag. Otherwise the old substring check ("" matches everything).
+    """
+    want, have = parse_board(wanted), parse_board(board)
+    if want and have:
+        return bool(want & have)
+    return (wanted or "").lower() in (board or "").lower()
+
+
+def _stars(value) -> int:
+    try:
+        return max(0, min(MAX_STARS, int(value or 0)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class AttributeIndex:
+    """
+    Index `items` by star rating, board and price. The accessors read those
+    from an item: e.g. lambda deal: deal["hotel"]["stars"]. Item prices may be
+    None; those items are never returned.
+    """
+
+    def __init__(self, items, stars, board, price):
+        self._buckets = {}  # (stars, board flags, board text) -> ([price], [seq], [item])
+        rows = {}
+        for seq, item in enumerate(items):
+            value = price(item)
+            if value is None:
+                continue
+            text = board(item) or ""
+            key = (_stars(stars(item)), parse_board(text), text)
+            rows.setdefault(key, []).append((value, seq, item))
+        for key, postings in rows.items():
+            postings.sort(key=lambda row: (row[0], row[1]))
+            self._buckets[key] = ([p for p, _, _ in postings], [s for _, s, _ in postings],
+                                  [i for _, _, i in postings])
+
+    def __len__(self):
+        return sum(len(prices) for prices, _, _ in self._buckets.values())
+
+    def query(self, min_stars=0, board=None, max_price=None) -> list:
+        """Items with at least `min_stars`, a matching board and price <= max_price, cheapest first."""
+        min_stars = int(min_stars or 0)
+        matches = {}  # board text -> bool, decided once per distinct text
+        slices = []
+        for (stars, _, text), (prices, seqs, items) in self._buckets.items():
+            if stars < min_stars:
+                continue
+            if board:
+                if text not in matches:
+                    matches[text] = board_matches(board, text)
+                if not matches[text]:
+                    continue
+            end = len(prices) if max_price is None else bisect_right(prices, max_price)
+            if end:
+                slices.append(zip(prices[:end], seqs[:end], items[:end]))
+        return [item for _, _, item in heapq.merge(*slices, key=lambda row: (row[0], row[1]))]
@@ -0,0 +1,232 @@
+"""
+Cross-provider hotel identity.
+
+The same property comes back from several providers under different names:
+"Hotel Marina Delfin" from Booking.com, "MARINA DELFIN HOTEL" from Amadeus.
+Deduping on the exact name kept both, and every flight was then paired with
+each copy. HotelResolver maps offers to one property id.
+
+Names are normalised to tokens: accents, case, punctuation and filler words
+such as "hotel" are dropped. Candidates are blocked by name token and by a
+geo cell of about 1 km, which takes in the neighbouring cells. Only hotels that
+share a token, and are near each other when both have coordinates, get scored.
+The score is the Jaccard similarity of the token sets. A name match counts at
+NAME_THRESHOLD, or at GEO_NAME_THRESHOLD when the coordinates agree. Star
+ratings more than one apart never match.
+
+Resolutions are kept in an alias table, a SQLite file next to the provider
+cache. Later runs look offers up there and skip the scoring.
+HOTEL_ALIAS_PATH moves the file ("" keeps it in memory). Disable with
+HOTEL_ALIASES=off.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+try:
+    from airports import distance_km
+except ImportError:
+    # Imported as agent.hotel_identity (e.g. via wsgi.py)
+    from agent.airports import distance_km
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "constellation-travel", "hotel_aliases.sqlite3")
+
+CELL_DEG = 0.01            # geo cell size, about 1.1 km north-south
+MAX_DISTANCE_KM = 0.5      # further apart than this is a different property
+NAME_THRESHOLD = 0.75      # token similarity for a match on name alone
+GEO_NAME_THRESHOLD = 0.5   # token similarity when the coordinates agree
+
+FILLER_WORDS = frozenset({"hotel", "hotels", "hotell", "the", "and", "by", "a", "an", "y"})
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS aliases (offer_key TEXT PRIMARY KEY, property_id TEXT NOT NULL)",
+)
+
+_TOKENS = re.compile(r"[a-z0-9]+")
+
+
+def name_tokens(name) -> frozenset:
+    """Normalised name tokens; filler words are dropped unless nothing else is left."""
+    text = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode().lower()
+    tokens = _TOKENS.findall(text.replace("&", " and "))
+    kept = frozenset(t for t in tokens if t not in FILLER_WORDS)
+    return kept or frozenset(tokens)
+
+
+def geo_cell(latitude, longitude):
+    """(row, col) of the cell holding a point; None without coordinates."""
+    if latitude is None or longitude is None:
+        return None
+    return math.floor(latitude / CELL_DEG), math.floor(longitude / CELL_DEG)
+
+
+def _neighbours(cell):
+    row, col = cell
+    return [(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two token sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def offer_key(hotel) -> str:
+    """Alias table key: the provider's hotel id when it has one, else normalised name and cell."""
+    if hotel.hotel_id:
+        return f"id:{hotel.provider_code or hotel.provider}:{hotel.hotel_id}"
+    cell = geo_cell(hotel.latitude, hotel.longitude)
+    return f"name:{' '.join(sorted(name_tokens(hotel.name)))}@{'' if cell is None else '%d,%d' % cell}"
+
+
+class AliasTable:
+    def __init__(self, path=None, enabled=True):
+        self.path = path or ":memory:"
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+        return self._db
+
+    def lookup(self, keys) -> dict:
+        """offer key -> property id for the keys that have been resolved before."""
+        keys = list(set(keys))
+        if not self.enabled or not keys:
+            return {}
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                found.update(self._conn().execute(
+                    f"SELECT offer_key, property_id FROM aliases WHERE offer_key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall())
+        return found
+
+    def store(self, aliases: dict):
+        if not self.enabled or not aliases:
+            return
+        with self._lock:
+            db = self._conn()
+            db.executemany("INSERT OR REPLACE INTO aliases (offer_key, property_id) VALUES (?, ?)",
+                           list(aliases.items()))
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM aliases")
+            db.commit()
+
+
+class _Property:
+    __slots__ = ("seq", "tokens", "stars", "latitude", "longitude")
+
+    def __init__(self, seq, hotel, tokens):
+        self.seq = seq
+        self.tokens = tokens
+        self.stars = hotel.stars
+        self.latitude = hotel.latitude
+        self.longitude = hotel.longitude
+
+
+class HotelResolver:
+    """
+    Resolve HotelOffer records to property ids, one run's offers at a time.
+    Call resolve() for each offer, then save() to remember the new resolutions.
+    """
+
+    def __init__(self, aliases=None):
+        self.aliases = aliases
+        self.stats = {"aliased": 0, "scored": 0, "comparisons": 0, "properties": 0}
+        self._known = {}       # offer key -> property id, from the alias table or this run
+        self._new = {}         # resolutions to store
+        self._properties = {}  # property id -> _Property seen this run
+        self._by_token = {}    # token -> property ids
+        self._by_cell = {}     # (token, cell or None) -> property ids
+
+    def preload(self, hotels):
+        """Fetch the alias table entries for `hotels` in one query."""
+        if self.aliases is not None:
+            self._known.update(self.aliases.lookup(offer_key(h) for h in hotels))
+
+    def _candidates(self, tokens, cell):
+        found = set()
+        for token in tokens:
+            if cell is None:
+                found.update(self._by_token.get(token, ()))
+            else:
+                for near in _neighbours(cell):
+                    found.update(self._by_cell.get((token, near), ()))
+                found.update(self._by_cell.get((token, None), ()))
+        return found
+
+    def _score(self, prop, hotel, tokens):
+        if prop.stars and hotel.stars and abs(prop.stars - hotel.stars) > 1:
+            return 0.0
+        score = similarity(prop.tokens, tokens)
+        if None not in (prop.latitude, prop.longitude, hotel.latitude, hotel.longitude):
+            if distance_km(prop.latitude, prop.longitude, hotel.latitude, hotel.longitude) > MAX_DISTANCE_KM:
+                return 0.0
+            return score if score >= GEO_NAME_THRESHOLD else 0.0
+        return score if score >= NAME_THRESHOLD else 0.0
+
+    def _add(self, prop_id, hotel, tokens):
+        prop = _Property(len(self._properties), hotel, tokens)
+        self._properties[prop_id] = prop
+        cell = geo_cell(hotel.latitude, hotel.longitude)
+        for token in tokens:
+            self._by_token.setdefault(token, []).append(prop_id)
+            self._by_cell.setdefault((token, cell), []).append(prop_id)
+        self.stats["properties"] += 1
+
+    def resolve(self, hotel) -> str:
+        """Property id for an offer. Offers are best given cheapest first."""
+        key = offer_key(hotel)
+        known = self._known.get(key)
+        if known is not None:
+            self.stats["aliased"] += 1
+            if known not in self._properties:
+                self._add(known, hotel, name_tokens(hotel.name))
+            return known
+
+        tokens = name_tokens(hotel.name)
+        best, best_score = None, 0.0
+        candidates = self._candidates(tokens, geo_cell(hotel.latitude, hotel.longitude))
+        for prop_id in sorted(candidates, key=lambda p: self._properties[p].seq):  # ties go to the earlier property
+            self.stats["comparisons"] += 1
+            score = self._score(self._properties[prop_id], hotel, tokens)
+            if score > best_score:
+                best, best_score = prop_id, score
+        self.stats["scored"] += 1
+        if best is None:
+            best = key
+            self._add(best, hotel, tokens)
+        self._known[key] = self._new[key] = best
+        return best
+
+    def save(self):
+        if self.aliases is not None:
+            self.aliases.store(self._new)
+        self._new = {}
+
+
+_aliases = AliasTable(
+    path=os.getenv("HOTEL_ALIAS_PATH", DEFAULT_PATH) or None,
+    enabled=os.getenv("HOTEL_ALIASES", "on").lower() not in ("0", "off", "false"),
+)
+
+
+def get_aliases() -> AliasTable:
+    return _aliases
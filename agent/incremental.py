@@ -0,0 +1,243 @@
+"""
+Incremental re-evaluation against the previous run.
+
+Runs a few hours apart mostly see the same offers at the same prices, yet
+every run matched every pair again. In incremental mode the run keeps a
+snapshot next to its results. The snapshot holds the key and price of each
+flight and hotel that passed the request's filters, and the (flight, hotel)
+pairs of the deals found. The next run diffs its own offers against it by key
+and price:
+
+- a pair of two unchanged offers is kept without re-matching;
+- pairs with a new or repriced offer go back through matching.iter_matches;
+- pairs with an offer that is gone, or whose price changed, are dropped.
+
+The three streams merge in the same order as a full run, so the deals match a
+full run's exactly. Flights are keyed by their itinerary key (see
+providers/itinerary.py), hotels by hotel_identity.offer_key plus the board.
+
+A snapshot is reused only if it was made with the same matching fields
+(MATCH_FIELDS). With topK, the snapshot holds only the deals that were kept.
+So it is reused only if none of them had to be dropped. Otherwise the run
+matches everything again, and the reason goes in the change summary.
+
+A flexible request (see planner.py) keeps one snapshot per stay, keyed by
+origin, startDate and nights, in a file next to snapshotPath (stay_path).
+Each stay is diffed against its own previous run. combine() sums the
+stays' change summaries into one.
+"""
+import heapq
+import json
+import os
+from datetime import datetime
+
+try:
+    from hotel_identity import offer_key
+    from matching import iter_matches
+    from providers.offers import MINOR_UNITS
+except ImportError:
+    # Imported as agent.incremental (e.g. via wsgi.py)
+    from agent.hotel_identity import offer_key
+    from agent.matching import iter_matches
+    from agent.providers.offers import MINOR_UNITS
+
+SNAPSHOT_VERSION = 1
+DEFAULT_PATH = os.path.join("results", "snapshot.json")
+
+# Request fields that decide which pairs are deals
+MATCH_FIELDS = ("adults", "budgetPerPerson", "minStars", "board", "maxStops", "topK")
+
+
+def flight_key(flight) -> str:
+    return flight.itinerary or f"{flight.carrier}@{flight.to_dict()['departure']}"
+
+
+def hotel_key(hotel) -> str:
+    return f"{offer_key(hotel)}|{hotel.board}"
+
+
+def _keys(offers, key):
+    """Offer keys in list order; repeats (offers no key tells apart) get a #n suffix."""
+    seen, keys = {}, []
+    for offer in offers:
+        k = key(offer)
+        seen[k] = seen.get(k, 0) + 1
+        keys.append(k if seen[k] == 1 else f"{k}#{seen[k]}")
+    return keys
+
+
+def stay_path(path, origin, start, nights) -> str:
+    """Snapshot path of one stay: results/snapshot.json -> results/snapshot-EMA-2025-08-25-4n.json."""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{str(origin).upper()}-{start}-{nights}n{ext or '.json'}"
+
+
+def load(path):
+    """The snapshot saved at `path`, or None when there is none (or it's unreadable)."""
+    try:
+        with open(path, 'r') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return snapshot if snapshot.get("version") == SNAPSHOT_VERSION else None
+
+
+def save(path, snapshot):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(snapshot, f)
+
+
+def _diff(keys, offers, previous):
+    """(changed positions, unchanged key -> position, counts) for one side."""
+    before = dict(previous)
+    changed, unchanged = [], {}
+    counts = {"new": 0, "repriced": 0, "unchanged": 0, "gone": 0}
+    for pos, (k, offer) in enumerate(zip(keys, offers)):
+        price = before.get(k)
+        if price is None:
+            counts["new"] += 1
+            changed.append(pos)
+        elif price != offer.price_minor:
+            counts["repriced"] += 1
+            changed.append(pos)
+        else:
+            counts["unchanged"] += 1
+            unchanged[k] = pos
+    counts["gone"] = len(before.keys() - set(keys))
+    return changed, unchanged, counts
+
+
+class Run:
+    """
+    One incremental matching run. matches() stands in for matching.iter_matches
+    over the run's eligible offers. Once it has been read, snapshot() is the state
+    to save for the next run and `changes` the change summary.
+    """
+
+    def __init__(self, params, previous=None):
+        self.fields = {field: params.get(field) for field in MATCH_FIELDS}
+        self.limit = params.get("topK")
+        self.previous = previous
+        self.changes = {}
+        self._flights, self._hotels, self._pairs = [], [], []
+
+    def _reusable(self, dropped):
+        previous = self.previous
+        if previous is None:
+            return "no previous snapshot"
+        if previous.get("match") != self.fields:
+            return "search fields changed"
+        if previous.get("limited") and dropped:
+            return "topK deals dropped"
+        return None
+
+    def matches(self, flights, hotels, adults, budget):
+        """(per_person, flight, hotel, total) in iter_matches order for price-sorted `flights` and `hotels`."""
+        flight_keys, hotel_keys = _keys(flights, flight_key), _keys(hotels, hotel_key)
+        self._flights = [[k, f.price_minor] for k, f in zip(flight_keys, flights)]
+        self._hotels = [[k, h.price_minor] for k, h in zip(hotel_keys, hotels)]
+
+        previous = self.previous or {}
+        changed_f, same_f, flight_counts = _diff(flight_keys, flights, previous.get("flights", []))
+        changed_h, same_h, hotel_counts = _diff(hotel_keys, hotels, previous.get("hotels", []))
+        old_flights = [k for k, _ in previous.get("flights", [])]
+        old_hotels = [k for k, _ in previous.get("hotels", [])]
+        kept = []
+        for fi, hi in previous.get("pairs", []):
+            f, h = same_f.get(old_flights[fi]), same_h.get(old_hotels[hi])
+            if f is not None and h is not None:
+                kept.append((f, h))
+        dropped = len(previous.get("pairs", [])) - len(kept)
+
+        reason = self._reusable(dropped)
+        self.changes = {"flights": flight_counts, "hotels": hotel_counts,
+                        "deals": {"kept": 0 if reason else len(kept), "dropped": 0 if reason else dropped},
+                        "mode": "full" if reason else "incremental"}
+        if reason:
+            self.changes["reason"] = reason
+            stream = self._positions(flights, hotels, iter_matches(flights, hotels, adults, budget),
+                                     range(len(flights)), range(len(hotels)))
+        else:
+            stream = heapq.merge(
+                self._kept(kept, flights, hotels, adults),
+                self._positions(flights, hotels, iter_matches([flights[i] for i in changed_f], hotels, adults, budget),
+                                changed_f, range(len(hotels))),
+                self._positions(flights, hotels,
+                                iter_matches([flights[i] for i in sorted(same_f.values())],
+                                             [hotels[j] for j in changed_h], adults, budget),
+                                sorted(same_f.values()), changed_h))
+        return self._record(stream, flights, hotels)
+
+    @staticmethod
+    def _kept(pairs, flights, hotels, adults):
+        rows = []
+        for f, h in pairs:
+            total = flights[f].price_minor + hotels[h].price_minor
+            per_person = total / adults / MINOR_UNITS
+            rows.append((round(per_person, 2), f, h, per_person, total))
+        rows.sort()
+        return iter(rows)
+
+    @staticmethod
+    def _positions(flights, hotels, matches, flight_pos, hotel_pos):
+        """iter_matches over sublists, as rows keyed on positions in the full lists."""
+        flight_at = {id(flights[i]): i for i in flight_pos}
+        hotel_at = {id(hotels[j]): j for j in hotel_pos}
+        for per_person, flight, hotel, total in matches:
+            yield round(per_person, 2), flight_at[id(flight)], hotel_at[id(hotel)], per_person, total
+
+    def _record(self, rows, flights, hotels):
+        for _, f, h, per_person, total in rows:
+            self._pairs.append([f, h])
+            yield per_person, flights[f], hotels[h], total
+
+    def snapshot(self) -> dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "savedAt": datetime.utcnow().isoformat(),
+            "match": self.fields,
+            "flights": self._flights,
+            "hotels": self._hotels,
+            "pairs": self._pairs,
+            "limited": self.limit is not None and len(self._pairs) >= self.limit,
+        }
+
+
+def combine(stay_changes) -> dict:
+    """
+    One change summary for a flexible request from {stay label: changes}. The counts
+    are summed, and each stay's own summary is kept under "stays". It is "full" only
+    if every stay was matched in full.
+    """
+    combined = {side: {"new": 0, "repriced": 0, "unchanged": 0, "gone": 0} for side in ("flights", "hotels")}
+    combined["deals"] = {"kept": 0, "dropped": 0}
+    for changes in stay_changes.values():
+        for side in ("flights", "hotels", "deals"):
+            for name, count in (changes.get(side) or {}).items():
+                combined[side][name] = combined[side].get(name, 0) + count
+    full = [changes for changes in stay_changes.values() if changes.get("mode") == "full"]
+    combined["mode"] = "full" if stay_changes and len(full) == len(stay_changes) else "incremental"
+    if combined["mode"] == "full":
+        combined["reason"] = ", ".join(sorted({changes.get("reason") for changes in full}))
+    combined["stays"] = dict(stay_changes)
+    return combined
+
+
+def describe(changes) -> str:
+    """One-line change summary, e.g. "flights 12 new, 3 repriced, 40 gone; ..."."""
+    parts = []
+    for side in ("flights", "hotels"):
+        counts = changes.get(side) or {}
+        parts.append(f"{side} {counts.get('new', 0)} new, {counts.get('repriced', 0)} repriced, "
+                     f"{counts.get('gone', 0)} gone")
+    deals = changes.get("deals") or {}
+    if changes.get("mode") == "full":
+        parts.append(f"full re-match ({changes.get('reason')})")
+    else:
+        parts.append(f"{deals.get('kept', 0)} deals kept, {deals.get('dropped', 0)} dropped")
+    stays = changes.get("stays")
+    if stays:
+        full = sum(1 for stay in stays.values() if stay.get("mode") == "full")
+        parts.append(f"{len(stays)} stays, {full} matched in full")
+    return "; ".join(parts)
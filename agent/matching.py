@@ -0,0 +1,53 @@
+"""
+Flight x hotel package matching.
+
+select_deals used to pair every flight with every hotel, keep the pairs under
+budget and sort them. With both lists sorted by price the pairs can come out
+already in order instead. A flight's pairs get dearer hotel by hotel, so its
+scan stops at the first hotel that breaks the budget. A flight that can't
+afford even the cheapest hotel ends the search, since every later flight
+costs at least as much. A heap merges the flights' rows cheapest per person
+first.
+
+The order is exactly that of the old stable sort: rounded perPerson, then
+flight order, then hotel order.
+"""
+import heapq
+
+try:
+    from providers.offers import MINOR_UNITS
+except ImportError:
+    # Imported as agent.matching (e.g. via wsgi.py)
+    from agent.providers.offers import MINOR_UNITS
+
+
+def iter_matches(flights, hotels, adults, budget):
+    """
+    (per_person, flight, hotel, total) for every pair within `budget` per person,
+    in rounded per-person order. `flights` and `hotels` are offer records sorted by
+    price_minor; per_person is unrounded pounds and total is minor units.
+    """
+    if not hotels:
+        return
+    cheapest = hotels[0].price_minor
+    heap = []
+    for i, flight in enumerate(flights):
+        total = flight.price_minor + cheapest
+        per_person = total / adults / MINOR_UNITS
+        if per_person > budget:
+            break
+        heap.append((round(per_person, 2), i, 0, per_person, total))
+    heapq.heapify(heap)
+
+    last = len(hotels) - 1
+    while heap:
+        _, i, j, per_person, total = heap[0]
+        flight = flights[i]
+        yield per_person, flight, hotels[j], total
+        if j < last:
+            total = flight.price_minor + hotels[j + 1].price_minor
+            per_person = total / adults / MINOR_UNITS
+            if per_person <= budget:
+                heapq.heapreplace(heap, (round(per_person, 2), i, j + 1, per_person, total))
+                continue
+        heapq.heappop(heap)
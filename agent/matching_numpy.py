@@ -0,0 +1,122 @@
+"""
+NumPy package matcher, for explore/matrix workloads where the flight x hotel
+cross-product runs to millions of pairs.
+
+Flight prices and stops and hotel prices, stars and board codes go into
+arrays. Hotel star/board and flight stop filters become masks. Per-person
+prices are computed by broadcasting one block of flights against the
+affordable hotels at a time, with blocks sized to stay in cache. With a limit,
+each block keeps only what can still make the top K, found with
+argpartition, so memory stays O(K).
+
+The result is the same as matching.iter_matches on the filtered lists, in the
+same order: rounded perPerson, then flight order, then hotel order. Prices use
+the same float expression as the pure-Python matcher. Rounding to pennies is
+vectorised, except for values within a hair of a half penny, which go through
+Python's round() so ties break the same way.
+
+NumPy is optional (pip install numpy); select_deals falls back to the
+pure-Python matcher without it.
+"""
+import numpy as np
+
+try:
+    from hotel_attributes import board_matches
+    from providers.offers import MINOR_UNITS
+except ImportError:
+    # Imported as agent.matching_numpy (e.g. via wsgi.py)
+    from agent.hotel_attributes import board_matches
+    from agent.providers.offers import MINOR_UNITS
+
+# Cells (flights x hotels) per broadcast block: two 8-byte arrays of this
+# size stay within a typical L2 cache.
+BLOCK_CELLS = 1 << 16
+
+# A per-person price at most this far above the K-th best can still round to
+# the same pennies and win on flight/hotel order.
+_TIE_MARGIN = 0.01
+
+
+def _round_pennies(per_person):
+    """round(x, 2) for every element, matching Python's round() exactly."""
+    scaled = per_person * 100
+    rounded = np.round(per_person, 2)
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(per_person[i]), 2)
+    return rounded
+
+
+def _keep_best(per_person, flight_idx, hotel_idx, limit):
+    """Drop candidates that can't make the top `limit`; returns the arrays and the cutoff."""
+    if limit is None or len(per_person) <= limit:
+        return per_person, flight_idx, hotel_idx, None
+    kth = per_person[np.argpartition(per_person, limit - 1)[limit - 1]]
+    keep = per_person <= kth + _TIE_MARGIN
+    return per_person[keep], flight_idx[keep], hotel_idx[keep], kth + _TIE_MARGIN
+
+
+def match(flights, hotels, params, limit=None):
+    """
+    (per_person, flight, hotel, total) tuples, as from matching.iter_matches, for the
+    flights and hotels (each sorted by price_minor) that pass params' filters:
+    minStars, board (see hotel_attributes.board_matches) and optional maxStops. Only the first
+    `limit` are returned when set.
+    """
+    adults, budget = params["adults"], params["budgetPerPerson"]
+    board = params["board"]
+    max_stops = params.get("maxStops")
+
+    codes = {}
+    board_codes = np.fromiter((codes.setdefault(h.board, len(codes)) for h in hotels), np.int64, len(hotels))
+    board_ok = np.array([board_matches(board, name) for name in codes], dtype=bool)
+    stars = np.fromiter((h.stars for h in hotels), np.int64, len(hotels))
+    hotel_ok = (stars >= params["minStars"]) & board_ok[board_codes]
+    hotel_idx = np.flatnonzero(hotel_ok)
+    hotel_prices = np.fromiter((h.price_minor for h in hotels), np.int64, len(hotels))[hotel_idx]
+
+    flight_idx = np.arange(len(flights))
+    if max_stops is not None:
+        stops = np.fromiter((-1 if f.stops is None else f.stops for f in flights), np.int64, len(flights))
+        flight_idx = flight_idx[stops <= max_stops]
+    flight_prices = np.fromiter((f.price_minor for f in flights), np.int64, len(flights))[flight_idx]
+
+    found_pp, found_f, found_h = [np.zeros(0)], [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+    held = 0
+    cutoff = budget
+    if len(hotel_prices) and len(flight_prices):
+        bound = budget * adults * MINOR_UNITS  # total minor units, before the exact per-person check
+        start = 0
+        while start < len(flight_prices):
+            first = int(flight_prices[start])
+            if (first + int(hotel_prices[0])) / adults / MINOR_UNITS > cutoff:
+                break  # flights are sorted, so no later block can do better
+            cols = min(len(hotel_prices), int(np.searchsorted(hotel_prices, bound - first, side="right")) + 1)
+            rows = max(1, BLOCK_CELLS // cols)
+            block = flight_prices[start:start + rows]
+            totals = block[:, None] + hotel_prices[None, :cols]
+            per_person = totals / adults / MINOR_UNITS
+            r, c = np.nonzero((per_person <= budget) & (per_person <= cutoff))
+            pp, fi, hi, _ = _keep_best(per_person[r, c], r + start, c, limit)
+            found_pp.append(pp)
+            found_f.append(fi)
+            found_h.append(hi)
+            held += len(pp)
+            start += rows
+
+            if limit is not None and held > 2 * limit:
+                pp, fi, hi, cutoff = _keep_best(np.concatenate(found_pp), np.concatenate(found_f),
+                                                np.concatenate(found_h), limit)
+                found_pp, found_f, found_h, held = [pp], [fi], [hi], len(pp)
+                cutoff = min(cutoff, budget)
+
+    per_person, fi, hi = np.concatenate(found_pp), np.concatenate(found_f), np.concatenate(found_h)
+    order = np.lexsort((hi, fi, _round_pennies(per_person)))
+    if limit is not None:
+        order = order[:limit]
+
+    matches = []
+    for pp, f, h in zip(per_person[order].tolist(), flight_idx[fi[order]].tolist(), hotel_idx[hi[order]].tolist()):
+        flight, hotel = flights[f], hotels[h]
+        matches.append((pp, flight, hotel, flight.price_minor + hotel.price_minor))
+    return matches
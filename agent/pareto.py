@@ -0,0 +1,126 @@
+"""
+Pareto-frontier package selection.
+
+Every pair under budget is a deal, so a results file can hold thousands of
+near-identical packages. Most of them are dominated: another deal is no
+dearer, has no fewer stars, no more stops and no longer a flight, and is
+strictly better on at least one of those. select() keeps the non-dominated
+deals. With more layers it keeps the frontier of what's left, and so on. Each
+layer can be cut to its cheapest N.
+
+Stars (0-5) and stops (0-MAX_STOPS) take only a few values. The sweep visits
+deals in price order and keeps the shortest flight seen so far for each
+(stars, stops) cell. A deal is dominated when a cell with at least its stars
+and at most its stops already holds a flight no longer than its own. After a
+price level, a small prefix-minimum table over the cells is refreshed. Each
+check is then O(1), and a layer costs one O(n log n) sort.
+
+Unknown stops count as MAX_STOPS. Unknown durations rank after every known
+one.
+"""
+import math
+import re
+from functools import lru_cache
+from itertools import groupby
+
+try:
+    from hotel_attributes import MAX_STARS
+except ImportError:
+    # Imported as agent.pareto (e.g. via wsgi.py)
+    from agent.hotel_attributes import MAX_STARS
+
+MAX_STOPS = 3                # 3 or more stops
+UNKNOWN_MINUTES = 10 ** 6    # after any real flight, before an empty cell (inf)
+
+_HOURS = re.compile(r"(\d+(?:\.\d+)?)\s*h", re.I)
+_MINUTES = re.compile(r"(\d+)\s*m", re.I)
+
+
+def duration_minutes(value) -> float:
+    """Minutes from "2h 45m", "2 hr 45 min", "165 min", "PT2H45M" or a number; UNKNOWN_MINUTES otherwise."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return _parse_minutes(str(value or "").strip())
+
+
+@lru_cache(maxsize=4096)  # a flight's duration text repeats in every deal it's in
+def _parse_minutes(text):
+    if text.isdigit():
+        return float(text)
+    hours, minutes = _HOURS.search(text), _MINUTES.search(text)
+    if not hours and not minutes:
+        return UNKNOWN_MINUTES
+    return (float(hours.group(1)) * 60 if hours else 0) + (int(minutes.group(1)) if minutes else 0)
+
+
+def _clamp(value, top, default):
+    try:
+        return max(0, min(top, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def criteria(deal):
+    """(perPerson, stars, stops, flight minutes) of a deal dict."""
+    hotel, flight = deal.get("hotel") or {}, deal.get("flight") or {}
+    return (deal["perPerson"], _clamp(hotel.get("stars"), MAX_STARS, 0),
+            _clamp(flight.get("stops"), MAX_STOPS, MAX_STOPS), duration_minutes(flight.get("duration")))
+
+
+def _empty():
+    return [[math.inf] * (MAX_STOPS + 1) for _ in range(MAX_STARS + 1)]
+
+
+def _reach(best):
+    """reach[s][t]: shortest flight over cells with stars >= s and stops <= t."""
+    reach = _empty()
+    for s in range(MAX_STARS, -1, -1):
+        for t in range(MAX_STOPS + 1):
+            reach[s][t] = min(best[s][t],
+                              reach[s + 1][t] if s < MAX_STARS else math.inf,
+                              reach[s][t - 1] if t else math.inf)
+    return reach
+
+
+def frontier(deals):
+    """(non-dominated deals, the rest), each cheapest first; equal prices keep their order."""
+    rows = sorted(((criteria(d), i, d) for i, d in enumerate(deals)), key=lambda row: (row[0][0], row[1]))
+    best, reach = _empty(), _empty()  # over deals strictly cheaper than the current price level
+    front, rest = [], []
+    for _, level in groupby(rows, key=lambda row: row[0][0]):
+        level = list(level)
+        local = _empty()
+        for (_, s, t, minutes), _, _ in level:
+            local[s][t] = min(local[s][t], minutes)
+        for (_, s, t, minutes), _, deal in level:
+            dominated = reach[s][t] <= minutes
+            if not dominated and len(level) > 1:
+                # Same price: another cell must be no worse, or this cell strictly better
+                dominated = local[s][t] < minutes or any(
+                    local[s2][t2] <= minutes for s2 in range(s, MAX_STARS + 1) for t2 in range(t + 1)
+                    if (s2, t2) != (s, t))
+            (rest if dominated else front).append(deal)
+        changed = False
+        for s in range(MAX_STARS + 1):
+            for t in range(MAX_STOPS + 1):
+                if local[s][t] < best[s][t]:
+                    best[s][t], changed = local[s][t], True
+        if changed:
+            reach = _reach(best)
+    return front, rest
+
+
+def select(deals, layers=1, per_layer=None):
+    """
+    The first `layers` Pareto layers of `deals`, each cheapest first and cut to
+    `per_layer` deals when set. Each kept deal gets "paretoLayer" (1 = frontier).
+    """
+    rest, kept = list(deals), []
+    for layer in range(1, layers + 1):
+        if not rest:
+            break
+        front, rest = frontier(rest)
+        for deal in front[:per_layer]:
+            deal["paretoLayer"] = layer
+            kept.append(deal)
+    return kept
@@ -0,0 +1,127 @@
+"""
+Query planning for flexible-date searches.
+
+A request with "flexibility": N searches every departure date up to N days
+either side of startDate. With "nightsRange": [min, max] it also searches every
+stay length in that range. Calling every provider for every (date, nights) stay
+costs stays x providers calls, but most calls depend on only part of a stay.
+Google Flights searches the one-way outbound leg and ignores nights. Kiwi
+ignores dates altogether. The planner keys each provider call on the query
+fields its results depend on (the provider's CACHE_FIELDS), so a call shared by
+several stays is made once and its offers are matched for each of them.
+
+With "originRadiusKm" the window also covers every airport within that
+distance of the origin (see airports.py), nearest first and at most
+"maxOrigins" of them. Flight calls are planned per origin; hotel calls don't
+depend on the origin and are shared by all of them.
+"""
+from datetime import date, timedelta
+
+try:
+    import airports
+except ImportError:
+    # Imported as agent.planner (e.g. via wsgi.py)
+    from agent import airports
+
+MAX_ORIGINS = 6
+
+
+def is_flexible(params) -> bool:
+    """True when the request asks for more than its single origin/startDate/nights stay."""
+    return any(params.get(key) for key in ("flexibility", "nightsRange", "originRadiusKm"))
+
+
+def origin_airports(params) -> list:
+    """Origins to search: the configured one, plus its neighbours within originRadiusKm."""
+    radius = params.get("originRadiusKm")
+    if not radius:
+        return [params["origin"]]
+    index = airports.get_index()
+    if params["origin"] not in index:
+        print(f"[WARN] No coordinates for {params['origin']}, searching it alone")
+    limit = int(params.get("maxOrigins") or MAX_ORIGINS)
+    return [code for code, _ in index.nearby(params["origin"], float(radius))[:limit]]
+
+
+def stay_window(params, today=None) -> list:
+    """
+    (startDate, nights) stays to search, in date then nights order.
+
+    Departures run from startDate - flexibility to startDate + flexibility.
+    Past dates are dropped unless startDate itself is already past.
+    Stay lengths come from nightsRange ([min, max], inclusive) and default to nights.
+    """
+    start = date.fromisoformat(params["startDate"])
+    flexibility = max(0, int(params.get("flexibility") or 0))
+    low, high = params.get("nightsRange") or (params["nights"], params["nights"])
+    low, high = int(low), int(high)
+    if low < 1 or high < low:
+        raise ValueError(f"Invalid nightsRange: {params.get('nightsRange')}")
+
+    today = today or date.today()
+    first, last = start - timedelta(days=flexibility), start + timedelta(days=flexibility)
+    if start >= today:
+        first = max(first, today)
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    return [(day.isoformat(), nights) for day in days for nights in range(low, high + 1)]
+
+
+def _canonical(value):
+    return value.strip().upper() if isinstance(value, str) else value
+
+
+class QueryPlan:
+    """
+    The distinct provider calls behind a stay window. Stays are (origin,
+    startDate, nights) triples.
+
+    `providers` maps a provider name to the query fields its results depend on.
+    `calls` maps each distinct call, a (name, field values) key, to the params to
+    send. `stay_calls` lists the calls whose offers belong to each stay.
+    """
+
+    def __init__(self, params, providers, today=None):
+        self.params = params
+        self.fields = dict(providers)
+        self.origins = origin_airports(params)
+        self.stays = [(origin, start, nights) for origin in self.origins
+                      for start, nights in stay_window(params, today)]
+        self.calls = {}
+        self.stay_calls = {}
+        for stay in self.stays:
+            query = self.stay_params(stay)
+            keys = []
+            for name, fields in self.fields.items():
+                key = (name, tuple(_canonical(query.get(field)) for field in fields))
+                self.calls.setdefault(key, query)
+                keys.append(key)
+            self.stay_calls[stay] = keys
+
+    def stay_params(self, stay) -> dict:
+        origin, start, nights = stay
+        return {**self.params, "origin": origin, "startDate": start, "nights": nights}
+
+    def calls_for(self, name) -> list:
+        """(key, params) for each distinct call to provider `name`."""
+        return [(key, query) for key, query in self.calls.items() if key[0] == name]
+
+    def naive_calls(self, names) -> int:
+        """Calls a per-stay fan-out to `names` would make."""
+        return len(self.stays) * len(names)
+
+    def describe(self, key) -> str:
+        """
+        Short label for a call: "2025-08-24/4n", "2025-08-24" for a one-way leg,
+        or "any date"; prefixed with the origin ("BHX 2025-08-24") when
+        several origins are searched.
+        """
+        fields, query = self.fields[key[0]], self.calls[key]
+        if "startDate" not in fields:
+            label = "any date"
+        elif "nights" not in fields:
+            label = query["startDate"]
+        else:
+            label = f"{query['startDate']}/{query['nights']}n"
+        if len(self.origins) > 1 and "origin" in fields:
+            label = f"{query['origin']} {label}"
+        return label
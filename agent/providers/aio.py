@@ -0,0 +1,389 @@
+"""
+Asyncio-native provider interface.
+
+Every provider here implements ``async def search(params) -> list`` on top
+of one shared ``httpx.AsyncClient``, so a single event loop can drive hundreds of
+route/date queries without a thread per call. Request building and response
+normalisation are imported from the blocking provider modules, so both paths
+return identical offer records, and both report to the same per-host circuit breakers
+and quota ledger.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import List, Protocol
+
+import httpx
+
+from . import amadeus, amadeus_auth, amadeus_flights, amadeus_hotels, breakers, booking_com, booking_com_flights, google_flights, jsonstream, kiwi, quota
+from .cache import cached
+
+logger = logging.getLogger(__name__)
+
+# Connection limits for the shared client; keep-alive connections are reused across queries.
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+class AsyncProvider(Protocol):
+    name: str
+    kind: str  # "flights" or "hotels"
+
+    async def search(self, params: dict) -> List[dict]:
+        ...
+
+
+class _GuardedTransport(httpx.AsyncBaseTransport):
+    """Gate each request on its host's circuit breaker and quota pacing, and report the outcome."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        board, ledger = breakers.get_board(), quota.get_ledger()
+        host, url = request.url.host, str(request.url)
+        board.check(host)
+        wait = ledger.pace(url, request.headers)
+        if wait:
+            await asyncio.sleep(wait)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError:
+            board.record(host, False, time.perf_counter() - started)
+            ledger.record(url, request.headers)
+            raise
+        board.record(host, not breakers.is_failure(response.status_code), time.perf_counter() - started,
+                     breakers.retry_after(response.status_code, response.headers))
+        ledger.record(url, request.headers, response.status_code, response.headers)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def make_client(**kwargs) -> httpx.AsyncClient:
+    """Create the AsyncClient shared by all providers for one event loop."""
+    limits = kwargs.pop("limits", httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                               max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS))
+    transport = kwargs.pop("transport", None) or httpx.AsyncHTTPTransport(limits=limits)
+    kwargs["transport"] = _GuardedTransport(transport)
+    kwargs.setdefault("timeout", 30)
+    return httpx.AsyncClient(**kwargs)
+
+
+class _RapidApiSearch(ABC):
+    """Single GET against a RapidAPI host: build -> fetch -> normalise."""
+    name = ""
+    kind = ""
+    timeout = 30
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    @abstractmethod
+    def _request(self, params):
+        """(url, headers, query) for the search, or None when it can't be made."""
+
+    @abstractmethod
+    async def _fetch(self, params, url, headers, query):
+        """Normalised offers from one GET."""
+
+    async def search(self, params: dict) -> List[dict]:
+        request = self._request(params)
+        if not request:
+            return []
+        url, headers, query = request
+        try:
+            return await self._fetch(params, url, headers, query)
+        except Exception as e:
+            print(f"[ERROR] {self.name} async search failed: {e}")
+            return []
+
+
+class _RapidApiJson(_RapidApiSearch):
+    """Reads the whole response body and normalises it with `_parse`."""
+
+    @abstractmethod
+    def _parse(self, params, data):
+        """Normalised offers from the decoded response body."""
+
+    async def _fetch(self, params, url, headers, query):
+        response = await self.client.get(url, headers=headers, params=query, timeout=self.timeout)
+        if response.status_code != 200:
+            print(f"[ERROR] {self.name} API request failed: {response.status_code} for url: {response.url}")
+            return []
+        return self._parse(params, response.json())
+
+
+class _RapidApiStream(_RapidApiSearch):
+    """
+    Decodes the `stream_paths` arrays from the body as it arrives, normalising
+    each element with `_parse_item` as soon as it is complete.
+    """
+    stream_paths = ()
+
+    @abstractmethod
+    def _parse_item(self, params, item):
+        """One decoded array element as an offer, or None to drop it."""
+
+    @abstractmethod
+    def _found(self, params, offers):
+        """The finished offer list (e.g. logged); returns the offers."""
+
+    async def _fetch(self, params, url, headers, query):
+        async with self.client.stream("GET", url, headers=headers, params=query, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                print(f"[ERROR] {self.name} API request failed: {response.status_code} for url: {response.url}")
+                return []
+            offers = []
+            async for item in jsonstream.aiter_response(response, *self.stream_paths):
+                offer = self._parse_item(params, item)
+                if offer is not None:
+                    offers.append(offer)
+            return self._found(params, offers)
+
+
+class GoogleFlights(_RapidApiStream):
+    name = "Google Flights"
+    kind = "flights"
+    stream_paths = google_flights.ITINERARY_PATHS
+
+    def _request(self, params):
+        return google_flights._search_request(params)
+
+    def _parse_item(self, params, item):
+        return google_flights._normalize_flight(item)
+
+    def _found(self, params, offers):
+        return google_flights._found(offers)
+
+    @cached("google_flights", google_flights.CACHE_FIELDS)
+    async def search(self, params: dict) -> List[dict]:
+        return await super().search(params)
+
+
+class BookingFlights(_RapidApiStream):
+    name = "Booking.com Flights"
+    kind = "flights"
+    stream_paths = (booking_com_flights.TRIPS_PATH,)
+
+    def _request(self, params):
+        return booking_com_flights._search_request(params)
+
+    def _parse_item(self, params, item):
+        return booking_com_flights._normalize_flight(item)
+
+    def _found(self, params, offers):
+        return booking_com_flights._found(offers)
+
+    @cached("booking_flights", booking_com_flights.CACHE_FIELDS)
+    async def search(self, params: dict) -> List[dict]:
+        return await super().search(params)
+
+
+class BookingHotels(_RapidApiJson):
+    name = "Booking.com"
+    kind = "hotels"
+
+    def _request(self, params):
+        return booking_com._search_request(params)
+
+    def _parse(self, params, data):
+        return booking_com._parse_search(params, data)
+
+    @cached("booking_hotels", booking_com.CACHE_FIELDS)
+    async def search(self, params: dict) -> List[dict]:
+        return await super().search(params)
+
+
+async def _amadeus_get(client: httpx.AsyncClient, base_url: str, url: str, **kwargs) -> httpx.Response:
+    """GET with the shared Amadeus token (refreshed off the event loop), retrying once on a 401."""
+    manager = amadeus_auth.get_manager(base_url)
+    token = await asyncio.to_thread(manager.token)
+    r = await client.get(url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    if r.status_code == 401:
+        await asyncio.to_thread(manager.invalidate, token)
+        token = await asyncio.to_thread(manager.token)
+        r = await client.get(url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    return r
+
+
+async def _amadeus_items(client: httpx.AsyncClient, base_url: str, url: str, path, **kwargs):
+    """Elements of the array at `path`, yielded as a streamed Amadeus response decodes (one retry on a 401)."""
+    manager = amadeus_auth.get_manager(base_url)
+    token = await asyncio.to_thread(manager.token)
+    for attempt in range(2):
+        async with client.stream("GET", url, headers={"Authorization": f"Bearer {token}"}, **kwargs) as r:
+            if r.status_code == 401 and not attempt:
+                await asyncio.to_thread(manager.invalidate, token)
+                token = await asyncio.to_thread(manager.token)
+                continue
+            r.raise_for_status()
+            async for item in jsonstream.aiter_response(r, path):
+                yield item
+            return
+
+
+async def _amadeus_offer_chunks(client: httpx.AsyncClient, base_url: str, url: str, hotel_ids, query: dict):
+    """Async amadeus_hotels.iter_hotel_offers: chunks run as tasks under a semaphore."""
+    chunks = list(amadeus_hotels.chunk_hotel_ids(hotel_ids))
+    limit = asyncio.Semaphore(amadeus_hotels.OFFER_WORKERS)
+
+    async def fetch(ids):
+        async with limit:
+            r = await _amadeus_get(client, base_url, url, params={**query, "hotelIds": ",".join(ids)}, timeout=30)
+            r.raise_for_status()
+            return r.json().get("data", [])
+
+    failures, last_error = 0, None
+    for next_chunk in asyncio.as_completed([fetch(ids) for ids in chunks]):
+        try:
+            items = await next_chunk
+        except Exception as e:
+            failures, last_error = failures + 1, e
+            print(f"[Amadeus/Hotels] offers chunk failed: {e}")
+            continue
+        for item in items:
+            yield item
+    if chunks and failures == len(chunks):
+        raise last_error
+
+
+class AmadeusFlights:
+    name = "Amadeus Flights"
+    kind = "flights"
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    @cached("amadeus_flights", amadeus_flights.CACHE_FIELDS)
+    async def search(self, params: dict) -> List[dict]:
+        if not (amadeus_flights.CLIENT_ID and amadeus_flights.CLIENT_SECRET):
+            print("[Amadeus/Flights] Missing credentials.")
+            return []
+
+        q = amadeus_flights._search_query(params)
+        offers = _amadeus_items(self.client, amadeus_flights.AMADEUS_BASE, amadeus_flights.OFFERS_URL,
+                                amadeus_flights.DATA_PATH, params=q, timeout=25)
+        results = []
+        async for offer in offers:
+            results.extend(amadeus_flights._normalize_offers([offer]))
+        return results
+
+
+class AmadeusHotels:
+    name = "Amadeus Hotels"
+    kind = "hotels"
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    @cached("amadeus_hotels", amadeus.CACHE_FIELDS)
+    async def search(self, params: dict) -> List[dict]:
+        if not amadeus_auth.has_credentials():
+            raise RuntimeError("AMADEUS_API_KEY and AMADEUS_API_SECRET must be set")
+        check_in, check_out = amadeus._stay_dates(params)
+
+        # Step 1: find hotels near the city (skipped while the reference index is warm)
+        hotel_ids = await asyncio.to_thread(amadeus._indexed_hotel_ids, params)
+        if hotel_ids is None:
+            try:
+                list_res = await _amadeus_get(self.client, amadeus.AMADEUS_BASE_URL, amadeus.HOTEL_LIST_URL,
+                                              params=amadeus._hotel_list_query(params))
+                list_res.raise_for_status()
+            except Exception:
+                logger.exception("[Amadeus] Hotel list API call failed")
+                return []
+            await asyncio.to_thread(amadeus._index_hotel_list, params, list_res.json())
+            hotel_ids = amadeus._hotel_ids(list_res.json())
+        if not hotel_ids:
+            logger.info("[Amadeus] No hotels found for city")
+            return []
+
+        # Step 2: fetch offers for every hotelId, normalising each chunk as it lands
+        offers = _amadeus_offer_chunks(self.client, amadeus.AMADEUS_BASE_URL, amadeus.HOTEL_OFFERS_URL,
+                                       hotel_ids, amadeus._offers_query(params, check_in, check_out))
+        results = []
+        try:
+            async for item in offers:
+                results.extend(amadeus._offer_rows(item))
+        except Exception:
+            logger.exception("[Amadeus] Hotel offers API call failed")
+            return []
+        return results
+
+
+class Kiwi:
+    name = "Kiwi"
+    kind = "flights"
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def _probe(self, headers, src, dst, q) -> List[dict]:
+        try:
+            resp = await self.client.get(kiwi.BASE_URL, headers=headers, params=q, timeout=25)
+            return kiwi._read_response(resp, src, dst)
+        except Exception as e:
+            print(f"[Kiwi] Error for {src} -> {dst}: {e}")
+            return []
+
+    async def _probe_parallel(self, headers, combos, merge) -> List[dict]:
+        """Async kiwi._probe_parallel: lower-priority tasks are cancelled outright."""
+        limit = asyncio.Semaphore(kiwi._probe_workers(combos))
+
+        async def probe(combo):
+            async with limit:
+                return await self._probe(headers, *combo)
+
+        priority = {asyncio.ensure_future(probe(combo)): index for index, combo in enumerate(combos)}
+        pending, found = set(priority), {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        found[priority[task]] = task.result()
+                if found and not merge:
+                    best = min(found)
+                    for task in [t for t in pending if priority[t] > best]:
+                        task.cancel()
+                        pending.discard(task)
+        finally:
+            for task in pending:
+                task.cancel()
+        return kiwi._select(found, merge)
+
+    @cached("kiwi", kiwi.CACHE_FIELDS, kiwi.CACHE_ALIASES)
+    async def search(self, params: dict) -> List[dict]:
+        mode = kiwi._probe_mode(params.get("kiwiMode"))
+        request = kiwi._candidate_requests(params)
+        if not request:
+            return []
+        headers, combos = request
+
+        if mode != "sequential":
+            combos = kiwi._affordable(headers, combos)
+            print(f"[Kiwi] Probing {len(combos)} combinations ({mode}, up to {kiwi._probe_workers(combos)} at once)")
+            return await self._probe_parallel(headers, combos, merge=(mode == "merge"))
+
+        for attempt, (src, dst, q) in enumerate(combos):
+            if attempt and not kiwi._fallback_affordable(headers):
+                break
+            results = await self._probe(headers, src, dst, q)
+            if results:
+                return results
+
+        print("[Kiwi] No results across all fallbacks.")
+        return []
+
+
+def flight_providers(client: httpx.AsyncClient) -> List[AsyncProvider]:
+    """Primary flight providers, in the same order as the sync fan-out."""
+    return [GoogleFlights(client), BookingFlights(client), AmadeusFlights(client)]
+
+
+def hotel_providers(client: httpx.AsyncClient) -> List[AsyncProvider]:
+    return [BookingHotels(client), AmadeusHotels(client)]
@@ -1,98 +1,114 @@
-import os
 import logging
-import requests
+from . import amadeus_auth, amadeus_hotels, hotel_index
+from .cache import cached
+from .offers import HotelOffer, to_minor
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 AMADEUS_BASE_URL = "https://test.api.amadeus.com"
+HOTEL_LIST_URL = f"{AMADEUS_BASE_URL}/v1/reference-data/locations/hotels/by-city"
+HOTEL_OFFERS_URL = f"{AMADEUS_BASE_URL}/v3/shopping/hotel-offers"
 
-def get_amadeus_access_token():
-    client_id = os.getenv("AMADEUS_API_KEY")
-    client_secret = os.getenv("AMADEUS_API_SECRET")
-    if not client_id or not client_secret:
-        raise RuntimeError("AMADEUS_API_KEY and AMADEUS_API_SECRET must be set")
+CACHE_FIELDS = ("destination", "startDate", "nights", "adults")
 
-    print("[INFO] Authenticating with Amadeus...")
-    url = f"{AMADEUS_BASE_URL}/v1/security/oauth2/token"
-    headers = { "Content-Type": "application/x-www-form-urlencoded" }
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret
-    }
-
-    try:
-        res = requests.post(url, headers=headers, data=data)
-        res.raise_for_status()
-    except Exception as e:
-        raise RuntimeError(f"[Amadeus] Token request failed: {e}")
-    return res.json()["access_token"]
-
-def get_amadeus_hotels(params):
-    token = get_amadeus_access_token()
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
+def get_amadeus_access_token():
+    """Bearer token from the shared token manager (see amadeus_auth)."""
+    return amadeus_auth.get_token(AMADEUS_BASE_URL)
 
+def _stay_dates(params):
     check_in = params["startDate"]
     check_out = (datetime.strptime(check_in, "%Y-%m-%d") + timedelta(days=params["nights"])).strftime("%Y-%m-%d")
+    return check_in, check_out
 
-
-       # Step 1: find hotels near the city
-    list_url = f"{AMADEUS_BASE_URL}/v1/reference-data/locations/hotels/by-city"
-    list_params = {
+def _hotel_list_query(params):
+    return {
         "cityCode": params.get("destination", "ALC"),  # Alicante (nearest airport to Benidorm)
         "radius": 30,
         "radiusUnit": "KM"
     }
-    try:
-        list_res = requests.get(list_url, headers=headers, params=list_params)
-        list_res.raise_for_status()
-    except Exception:
-        logger.exception("[Amadeus] Hotel list API call failed")
-        return []
 
-    hotels_data = list_res.json().get("data", [])
-    hotel_ids = [h.get("hotelId") for h in hotels_data if h.get("hotelId")]
-    if not hotel_ids:
-        logger.info("[Amadeus] No hotels found for city")
-        return []
+def _hotel_ids(list_payload):
+    hotels_data = list_payload.get("data", [])
+    return [h.get("hotelId") for h in hotels_data if h.get("hotelId")]
+
+def _index_key(params):
+    q = _hotel_list_query(params)
+    return q["cityCode"], q["radius"], 0
+
+def _indexed_hotel_ids(params):
+    """hotelIds from the hotel reference index, or None when the city needs a Hotel List call."""
+    found = hotel_index.get_index().lookup(*_index_key(params))
+    return found[0] if found else None
 
-    # Step 2: fetch offers for those hotelIds
-    offers_url = f"{AMADEUS_BASE_URL}/v3/shopping/hotel-offers"
-    offers_params = {
-        "hotelIds": ",".join(hotel_ids[:20]),   # limit to first 20 IDs to keep URL manageable
+def _index_hotel_list(params, list_payload):
+    city, radius, min_stars = _index_key(params)
+    records = [hotel_index.hotel_record(h, city, amadeus_hotels._parse_star_value(h.get("rating")))
+               for h in list_payload.get("data", []) if h.get("hotelId")]
+    if records:
+        # Same shape as the variants tried by amadeus_hotels._city_hotels_with_meta
+        variant = {"radius": radius, "source": False, "limit": False, "ratings": False}
+        hotel_index.get_index().store(city, radius, min_stars, variant, records)
+
+def _offers_query(params, check_in, check_out):
+    # hotelIds are added per chunk (see amadeus_hotels.chunk_hotel_ids)
+    return {
         "checkInDate": check_in,
         "checkOutDate": check_out,
         "adults": params["adults"],
         "roomQuantity": 1,
         "currency": "GBP"
     }
+
+def _offer_rows(item):
+    """Normalise one hotel-offers "data" item into a HotelOffer per offer."""
+    hotel = item.get("hotel", {})
+    offers = item.get("offers", [])
+    results = []
+    for offer in offers:
+        board = offer.get("boardType") or offer.get("description", {}).get("text", "Unknown")
+        price_total = offer.get("price", {}).get("total")
+        results.append(HotelOffer(
+            provider="Amadeus",
+            name=hotel.get("name"),
+            stars=hotel.get("rating", 3),
+            rating=hotel.get("rating", 3),
+            board=board,
+            price_minor=to_minor(price_total) or 0,
+            link=hotel.get("contact", {}).get("uri", ""),
+            hotel_id=hotel.get("hotelId"),
+        ))
+    return results
+
+def _parse_offers(offers_payload):
+    return [row for item in offers_payload.get("data", []) for row in _offer_rows(item)]
+
+@cached("amadeus_hotels", CACHE_FIELDS)
+def get_amadeus_hotels(params):
+    if not amadeus_auth.has_credentials():
+        raise RuntimeError("AMADEUS_API_KEY and AMADEUS_API_SECRET must be set")
+    check_in, check_out = _stay_dates(params)
+
+    # Step 1: find hotels near the city (skipped while the reference index is warm)
+    hotel_ids = _indexed_hotel_ids(params)
+    if hotel_ids is None:
+        try:
+            list_res = amadeus_auth.authorized_get(AMADEUS_BASE_URL, HOTEL_LIST_URL, params=_hotel_list_query(params))
+            list_res.raise_for_status()
+        except Exception:
+            logger.exception("[Amadeus] Hotel list API call failed")
+            return []
+        _index_hotel_list(params, list_res.json())
+        hotel_ids = _hotel_ids(list_res.json())
+    if not hotel_ids:
+        logger.info("[Amadeus] No hotels found for city")
+        return []
+
+    # Step 2: fetch offers for every hotelId, normalising each chunk as it lands
+    offers = amadeus_hotels.iter_hotel_offers(AMADEUS_BASE_URL, HOTEL_OFFERS_URL, hotel_ids,
+                                              _offers_query(params, check_in, check_out))
     try:
-        offers_res = requests.get(offers_url, headers=headers, params=offers_params)
-        offers_res.raise_for_status()
+        return [row for item in offers for row in _offer_rows(item)]
     except Exception:
         logger.exception("[Amadeus] Hotel offers API call failed")
         return []
-
-    raw_data = offers_res.json().get("data", [])
-    results = []
-    for item in raw_data:
-        hotel = item.get("hotel", {})
-        offers = item.get("offers", [])
-        for offer in offers:
-            board = offer.get("boardType") or offer.get("description", {}).get("text", "Unknown")
-            price_total = offer.get("price", {}).get("total")
-            results.append({
-                "provider": "Amadeus",
-                "name": hotel.get("name"),
-                "stars": hotel.get("rating", 3),
-                "rating": hotel.get("rating", 3),
-                "board": board,
-                "price": float(price_total) if price_total else 0.0,
-                "link": hotel.get("contact", {}).get("uri", "")
-            })
-
-    return results
-  
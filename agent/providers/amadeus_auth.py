@@ -0,0 +1,213 @@
+"""
+Shared Amadeus OAuth token manager.
+
+One client-credentials token per Amadeus base URL and API key, shared by the
+hotel, hotel-by-city and flight providers. Tokens are kept in memory and in a
+small JSON file (AMADEUS_TOKEN_PATH, next to the provider cache, mode 0600)
+guarded by an flock, so gunicorn workers and back-to-back agent runs reuse one
+token instead of each authenticating. A daemon timer refreshes the token
+REFRESH_AHEAD seconds before it expires, so request paths normally find a warm
+token; a 401 invalidates it and the request is retried once.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from . import sessions
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+DEFAULT_BASE = "https://test.api.amadeus.com"
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "constellation-travel", "amadeus_token.json")
+
+# Foreground callers fetch a new token when the current one has less than
+# MIN_TTL seconds left; the background timer refreshes REFRESH_AHEAD before expiry.
+MIN_TTL = 60
+REFRESH_AHEAD = int(os.getenv("AMADEUS_TOKEN_REFRESH_AHEAD", "300"))
+BACKGROUND_REFRESH = os.getenv("AMADEUS_TOKEN_BACKGROUND", "1") != "0"
+
+
+def _credentials():
+    client_id = os.getenv("AMADEUS_API_KEY")
+    client_secret = os.getenv("AMADEUS_API_SECRET")
+    if not client_id or not client_secret:
+        raise RuntimeError("AMADEUS_API_KEY and AMADEUS_API_SECRET must be set")
+    return client_id, client_secret
+
+
+def has_credentials() -> bool:
+    return bool(os.getenv("AMADEUS_API_KEY") and os.getenv("AMADEUS_API_SECRET"))
+
+
+class TokenManager:
+    def __init__(self, base_url=DEFAULT_BASE, path=None, background=BACKGROUND_REFRESH):
+        self.base_url = base_url.rstrip("/")
+        self.token_url = f"{self.base_url}/v1/security/oauth2/token"
+        self.path = path
+        self.background = background
+        self.stats = {"fetches": 0, "fileHits": 0, "memoryHits": 0, "invalidations": 0}
+        self._token = None
+        self._token_slot = None
+        self._expires_at = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    # ---------- Shared file ----------
+    @contextmanager
+    def _file_lock(self):
+        if not (self.path and fcntl):
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_file(self) -> dict:
+        if not (self.path and os.path.exists(self.path)):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_file(self, slot, token, expires_at):
+        if not self.path:
+            return
+        tokens = self._read_file()
+        tokens = {k: v for k, v in tokens.items() if v.get("expiresAt", 0) > time.time()}
+        tokens[slot] = {"token": token, "expiresAt": expires_at}
+        tmp = f"{self.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        os.replace(tmp, self.path)
+
+    # ---------- Token lifecycle ----------
+    def _slot(self, client_id):
+        return f"{self.base_url}#{hashlib.sha256(client_id.encode()).hexdigest()[:12]}"
+
+    def _fresh(self, min_ttl, slot):
+        if self._token and self._token_slot == slot and self._expires_at - time.time() > min_ttl:
+            return self._token
+        return None
+
+    def token(self) -> str:
+        """A valid bearer token, fetching one only if no process has a fresh one."""
+        token = self._fresh(MIN_TTL, self._slot(_credentials()[0]))
+        if token:
+            self.stats["memoryHits"] += 1
+            return token
+        return self._refresh(MIN_TTL)
+
+    def invalidate(self, token: str):
+        """Drop a token the API rejected; concurrent 401s for the same token refresh once."""
+        with self._lock:
+            if self._token == token:
+                self._token, self._expires_at = None, 0.0
+                self.stats["invalidations"] += 1
+        self._refresh(MIN_TTL, rejected=token)
+
+    def _refresh(self, min_ttl, rejected=None) -> str:
+        client_id, client_secret = _credentials()
+        slot = self._slot(client_id)
+        with self._lock, self._file_lock():
+            token = self._fresh(min_ttl, slot)
+            if token and token != rejected:
+                return token
+            shared = self._read_file().get(slot)
+            if shared and shared["token"] != rejected and shared["expiresAt"] - time.time() > min_ttl:
+                self.stats["fileHits"] += 1
+                self._adopt(slot, shared["token"], shared["expiresAt"])
+                return self._token
+
+            print("[INFO] Authenticating with Amadeus...")
+            try:
+                res = sessions.post(
+                    self.token_url,
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                    data={"grant_type": "client_credentials",
+                          "client_id": client_id,
+                          "client_secret": client_secret},
+                    timeout=15,
+                )
+                res.raise_for_status()
+                data = res.json()
+                token = data["access_token"]
+            except Exception as e:
+                raise RuntimeError(f"[Amadeus] Token request failed: {e}")
+            self.stats["fetches"] += 1
+            expires_at = time.time() + int(data.get("expires_in", 1800))
+            self._write_file(slot, token, expires_at)
+            self._adopt(slot, token, expires_at)
+            return token
+
+    def _adopt(self, slot, token, expires_at):
+        self._token, self._token_slot, self._expires_at = token, slot, expires_at
+        if not self.background:
+            return
+        if self._timer:
+            self._timer.cancel()
+        delay = max(1.0, expires_at - time.time() - REFRESH_AHEAD)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh(REFRESH_AHEAD)
+        except Exception as e:
+            print(f"[WARN] Background Amadeus token refresh failed: {e}")
+
+    def reset(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._token, self._expires_at, self._timer = None, 0.0, None
+
+
+_MANAGERS = {}
+_MANAGERS_LOCK = threading.Lock()
+_PATH = os.getenv("AMADEUS_TOKEN_PATH", DEFAULT_PATH) or None
+
+
+def get_manager(base_url=DEFAULT_BASE) -> TokenManager:
+    key = base_url.rstrip("/")
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(key)
+        if manager is None:
+            manager = _MANAGERS[key] = TokenManager(key, path=_PATH)
+        return manager
+
+
+def get_token(base_url=DEFAULT_BASE) -> str:
+    return get_manager(base_url).token()
+
+
+def authorized_get(base_url, url, headers=None, **kwargs):
+    """GET with the shared bearer token, retrying once with a new token on a 401."""
+    manager = get_manager(base_url)
+    token = manager.token()
+    r = sessions.get(url, headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs)
+    if r.status_code == 401:
+        r.close()
+        manager.invalidate(token)
+        r = sessions.get(url, headers={**(headers or {}), "Authorization": f"Bearer {manager.token()}"}, **kwargs)
+    return r
+
+
+def reset():
+    with _MANAGERS_LOCK:
+        for manager in _MANAGERS.values():
+            manager.reset()
+        _MANAGERS.clear()
@@ -1,46 +1,27 @@
 import os
-import time
-import requests
+from . import amadeus_auth, jsonstream
+from .cache import cached
+from .itinerary import itinerary_key
+from .offers import FlightOffer, to_minor
 from datetime import datetime, timedelta
 
 AMADEUS_BASE = os.getenv("AMADEUS_BASE", "https://test.api.amadeus.com")
 CLIENT_ID = os.getenv("AMADEUS_API_KEY")
 CLIENT_SECRET = os.getenv("AMADEUS_API_SECRET")
 
-_TOKEN = {"value": None, "exp": 0}
+OFFERS_URL = f"{AMADEUS_BASE}/v2/shopping/flight-offers"
 
-def _token():
-    if _TOKEN["value"] and time.time() < _TOKEN["exp"] - 60:
-        return _TOKEN["value"]
-    r = requests.post(
-        f"{AMADEUS_BASE}/v1/security/oauth2/token",
-        data={
-            "grant_type": "client_credentials",
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-        },
-        timeout=15,
-    )
-    r.raise_for_status()
-    data = r.json()
-    _TOKEN["value"] = data["access_token"]
-    _TOKEN["exp"] = time.time() + int(data.get("expires_in", 1800))
-    return _TOKEN["value"]
+CACHE_FIELDS = ("origin", "destination", "startDate", "nights", "adults", "children", "currency", "limit")
+
+# Offers are decoded one at a time from the response stream
+DATA_PATH = ("data",)
 
 def _return_date(start_iso: str, nights: int) -> str:
     y, m, d = map(int, start_iso.split("-"))
     return (datetime(y, m, d) + timedelta(days=int(nights))).date().isoformat()
 
-def search_roundtrip(params: dict) -> list[dict]:
-    """
-    Amadeus Flight Offers Search v2 (round-trip).
-    Required: origin(IATA), destination(IATA), startDate(YYYY-MM-DD), nights(int)
-    Optional: adults, children, currency(GBP), limit(max results)
-    """
-    if not (CLIENT_ID and CLIENT_SECRET):
-        print("[Amadeus/Flights] Missing credentials.")
-        return []
-
+def _search_query(params: dict) -> dict:
+    """Build the Flight Offers Search query shared by the sync and async entry points."""
     origin = (params.get("origin") or "EMA").upper()
     dest = (params.get("destination") or "ALC").upper()
     start = params.get("startDate")
@@ -53,9 +34,6 @@ def search_roundtrip(params: dict) -> list[dict]:
     currency = (params.get("currency") or "GBP").upper()
     max_results = int(params.get("limit", 10))
 
-    tk = _token()
-    headers = {"Authorization": f"Bearer {tk}"}
-
     q = {
         "originLocationCode": origin,
         "destinationLocationCode": dest,
@@ -67,25 +45,17 @@ def search_roundtrip(params: dict) -> list[dict]:
     }
     if children:
         q["children"] = children
+    return q
 
-    r = requests.get(
-        f"{AMADEUS_BASE}/v2/shopping/flight-offers", headers=headers, params=q, timeout=25
-    )
-    if r.status_code == 401:
-        _TOKEN["value"] = None
-        headers["Authorization"] = f"Bearer {_token()}"
-        r = requests.get(
-            f"{AMADEUS_BASE}/v2/shopping/flight-offers", headers=headers, params=q, timeout=25
-        )
-    r.raise_for_status()
-    payload = r.json()
-    data = payload.get("data", [])
+def _parse_offers(payload: dict) -> list[FlightOffer]:
+    return _normalize_offers(payload.get("data", []))
 
+def _normalize_offers(offers) -> list[FlightOffer]:
     out = []
-    for offer in data:
+    for offer in offers:
         price = offer.get("price", {}).get("grandTotal")
         itineraries = offer.get("itineraries", [])
-        dep, arr, carrier = None, None, None
+        dep, arr, carrier, stops, itinerary = None, None, None, None, None
         if itineraries:
             out_seg = itineraries[0].get("segments", [])
             back_seg = itineraries[-1].get("segments", [])
@@ -94,13 +64,38 @@ def search_roundtrip(params: dict) -> list[dict]:
             dep = first.get("departure", {}).get("at") if first else None
             arr = last.get("arrival", {}).get("at") if last else None
             carrier = (first.get("carrierCode") if first else None) or "?"
-        out.append({
-            "provider": "Amadeus Flights",
-            "providerCode": "amadeus",
-            "price": float(price) if price else None,
-            "carrier": carrier,
-            "departure": dep,
-            "arrival": arr,
-            "raw": offer,
-        })
+            stops = max(len(out_seg) - 1, 0)
+            if first:
+                returning = None
+                if len(itineraries) > 1:
+                    returning = (back_seg[0].get("departure", {}).get("at") if back_seg else None) or True
+                itinerary = itinerary_key(carrier, first.get("number"), dep,
+                                          first.get("departure", {}).get("iataCode"), returning)
+        out.append(FlightOffer(
+            provider="Amadeus Flights",
+            provider_code="amadeus",
+            price_minor=to_minor(price),
+            carrier=carrier,
+            departure=dep,
+            arrival=arr,
+            stops=stops,
+            itinerary=itinerary,
+            currency=offer.get("price", {}).get("currency"),
+        ))
     return out
+
+@cached("amadeus_flights", CACHE_FIELDS)
+def search_roundtrip(params: dict) -> list[FlightOffer]:
+    """
+    Amadeus Flight Offers Search v2 (round-trip).
+    Required: origin(IATA), destination(IATA), startDate(YYYY-MM-DD), nights(int)
+    Optional: adults, children, currency(GBP), limit(max results)
+    """
+    if not (CLIENT_ID and CLIENT_SECRET):
+        print("[Amadeus/Flights] Missing credentials.")
+        return []
+
+    q = _search_query(params)
+    r = amadeus_auth.authorized_get(AMADEUS_BASE, OFFERS_URL, params=q, timeout=25, stream=True)
+    r.raise_for_status()
+    return _normalize_offers(jsonstream.iter_response(r, DATA_PATH))
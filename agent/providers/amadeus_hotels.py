@@ -1,33 +1,18 @@
 import os
-import time
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from . import amadeus_auth, hotel_index
+from .cache import cached
+from .offers import HotelOffer, to_minor
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 
 AMADEUS_BASE = os.getenv("AMADEUS_BASE", "https://test.api.amadeus.com")
-CLIENT_ID = os.getenv("AMADEUS_API_KEY")
-CLIENT_SECRET = os.getenv("AMADEUS_API_SECRET")
-
-_TOKEN = {"value": None, "exp": 0}
-
-# ---------- Auth ----------
-def _token() -> str:
-    if _TOKEN["value"] and time.time() < _TOKEN["exp"] - 60:
-        return _TOKEN["value"]
-    if not (CLIENT_ID and CLIENT_SECRET):
-        raise RuntimeError("Missing AMADEUS_API_KEY or AMADEUS_API_SECRET")
-    r = requests.post(
-        f"{AMADEUS_BASE}/v1/security/oauth2/token",
-        data={"grant_type": "client_credentials",
-              "client_id": CLIENT_ID,
-              "client_secret": CLIENT_SECRET},
-        timeout=15,
-    )
-    r.raise_for_status()
-    data = r.json()
-    _TOKEN["value"] = data["access_token"]
-    _TOKEN["exp"] = time.time() + int(data.get("expires_in", 1800))
-    return _TOKEN["value"]
+
+# hotel-offers takes the hotelIds as one comma-separated query value; split the
+# city's full list into chunks that keep each request URL well under 2 KB.
+OFFER_CHUNK_SIZE = int(os.getenv("AMADEUS_OFFER_CHUNK_SIZE", "20"))
+OFFER_CHUNK_CHARS = 1500
+OFFER_WORKERS = int(os.getenv("AMADEUS_OFFER_WORKERS", "4"))
 
 # ---------- Helpers ----------
 def _resolve_city_code(params: dict) -> str:
@@ -80,12 +65,18 @@ def _city_hotels_with_meta(city_code: str, radius_km: int = 30, min_stars: int =
     Captures any star rating present in the response and returns a map: hotelId -> stars.
     Applies resilient fallbacks (radius and param trims) for the sandbox.
     If min_stars > 0, passes ratings filter when supported by the API.
+    Answers from the hotel reference index while the city's entry is fresh;
+    on refresh the variant that worked last time is tried first.
     """
     if not city_code:
         print("[Amadeus/Hotels] Missing city code; cannot query by-city.")
         return [], {}
 
-    headers = {"Authorization": f"Bearer {_token()}"}
+    index = hotel_index.get_index()
+    indexed = index.lookup(city_code, radius_km, min_stars)
+    if indexed:
+        print(f"[Amadeus/Hotels] by-city INDEX city={city_code} -> {len(indexed[0])} hotels")
+        return indexed
 
     def call(city: str, rad: int, use_source: bool, use_limit: bool, ratings_param: bool):
         q = {"cityCode": city, "radius": rad, "radiusUnit": "KM"}
@@ -100,9 +91,9 @@ def _city_hotels_with_meta(city_code: str, radius_km: int = 30, min_stars: int =
             for s in range(min_stars, 6):
                 stars_list.append(str(s))
             q["ratings"] = ",".join(stars_list)
-        return requests.get(
-            f"{AMADEUS_BASE}/v1/reference-data/locations/hotels/by-city",
-            headers=headers, params=q, timeout=20
+        return amadeus_auth.authorized_get(
+            AMADEUS_BASE, f"{AMADEUS_BASE}/v1/reference-data/locations/hotels/by-city",
+            params=q, timeout=20
         )
 
     # Try sequence tuned for sandbox quirks
@@ -113,18 +104,20 @@ def _city_hotels_with_meta(city_code: str, radius_km: int = 30, min_stars: int =
         (city_code, 20, False, False, True),
         (city_code, 20, False, False, False),  # last: no ratings param either
     ]
+    remembered = index.variant(city_code, radius_km, min_stars)
+    if remembered:
+        winner = (city_code, remembered["radius"], remembered["source"], remembered["limit"], remembered["ratings"])
+        tries = [winner] + [t for t in tries if t != winner]
 
     stars_map: Dict[str, int] = {}
     for city, rad, use_source, use_limit, use_ratings in tries:
         r = call(city, rad, use_source, use_limit, use_ratings)
-        if r.status_code == 401:
-            headers["Authorization"] = f"Bearer {_token()}"
-            r = call(city, rad, use_source, use_limit, use_ratings)
 
         if r.status_code == 200:
             data = r.json().get("data", [])
             if data:
                 ids = []
+                records = []
                 for h in data:
                     hid = h.get("hotelId")
                     if not hid:
@@ -136,7 +129,11 @@ def _city_hotels_with_meta(city_code: str, radius_km: int = 30, min_stars: int =
                     star = _parse_star_value(h.get("rating") or h.get("stars") or h.get("category"))
                     if star:
                         stars_map[hid] = star
+                    records.append(hotel_index.hotel_record(h, city, star))
                 print(f"[Amadeus/Hotels] by-city SUCCESS city={city} r={rad} source={use_source} limit={use_limit} ratings={use_ratings} -> {len(ids)} hotels")
+                index.store(city_code, radius_km, min_stars,
+                            {"radius": rad, "source": use_source, "limit": use_limit, "ratings": use_ratings},
+                            records)
                 # If min_stars set but ratings absent, we still return ids; we will not drop them silently.
                 return ids, stars_map
             # 200 but empty -> continue
@@ -146,7 +143,65 @@ def _city_hotels_with_meta(city_code: str, radius_km: int = 30, min_stars: int =
 
     return [], stars_map
 
+# ---------- Hotel offers, chunked ----------
+def chunk_hotel_ids(hotel_ids, size: int = OFFER_CHUNK_SIZE, max_chars: int = OFFER_CHUNK_CHARS):
+    """Split hotelIds (deduplicated, order kept) into URL-safe chunks."""
+    chunk, length = [], 0
+    for hid in dict.fromkeys(hotel_ids):
+        if chunk and (len(chunk) >= size or length + len(hid) + 1 > max_chars):
+            yield chunk
+            chunk, length = [], 0
+        chunk.append(hid)
+        length += len(hid) + 1
+    if chunk:
+        yield chunk
+
+def iter_hotel_offers(base_url: str, url: str, hotel_ids: List[str], query: dict,
+                      timeout: int = 30, workers: int = OFFER_WORKERS):
+    """
+    Fetch offers for every hotelId, one chunk per request on up to `workers`
+    threads, yielding each chunk's "data" items as soon as that chunk lands.
+    A failed chunk is logged and skipped; if every chunk fails the last error
+    is raised.
+    """
+    chunks = list(chunk_hotel_ids(hotel_ids))
+    if not chunks:
+        return
+
+    def fetch(ids):
+        r = amadeus_auth.authorized_get(base_url, url, params={**query, "hotelIds": ",".join(ids)}, timeout=timeout)
+        r.raise_for_status()
+        return r.json().get("data", [])
+
+    print(f"[Amadeus/Hotels] Fetching offers for {len(hotel_ids)} hotels in {len(chunks)} chunk(s)")
+    failures, last_error = 0, None
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks))), thread_name_prefix="amadeus-offers") as pool:
+        futures = {pool.submit(fetch, ids): ids for ids in chunks}
+        for future in as_completed(futures):
+            try:
+                items = future.result()
+            except Exception as e:
+                failures, last_error = failures + 1, e
+                print(f"[Amadeus/Hotels] offers chunk of {len(futures[future])} hotels failed: {e}")
+                continue
+            yield from items
+    if failures == len(chunks):
+        raise last_error
+
+def _cache_query(params: dict) -> dict:
+    return {
+        "city": _resolve_city_code(params),
+        "startDate": params.get("startDate"),
+        "nights": int(params.get("nights", 1)),
+        "adults": int(params.get("adults", 2)),
+        "rooms": int(params.get("roomQuantity", 1)),
+        "currency": params.get("currency") or "GBP",
+        "radius": int(params.get("radius", 30)),
+        "minStars": int(params.get("minStars", 0)),
+    }
+
 # ---------- Public entry point ----------
+@cached("amadeus_hotels_by_city", key=_cache_query)
 def get_amadeus_hotels(params: dict) -> list:
     """
     Flow:
@@ -175,11 +230,8 @@ def get_amadeus_hotels(params: dict) -> list:
         print(f"[Amadeus/Hotels] No hotelIds for {city_code}")
         return []
 
-    # Step 2: one batched v3 call for offers (cap list to keep response lean)
-    hotel_ids = hotel_ids[:30]
-    headers = {"Authorization": f"Bearer {_token()}"}
+    # Step 2: v3 offers for the whole list, in concurrent chunks
     q = {
-        "hotelIds": ",".join(hotel_ids),
         "adults": adults,
         "roomQuantity": rooms,
         "checkInDate": check_in,
@@ -191,17 +243,10 @@ def get_amadeus_hotels(params: dict) -> list:
         "includeClosed": "false",
         "cityCode": city_code,
     }
-    r = requests.get(f"{AMADEUS_BASE}/v3/shopping/hotel-offers", headers=headers, params=q, timeout=30)
-    if r.status_code == 401:
-        headers["Authorization"] = f"Bearer {_token()}"
-        r = requests.get(f"{AMADEUS_BASE}/v3/shopping/hotel-offers", headers=headers, params=q, timeout=30)
-    r.raise_for_status()
-
-    payload = r.json()
-    data = payload.get("data", [])
+    offers = iter_hotel_offers(AMADEUS_BASE, f"{AMADEUS_BASE}/v3/shopping/hotel-offers", hotel_ids, q)
 
     out = []
-    for item in data:
+    for item in offers:
         hotel = item.get("hotel", {}) or {}
         hid = hotel.get("hotelId")
         # Stars from Hotel List fallback map (v3 doesn't include hotel.rating)
@@ -221,16 +266,19 @@ def get_amadeus_hotels(params: dict) -> list:
             if min_stars and stars < min_stars:
                 continue
 
-            out.append({
-                "provider": "Amadeus Hotels",
-                "providerCode": "amadeus",
-                "name": hotel.get("name"),
-                "stars": stars,
-                "board": board,
-                "price": float(price_total) if price_total else None,
-                "checkIn": check_in,
-                "checkOut": check_out,
-                "raw": item,
-            })
+            out.append(HotelOffer(
+                provider="Amadeus Hotels",
+                provider_code="amadeus",
+                name=hotel.get("name"),
+                stars=stars,
+                board=board,
+                price_minor=to_minor(price_total),
+                check_in=check_in,
+                check_out=check_out,
+                hotel_id=hid,
+                latitude=hotel.get("latitude"),
+                longitude=hotel.get("longitude"),
+                currency=(offer.get("price") or {}).get("currency") or currency,
+            ))
 
     return out
@@ -1,5 +1,8 @@
 import os
 import requests
+from . import sessions
+from .cache import cached
+from .offers import HotelOffer, to_minor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -10,7 +13,10 @@ load_dotenv()
 HOST = os.getenv("RAPIDAPI_BOOKING_HOST", "booking-com18.p.rapidapi.com")
 BASE_URL = f"https://{HOST}"
 
-def _normalize_hotel_data(hotel_data: dict) -> dict:
+# Query fields the search depends on (minStars is applied to the parsed results)
+CACHE_FIELDS = ("destination", "startDate", "nights", "adults", "children", "minStars")
+
+def _normalize_hotel_data(hotel_data: dict) -> HotelOffer | None:
     """Normalize Booking.com data to match our standard format"""
     try:
         # Extract price information
@@ -34,42 +40,33 @@ def _normalize_hotel_data(hotel_data: dict) -> dict:
         # Extract booking link
         link = hotel_data.get("bookingLink") or hotel_data.get("url") or ""
         
-        return {
-            "provider": "Booking.com via RapidAPI",
-            "name": name or "Unknown Hotel",
-            "stars": int(stars) if stars else 3,
-            "rating": float(rating) if rating else 3.0,
-            "board": board,
-            "price": float(price) if price else 0.0,
-            "link": link,
-            "location": hotel_info.get("address", {}).get("city") or hotel_data.get("city"),
-            "amenities": hotel_data.get("amenities", [])
-        }
+        return HotelOffer(
+            provider="Booking.com via RapidAPI",
+            name=name or "Unknown Hotel",
+            stars=int(stars) if stars else 3,
+            rating=float(rating) if rating else 3.0,
+            board=board,
+            price_minor=to_minor(price) or 0,
+            link=link,
+            location=hotel_info.get("address", {}).get("city") or hotel_data.get("city"),
+            amenities=hotel_data.get("amenities", []),
+            latitude=hotel_info.get("latitude") or hotel_data.get("latitude"),
+            longitude=hotel_info.get("longitude") or hotel_data.get("longitude"),
+        )
     except Exception as e:
         print(f"[ERROR] Failed to normalize Booking.com data: {e}")
-        return {}
+        return None
 
-def search_booking_hotels(params: dict) -> list[dict]:
+def _search_request(params: dict):
     """
-    Search for hotels using Booking.com via RapidAPI
-    
-    Args:
-        params: Dictionary containing search parameters
-            - destination: Destination city or airport code
-            - startDate: Check-in date (YYYY-MM-DD)
-            - nights: Number of nights
-            - adults: Number of adult guests
-            - children: Number of child guests
-            - board: Board type (e.g., "HB", "BB", "RO")
-            - minStars: Minimum hotel star rating
-    
-    Returns:
-        List of normalized hotel dictionaries
+    Build the stays search request shared by the sync and async entry points.
+
+    Returns (url, headers, query), or None when the API key is missing.
     """
     api_key = os.getenv("RAPIDAPI_BOOKING_KEY")
     if not api_key:
         print("[ERROR] Missing RAPIDAPI_BOOKING_KEY")
-        return []
+        return None
     
     # Calculate check-out date
     check_in = datetime.strptime(params["startDate"], "%Y-%m-%d")
@@ -92,37 +89,63 @@ def search_booking_hotels(params: dict) -> list[dict]:
         "X-RapidAPI-Key": api_key,
         "X-RapidAPI-Host": HOST
     }
+    return f"{BASE_URL}/web/stays/search", headers, search_params
+
+def _parse_search(params: dict, data: dict) -> list[HotelOffer]:
+    """Normalize a stays search response body, applying the minStars filter"""
+    hotels = data.get("result", [])
+    
+    if not hotels:
+        print("[INFO] No Booking.com hotel results found")
+        return []
+    
+    # Normalize and filter results
+    normalized_hotels = []
+    min_stars = params.get("minStars", 3)
+    
+    for hotel in hotels:
+        normalized = _normalize_hotel_data(hotel)
+        if (normalized and 
+            normalized.price_minor > 0 and 
+            normalized.stars >= min_stars):
+            normalized_hotels.append(normalized)
+    
+    print(f"[INFO] Found {len(normalized_hotels)} Booking.com hotel options")
+    return normalized_hotels
+
+@cached("booking_hotels", CACHE_FIELDS)
+def search_booking_hotels(params: dict) -> list[HotelOffer]:
+    """
+    Search for hotels using Booking.com via RapidAPI
+    
+    Args:
+        params: Dictionary containing search parameters
+            - destination: Destination city or airport code
+            - startDate: Check-in date (YYYY-MM-DD)
+            - nights: Number of nights
+            - adults: Number of adult guests
+            - children: Number of child guests
+            - board: Board type (e.g., "HB", "BB", "RO")
+            - minStars: Minimum hotel star rating
+    
+    Returns:
+        List of HotelOffer records
+    """
+    request = _search_request(params)
+    if not request:
+        return []
+    url, headers, search_params = request
     
     try:
         print(f"[INFO] Searching Booking.com hotels in {params.get('destination', 'ALC')}")
-        response = requests.get(
-            f"{BASE_URL}/web/stays/search",
+        response = sessions.get(
+            url,
             headers=headers,
             params=search_params,
             timeout=30
         )
         response.raise_for_status()
-        
-        data = response.json()
-        hotels = data.get("result", [])
-        
-        if not hotels:
-            print("[INFO] No Booking.com hotel results found")
-            return []
-        
-        # Normalize and filter results
-        normalized_hotels = []
-        min_stars = params.get("minStars", 3)
-        
-        for hotel in hotels:
-            normalized = _normalize_hotel_data(hotel)
-            if (normalized and 
-                normalized.get("price", 0) > 0 and 
-                normalized.get("stars", 0) >= min_stars):
-                normalized_hotels.append(normalized)
-        
-        print(f"[INFO] Found {len(normalized_hotels)} Booking.com hotel options")
-        return normalized_hotels
+        return _parse_search(params, response.json())
         
     except requests.exceptions.RequestException as e:
         print(f"[ERROR] Booking.com API request failed: {e}")
@@ -130,6 +153,3 @@ def search_booking_hotels(params: dict) -> list[dict]:
     except Exception as e:
         print(f"[ERROR] Unexpected error in Booking.com search: {e}")
         return []
-
-
-
@@ -1,5 +1,8 @@
 import os
-import requests
+from . import jsonstream, sessions
+from .itinerary import itinerary_key
+from .offers import FlightOffer
+from .cache import cached
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -9,7 +12,13 @@ load_dotenv()
 HOST = os.getenv("RAPIDAPI_BOOKING_HOST", "booking-com18.p.rapidapi.com")
 BASE_URL = f"https://{HOST}"
 
-def _normalize_flight_data(flight_data: dict) -> dict:
+# Query fields the search depends on (passenger counts are not sent)
+CACHE_FIELDS = ("origin", "destination", "startDate", "nights", "cabin")
+
+# Result array decoded one trip at a time from the response stream
+TRIPS_PATH = ("data", "sponsoredTrips")
+
+def _normalize_flight_data(flight_data: dict) -> FlightOffer | None:
     """Normalize Booking.com flight data to match our standard format"""
     try:
         # Extract price information from travelerPrices
@@ -22,13 +31,16 @@ def _normalize_flight_data(flight_data: dict) -> dict:
         
         # Extract airline information from the first segment
         bounds = flight_data.get("bounds", [])
+        carrier_code, flight_number, origin = None, None, None
         if bounds and len(bounds) > 0:
             segments = bounds[0].get("segments", [])
             if segments and len(segments) > 0:
                 first_segment = segments[0]
                 airline = first_segment.get("marketingCarrier", {}).get("name", "Unknown")
+                carrier_code = first_segment.get("marketingCarrier", {}).get("code")
                 flight_number = first_segment.get("flightNumber", "")
                 carrier = f"{airline} {flight_number}".strip()
+                origin = (first_segment.get("departureAirport") or first_segment.get("origin") or {}).get("code")
             else:
                 carrier = "Unknown"
         else:
@@ -63,96 +75,125 @@ def _normalize_flight_data(flight_data: dict) -> dict:
             if segments:
                 stops = len(segments) - 1
         
+        # Round trips come back with the return flight as a second bound
+        returning = None
+        if len(bounds) > 1:
+            back = bounds[-1].get("segments", [])
+            returning = (back[0].get("departuredAt") if back else None) or True
+
         # Extract booking link
         link = flight_data.get("shareableUrl", "")
         
-        return {
-            "provider": "Booking.com Flights via RapidAPI",
-            "price": float(price) / 100 if price else 0.0,  # Convert from cents to dollars
-            "carrier": carrier,
-            "departure": departure_time,
-            "arrival": arrival_time,
-            "link": link,
-            "duration": duration,
-            "stops": stops
-        }
+        return FlightOffer(
+            provider="Booking.com Flights via RapidAPI",
+            price_minor=round(float(price)) if price else 0,  # already in minor units
+            carrier=carrier,
+            departure=departure_time,
+            arrival=arrival_time,
+            link=link,
+            duration=duration,
+            stops=stops,
+            itinerary=itinerary_key(f"{carrier_code} {flight_number}" if carrier_code else carrier,
+                                    departure=departure_time, origin=origin, returning=returning),
+        )
     except Exception as e:
         print(f"[ERROR] Failed to normalize Booking.com flight data: {e}")
-        return {}
+        return None
+
+def _search_request(params: dict):
+    """
+    Build the flight search request shared by the sync and async entry points.
+
+    Returns (url, headers, query), or None when the API key is missing.
+    """
+    api_key = os.getenv("RAPIDAPI_BOOKING_KEY")
+    if not api_key:
+        print("[ERROR] Missing RAPIDAPI_BOOKING_KEY")
+        return None
+    
+    # Calculate return date if needed
+    start_date = datetime.strptime(params["startDate"], "%Y-%m-%d")
+    nights = params.get("nights", 1)
+    return_date = start_date + timedelta(days=nights)
+    
+    # Headers
+    headers = {
+        "X-RapidAPI-Key": api_key,
+        "X-RapidAPI-Host": HOST,
+    }
+    
+    # Determine if this is a round trip or one-way
+    if nights > 1:
+        # Round trip
+        endpoint = "/flights/search-return"
+        search_params = {
+            "fromId": params["origin"],
+            "toId": params["destination"],
+            "departureDate": params["startDate"],
+            "returnDate": return_date.strftime("%Y-%m-%d"),
+            "cabinClass": params.get("cabin", "ECONOMY").upper()
+            # Removed numberOfStops filter to get more results
+        }
+    else:
+        # One-way
+        endpoint = "/flights/search-oneway"
+        search_params = {
+            "fromId": params["origin"],
+            "toId": params["destination"],
+            "departureDate": params["startDate"],
+            "cabinClass": params.get("cabin", "ECONOMY").upper()
+            # Removed numberOfStops filter to get more results
+        }
+    return f"{BASE_URL}{endpoint}", headers, search_params
+
+def _normalize_flight(flight) -> FlightOffer | None:
+    """Normalize one raw trip; None when it fails or has no price"""
+    normalized = _normalize_flight_data(flight)
+    return normalized if normalized and normalized.price_minor > 0 else None
+
+def _found(normalized_flights: list) -> list[FlightOffer]:
+    """Log how many flights were found and return them"""
+    if not normalized_flights:
+        print("[INFO] No Booking.com flight results found")
+        return []
+    
+    print(f"[INFO] Found {len(normalized_flights)} Booking.com flight options")
+    return normalized_flights
 
-def search_booking_flights(params: dict) -> list[dict]:
+def _normalize_flights(flights) -> list[FlightOffer]:
+    """Normalize raw trips (any iterable, e.g. a streamed decode) and drop unpriced ones"""
+    return _found([offer for offer in map(_normalize_flight, flights) if offer])
+
+def _parse_search(data: dict) -> list[FlightOffer]:
+    """Normalize a flight search response body"""
+    # Extract flights from the correct response structure
+    return _normalize_flights(data.get("data", {}).get("sponsoredTrips", []) or [])
+
+@cached("booking_flights", CACHE_FIELDS)
+def search_booking_flights(params: dict) -> list[FlightOffer]:
     """Search for flights using Booking.com API via RapidAPI"""
     try:
-        api_key = os.getenv("RAPIDAPI_BOOKING_KEY")
-        if not api_key:
-            print("[ERROR] Missing RAPIDAPI_BOOKING_KEY")
+        request = _search_request(params)
+        if not request:
             return []
-        
-        # Calculate return date if needed
-        start_date = datetime.strptime(params["startDate"], "%Y-%m-%d")
-        nights = params.get("nights", 1)
-        return_date = start_date + timedelta(days=nights)
-        
-        # Headers
-        headers = {
-            "X-RapidAPI-Key": api_key,
-            "X-RapidAPI-Host": HOST,
-        }
-        
-        # Determine if this is a round trip or one-way
-        if nights > 1:
-            # Round trip
-            endpoint = "/flights/search-return"
-            search_params = {
-                "fromId": params["origin"],
-                "toId": params["destination"],
-                "departureDate": params["startDate"],
-                "returnDate": return_date.strftime("%Y-%m-%d"),
-                "cabinClass": params.get("cabin", "ECONOMY").upper()
-                # Removed numberOfStops filter to get more results
-            }
-        else:
-            # One-way
-            endpoint = "/flights/search-oneway"
-            search_params = {
-                "fromId": params["origin"],
-                "toId": params["destination"],
-                "departureDate": params["startDate"],
-                "cabinClass": params.get("cabin", "ECONOMY").upper()
-                # Removed numberOfStops filter to get more results
-            }
+        url, headers, search_params = request
         
         print(f"[INFO] Searching Booking.com flights: {params['origin']} → {params['destination']}")
         
-        response = requests.get(
-            f"{BASE_URL}{endpoint}",
+        response = sessions.get(
+            url,
             headers=headers,
             params=search_params,
-            timeout=30
+            timeout=30,
+            stream=True
         )
         
         if response.status_code != 200:
             print(f"[ERROR] Booking.com flights API request failed: {response.status_code} {response.reason} for url: {response.url}")
+            response.close()
             return []
         
-        data = response.json()
-        
-        # Extract flights from the correct response structure
-        flights = data.get("data", {}).get("sponsoredTrips", []) or []
-        
-        if not flights:
-            print("[INFO] No Booking.com flight results found")
-            return []
-        
-        # Normalize and filter results
-        normalized_flights = []
-        for flight in flights:
-            normalized = _normalize_flight_data(flight)
-            if normalized and normalized.get("price", 0) > 0:
-                normalized_flights.append(normalized)
-        
-        print(f"[INFO] Found {len(normalized_flights)} Booking.com flight options")
-        return normalized_flights
+        return _normalize_flights(jsonstream.iter_response(response, TRIPS_PATH))
         
     except Exception as e:
         print(f"[ERROR] Booking.com flights search failed: {e}")
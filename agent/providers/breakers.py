@@ -0,0 +1,315 @@
+"""
+Circuit breakers and health scores per provider host.
+
+Every HTTP call made through providers.sessions (and the shared async client
+from providers.aio) reports its outcome to the breaker for its host. A breaker
+trips OPEN when, over the last BREAKER_WINDOW calls, the failure rate or the
+slow-call rate crosses its threshold, or immediately on a 429 carrying a
+Retry-After. While open, calls to that host fail fast with CircuitOpenError.
+After the cool-down one trial call is let through (HALF_OPEN): success closes
+the breaker, failure re-opens it for twice as long.
+
+Failures are transport errors, 5xx, 401, 403 and 429; other 4xx responses are
+about the request, not the host. Each host also keeps a 0-100 health score
+(an EWMA of success, less a latency penalty) that callers use to order
+fallback chains. Open breakers and scores are saved to PROVIDER_HEALTH_PATH so
+the next agent run skips hosts that were down. Disable with PROVIDER_BREAKERS=off.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+MIN_CALLS = 5
+FAILURE_RATE = 0.5
+SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "10"))
+SLOW_CALL_RATE = 0.8
+OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "60"))
+MAX_OPEN_SECONDS = 15 * 60
+
+# Below this score a host is moved to the back of a fallback chain
+DEGRADED_SCORE = 50
+SCORE_ALPHA = 0.2
+
+FAILURE_STATUSES = {401, 403, 429}
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "constellation-travel", "provider_health.json")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose breaker is open."""
+
+
+def is_failure(status_code: int) -> bool:
+    return status_code >= 500 or status_code in FAILURE_STATUSES
+
+
+def retry_after(status_code: int, headers):
+    """Seconds from a 429's Retry-After header, when given as a number."""
+    value = headers.get("Retry-After", "") if status_code == 429 else ""
+    return float(value) if value.isdigit() else None
+
+
+def host_of(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return urlsplit(url_or_host).netloc.lower()
+    return url_or_host.lower()
+
+
+class CircuitBreaker:
+    def __init__(self, host, window=WINDOW, min_calls=MIN_CALLS, failure_rate=FAILURE_RATE,
+                 slow_call_seconds=SLOW_CALL_SECONDS, slow_call_rate=SLOW_CALL_RATE,
+                 open_seconds=OPEN_SECONDS):
+        self.host = host
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        self.open_for = open_seconds
+        self.success_ewma = 1.0
+        self.latency_ewma = None
+        self.stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "trips": 0}
+        self._calls = deque(maxlen=window)  # (failed, slow) per recent call
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    # ---------- State ----------
+    def _cooled_down(self, now):
+        return self.state == OPEN and now - self.opened_at >= self.open_for
+
+    def available(self, now=None) -> bool:
+        """True if a call would currently be let through (without claiming a trial slot)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.state == OPEN:
+                return self._cooled_down(now)
+            return not (self.state == HALF_OPEN and self._trial_in_flight)
+
+    def allow(self, now=None) -> bool:
+        """Claim permission for one call; in HALF_OPEN only a single trial call is allowed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._cooled_down(now):
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record(self, ok: bool, seconds: float, retry_after=None, now=None) -> bool:
+        """Record one call outcome; returns True if the breaker changed state."""
+        now = time.time() if now is None else now
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += not ok
+            self.stats["slow"] += slow
+            self.success_ewma += SCORE_ALPHA * ((1.0 if ok else 0.0) - self.success_ewma)
+            if self.latency_ewma is None:
+                self.latency_ewma = seconds
+            else:
+                self.latency_ewma += SCORE_ALPHA * (seconds - self.latency_ewma)
+
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                if ok and not slow:
+                    self._close()
+                else:
+                    self._trip(now, min(self.open_for * 2, MAX_OPEN_SECONDS))
+                return True
+            if self.state == OPEN:
+                return False  # a call that started before the breaker tripped
+
+            if retry_after:
+                self._trip(now, min(float(retry_after), MAX_OPEN_SECONDS))
+                return True
+            self._calls.append((not ok, slow))
+            if len(self._calls) < self.min_calls:
+                return False
+            failed = sum(f for f, _ in self._calls) / len(self._calls)
+            slowed = sum(s for _, s in self._calls) / len(self._calls)
+            if failed >= self.failure_rate or slowed >= self.slow_call_rate:
+                self._trip(now, self.open_seconds)
+                return True
+            return False
+
+    def _trip(self, now, open_for):
+        self.state = OPEN
+        self.opened_at = now
+        self.open_for = open_for
+        self.stats["trips"] += 1
+        self._calls.clear()
+        print(f"[WARN] Circuit open for {self.host} ({open_for:g}s)")
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self.open_for = self.open_seconds
+        self._calls.clear()
+        print(f"[INFO] Circuit closed for {self.host}")
+
+    # ---------- Health ----------
+    @property
+    def score(self) -> int:
+        """0-100: recent success rate, minus up to 25 points for latency near the slow-call threshold."""
+        latency = self.latency_ewma or 0.0
+        penalty = min(25.0, 25.0 * latency / self.slow_call_seconds)
+        score = 0 if self.state == OPEN else 100 * self.success_ewma - penalty
+        return max(0, min(100, round(score)))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0, round(self.opened_at + self.open_for - time.time()))
+            return {
+                "host": self.host,
+                "state": self.state,
+                "score": self.score,
+                "retryInSeconds": retry_in,
+                "latencyMs": None if self.latency_ewma is None else round(self.latency_ewma * 1000),
+                **self.stats,
+            }
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "openedAt": self.opened_at, "openFor": self.open_for,
+                    "success": self.success_ewma, "latency": self.latency_ewma}
+
+    def restore(self, saved: dict):
+        with self._lock:
+            self.success_ewma = saved.get("success", 1.0)
+            self.latency_ewma = saved.get("latency")
+            if saved.get("state") in (OPEN, HALF_OPEN) and saved.get("openedAt"):
+                # A half-open breaker's trial never finished; treat it as open again.
+                self.state = OPEN
+                self.opened_at = saved["openedAt"]
+                self.open_for = saved.get("openFor", self.open_seconds)
+
+
+class BreakerBoard:
+    """All breakers for this process, keyed by host, with optional JSON persistence."""
+
+    def __init__(self, path=None, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._breakers = {}
+        self._saved = None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # record() saves from the provider thread pool
+
+    def get(self, url_or_host: str) -> CircuitBreaker:
+        host = host_of(url_or_host)
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(host)
+                if breaker is None:
+                    breaker = self._breakers[host] = CircuitBreaker(host)
+                    saved = self._load().get(host)
+                    if saved:
+                        breaker.restore(saved)
+        return breaker
+
+    def allow(self, url_or_host: str) -> bool:
+        return not self.enabled or self.get(url_or_host).allow()
+
+    def available(self, url_or_host: str) -> bool:
+        return not self.enabled or self.get(url_or_host).available()
+
+    def score(self, url_or_host: str) -> int:
+        return self.get(url_or_host).score if self.enabled else 100
+
+    def record(self, url_or_host: str, ok: bool, seconds: float, retry_after=None):
+        if self.enabled and self.get(url_or_host).record(ok, seconds, retry_after):
+            self.save()
+
+    def check(self, url_or_host: str):
+        """Raise CircuitOpenError unless a call to this host may go ahead."""
+        if not self.allow(url_or_host):
+            raise CircuitOpenError(f"Circuit open for {host_of(url_or_host)}")
+
+    def rank(self, entries, host):
+        """
+        Order a fallback chain by health: hosts scoring below DEGRADED_SCORE
+        (including open ones) move to the back, otherwise the given order is
+        kept. `host(entry)` returns an entry's host.
+        """
+        return sorted(entries, key=lambda e: self.score(host(e)) < DEGRADED_SCORE)
+
+    def snapshot(self) -> dict:
+        return {host: breaker.snapshot() for host, breaker in sorted(self._breakers.items())}
+
+    # ---------- Persistence ----------
+    def _load(self) -> dict:
+        if self._saved is None:
+            self._saved = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        self._saved = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"[WARN] Ignoring unreadable provider health file {self.path}: {e}")
+        return self._saved
+
+    def save(self):
+        if not (self.enabled and self.path and self._breakers):
+            return
+        with self._save_lock:
+            state = dict(self._load())
+            state.update({host: breaker.to_dict() for host, breaker in list(self._breakers.items())})
+            tmp = None
+            try:
+                folder = os.path.dirname(self.path) or "."
+                os.makedirs(folder, exist_ok=True)
+                # A temp file of its own, so another process saving at once can't replace it half-written
+                fd, tmp = tempfile.mkstemp(dir=folder, prefix=os.path.basename(self.path), suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"[WARN] Could not save provider health to {self.path}: {e}")
+                if tmp and os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+            self._saved = None
+
+
+_board = BreakerBoard(
+    path=os.getenv("PROVIDER_HEALTH_PATH", DEFAULT_PATH) or None,
+    enabled=os.getenv("PROVIDER_BREAKERS", "on").lower() not in ("0", "off", "false"),
+)
+atexit.register(_board.save)
+
+
+def get_board() -> BreakerBoard:
+    return _board
+
+
+def configure(enabled=None, path=None):
+    if enabled is not None:
+        _board.enabled = bool(enabled)
+    if path is not None:
+        _board.path = path or None
+        _board.reset()
+
+
+def snapshot() -> dict:
+    return _board.snapshot()
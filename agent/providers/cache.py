@@ -0,0 +1,268 @@
+"""
+Two-tier cache for normalised provider results.
+
+L1 is an in-process LRU; L2 is a SQLite file that survives between agent runs
+and app restarts. Offer records (providers.offers) are stored as tagged JSON
+and come back as records. Entries expire per provider (PROVIDER_TTLS). Keys are built
+from only the query fields a provider actually sends, canonicalised and passed
+through optional alias maps, so e.g. Kiwi LHR and LGW share the
+City:london_gb entry.
+
+Expired L2 rows are deleted by purge_expired(), which the agent runs once per
+run and the app once at start, so the file doesn't keep every past query.
+
+Disable with PROVIDER_CACHE=off (or configure(enabled=False)); the L2 location
+is PROVIDER_CACHE_PATH, defaulting to ~/.cache/constellation-travel/.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import offers
+
+HOUR = 3600
+
+# Seconds an entry stays fresh, per provider namespace
+DEFAULT_TTL = 6 * HOUR
+PROVIDER_TTLS = {
+    "google_flights": 6 * HOUR,
+    "booking_flights": 6 * HOUR,
+    "amadeus_flights": 6 * HOUR,
+    "kiwi": 6 * HOUR,
+    "booking_hotels": 24 * HOUR,
+    "amadeus_hotels": 24 * HOUR,
+    "amadeus_hotels_by_city": 24 * HOUR,
+    "google_flights_api": 2 * HOUR,
+    "flights_sky_api": 2 * HOUR,
+    "booking_tipsters_api": 2 * HOUR,
+}
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "constellation-travel", "provider_cache.sqlite3")
+L1_SIZE = int(os.getenv("PROVIDER_CACHE_L1_SIZE", "256"))
+
+
+def _canonical(value):
+    if isinstance(value, str):
+        return value.strip().upper()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def query_key(provider: str, query: dict) -> str:
+    """Stable key for a provider query; field order and code casing don't matter."""
+    canonical = {k: _canonical(v) for k, v in query.items()}
+    digest = hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{provider}:{digest[:32]}"
+
+
+class TieredCache:
+    def __init__(self, path=None, l1_size=L1_SIZE, enabled=True, max_age=None):
+        self.path = path
+        self.l1_size = l1_size
+        self.enabled = enabled
+        self.max_age = max_age  # overrides PROVIDER_TTLS when set
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"hits": 0, "l1Hits": 0, "l2Hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # ---------- L2 (SQLite) ----------
+    def _conn(self):
+        if self._db is None and self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, provider TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _ttl(self, provider):
+        if self.max_age is not None:
+            return self.max_age
+        return PROVIDER_TTLS.get(provider, DEFAULT_TTL)
+
+    # ---------- Public API ----------
+    def get(self, provider: str, key: str, count_miss=True):
+        """
+        Return the cached value, or None on a miss or an expired entry. Pass
+        count_miss=False for a look-ahead whose miss the caller will count.
+        """
+        if not self.enabled:
+            return None
+        ttl = self._ttl(provider)
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry and now - entry[0] <= ttl:
+                self._l1.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["l1Hits"] += 1
+                return entry[1]
+
+            db = self._conn()
+            row = None
+            if db is not None:
+                row = db.execute("SELECT stored_at, value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and now - row[0] <= ttl:
+                value = json.loads(row[1], object_hook=offers.decode)
+                self._remember(key, row[0], value)
+                self.stats["hits"] += 1
+                self.stats["l2Hits"] += 1
+                return value
+
+            if count_miss:
+                self.stats["misses"] += 1
+            return None
+
+    def set(self, provider: str, key: str, value):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            db = self._conn()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (key, provider, stored_at, value) VALUES (?, ?, ?, ?)",
+                    (key, provider, now, json.dumps(value, default=offers.encode)),
+                )
+                db.commit()
+            self.stats["writes"] += 1
+
+    def purge_expired(self):
+        """Drop L2 rows older than their provider TTL; returns the number removed (counted as evictions)."""
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return 0
+            now = time.time()
+            removed = 0
+            for provider, in db.execute("SELECT DISTINCT provider FROM entries").fetchall():
+                cur = db.execute("DELETE FROM entries WHERE provider = ? AND stored_at < ?",
+                                 (provider, now - self._ttl(provider)))
+                removed += cur.rowcount
+            db.commit()
+            self.stats["evictions"] += removed
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM entries")
+                db.commit()
+
+    def _remember(self, key, stored_at, value):
+        self._l1[key] = (stored_at, value)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+            self.stats["evictions"] += 1
+
+
+_cache = TieredCache(
+    path=os.getenv("PROVIDER_CACHE_PATH", DEFAULT_PATH),
+    enabled=os.getenv("PROVIDER_CACHE", "on").lower() not in ("0", "off", "false"),
+)
+
+
+def get_cache() -> TieredCache:
+    return _cache
+
+
+def configure(enabled=None, max_age=None, path=None):
+    """Toggle the shared cache, override entry max age (seconds) or move the L2 file."""
+    if enabled is not None:
+        _cache.enabled = bool(enabled)
+    if max_age is not None:
+        _cache.max_age = max_age
+    if path is not None:
+        _cache.path, _cache._db = path, None
+        _cache._l1.clear()
+
+
+def stats() -> dict:
+    return dict(_cache.stats)
+
+
+def purge_expired() -> int:
+    """Drop the shared cache's expired L2 rows; run once per agent run and at app start."""
+    if not _cache.enabled:
+        return 0
+    try:
+        removed = _cache.purge_expired()
+    except sqlite3.Error as e:
+        print(f"[WARN] Could not purge the provider cache at {_cache.path}: {e}")
+        return 0
+    if removed:
+        print(f"[INFO] Provider cache: purged {removed} expired entries")
+    return removed
+
+
+def cached(provider: str, fields=(), aliases=None, key=None):
+    """
+    Cache a provider search function (sync or async) whose last positional
+    argument is the params dict. Only `fields` of params go into the key, after
+    any `aliases[field](value)` mapping (aliases also see missing values as None). Pass `key` instead to build the key
+    query from the call's arguments directly. Empty results are never cached.
+    The wrapper's peek(*args) returns a call's cached result, or None, without
+    running it; a peek miss is left for the call that follows to count.
+    """
+    aliases = aliases or {}
+
+    def key_for(args, kwargs):
+        if key is not None:
+            query = key(*args, **kwargs)
+        else:
+            params = args[-1] if args else kwargs.get("params", {})
+            query = {}
+            for field in fields:
+                value = params.get(field)
+                if field in aliases:
+                    value = aliases[field](value) or value
+                query[field] = value
+        return query_key(provider, query)
+
+    def peek(*args, **kwargs):
+        return _cache.get(provider, key_for(args, kwargs), count_miss=False)
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key_for(args, kwargs)
+                hit = _cache.get(provider, cache_key)
+                if hit is not None:
+                    return hit
+                result = await fn(*args, **kwargs)
+                if result:
+                    _cache.set(provider, cache_key, result)
+                return result
+            async_wrapper.peek = peek
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache_key = key_for(args, kwargs)
+            hit = _cache.get(provider, cache_key)
+            if hit is not None:
+                return hit
+            result = fn(*args, **kwargs)
+            if result:
+                _cache.set(provider, cache_key, result)
+            return result
+        wrapper.peek = peek
+        return wrapper
+
+    return decorate
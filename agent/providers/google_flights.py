@@ -1,5 +1,9 @@
 import os
 import requests
+from . import jsonstream, sessions
+from .itinerary import itinerary_key
+from .offers import FlightOffer, to_minor
+from .cache import cached
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -10,7 +14,13 @@ load_dotenv()
 HOST = os.getenv("RAPIDAPI_GOOGLE_FLIGHTS_HOST", "google-flights2.p.rapidapi.com")
 BASE_URL = f"https://{HOST}"
 
-def _normalize_flight_data(flight_data: dict) -> dict:
+# Query fields the search depends on (one-way on outbound_date, so no nights)
+CACHE_FIELDS = ("origin", "destination", "startDate", "adults", "cabin")
+
+# Result arrays decoded one flight at a time from the response stream
+ITINERARY_PATHS = (("data", "itineraries", "topFlights"), ("data", "itineraries", "otherFlights"))
+
+def _normalize_flight_data(flight_data: dict) -> FlightOffer | None:
     """Normalize Google Flights data to match our standard format"""
     try:
         # Extract price information
@@ -18,11 +28,13 @@ def _normalize_flight_data(flight_data: dict) -> dict:
         
         # Extract airline information from the first flight segment
         flights = flight_data.get("flights", [])
+        origin = None
         if flights and len(flights) > 0:
             first_flight = flights[0]
             airline = first_flight.get("airline", "Unknown")
             flight_number = first_flight.get("flight_number", "")
             carrier = f"{airline} {flight_number}".strip()
+            origin = (first_flight.get("departure_airport") or {}).get("airport_code")
         else:
             carrier = "Unknown"
         
@@ -40,41 +52,31 @@ def _normalize_flight_data(flight_data: dict) -> dict:
         # Extract booking token
         booking_token = flight_data.get("booking_token", "")
         
-        return {
-            "provider": "Google Flights via RapidAPI",
-            "price": float(price) if price else 0.0,
-            "carrier": carrier,
-            "departure": departure_time,
-            "arrival": arrival_time,
-            "link": f"https://www.google.com/travel/flights?token={booking_token}" if booking_token else "",
-            "duration": duration,
-            "stops": stops
-        }
+        return FlightOffer(
+            provider="Google Flights via RapidAPI",
+            price_minor=to_minor(price) or 0,
+            carrier=carrier,
+            departure=departure_time,
+            arrival=arrival_time,
+            link=f"https://www.google.com/travel/flights?token={booking_token}" if booking_token else "",
+            duration=duration,
+            stops=stops,
+            itinerary=itinerary_key(carrier, departure=departure_time, origin=origin),
+        )
     except Exception as e:
         print(f"[ERROR] Failed to normalize Google Flights data: {e}")
-        return {}
+        return None
 
-def search_google_flights(params: dict) -> list[dict]:
+def _search_request(params: dict):
     """
-    Search for flights using Google Flights via RapidAPI
-    
-    Args:
-        params: Dictionary containing search parameters
-            - origin: Origin airport code (e.g., "EMA")
-            - destination: Destination airport code (e.g., "ALC")
-            - startDate: Departure date (YYYY-MM-DD)
-            - nights: Number of nights for return
-            - adults: Number of adult passengers
-            - children: Number of child passengers
-            - cabin: Cabin class (economy, premium_economy, business, first)
-    
-    Returns:
-        List of normalized flight dictionaries
+    Build the searchFlights request shared by the sync and async entry points.
+
+    Returns (url, headers, query), or None when the API key is missing.
     """
     api_key = os.getenv("RAPIDAPI_GOOGLE_FLIGHTS_KEY")
     if not api_key:
         print("[ERROR] Missing RAPIDAPI_GOOGLE_FLIGHTS_KEY")
-        return []
+        return None
     
     # Calculate return date
     departure_date = datetime.strptime(params["startDate"], "%Y-%m-%d")
@@ -97,44 +99,78 @@ def search_google_flights(params: dict) -> list[dict]:
         "X-RapidAPI-Key": api_key,
         "X-RapidAPI-Host": HOST
     }
+    return f"{BASE_URL}/api/v1/searchFlights", headers, search_params
+
+def _normalize_flight(flight) -> FlightOffer | None:
+    """Normalize one raw itinerary; None when it fails or has no price"""
+    try:
+        normalized = _normalize_flight_data(flight)
+    except Exception as e:
+        print(f"[WARN] Failed to normalize flight: {e}")
+        return None
+    return normalized if normalized and normalized.price_minor > 0 else None
+
+def _found(normalized_flights: list) -> list[FlightOffer]:
+    """Log how many flights were found and return them"""
+    if not normalized_flights:
+        print("[INFO] No Google Flights results found")
+        return []
+    
+    print(f"[INFO] Found {len(normalized_flights)} Google Flights options")
+    return normalized_flights
+
+def _normalize_flights(flights) -> list[FlightOffer]:
+    """Normalize raw itineraries (any iterable, e.g. a streamed decode) and drop unpriced ones"""
+    return _found([offer for offer in map(_normalize_flight, flights) if offer])
+
+def _parse_search(data: dict) -> list[FlightOffer]:
+    """Normalize a searchFlights response body"""
+    # Extract flights from the new response structure
+    itineraries = data.get("data", {}).get("itineraries", {})
+    top_flights = itineraries.get("topFlights", [])
+    other_flights = itineraries.get("otherFlights", [])
+    
+    # Combine all flights
+    return _normalize_flights(top_flights + other_flights)
+
+@cached("google_flights", CACHE_FIELDS)
+def search_google_flights(params: dict) -> list[FlightOffer]:
+    """
+    Search for flights using Google Flights via RapidAPI
+    
+    Args:
+        params: Dictionary containing search parameters
+            - origin: Origin airport code (e.g., "EMA")
+            - destination: Destination airport code (e.g., "ALC")
+            - startDate: Departure date (YYYY-MM-DD)
+            - nights: Number of nights for return
+            - adults: Number of adult passengers
+            - children: Number of child passengers
+            - cabin: Cabin class (economy, premium_economy, business, first)
+    
+    Returns:
+        List of FlightOffer records
+    """
+    request = _search_request(params)
+    if not request:
+        return []
+    url, headers, search_params = request
     
     try:
         print(f"[INFO] Searching Google Flights: {params['origin']} → {params['destination']}")
-        response = requests.get(
-            f"{BASE_URL}/api/v1/searchFlights",
+        response = sessions.get(
+            url,
             headers=headers,
             params=search_params,
-            timeout=30
+            timeout=30,
+            stream=True
         )
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Extract flights from the new response structure
-        itineraries = data.get("data", {}).get("itineraries", {})
-        top_flights = itineraries.get("topFlights", [])
-        other_flights = itineraries.get("otherFlights", [])
-        
-        # Combine all flights
-        all_flights = top_flights + other_flights
-        
-        if not all_flights:
-            print("[INFO] No Google Flights results found")
-            return []
-        
-        # Normalize and filter results
-        normalized_flights = []
-        for flight in all_flights:
-            try:
-                normalized = _normalize_flight_data(flight)
-                if normalized and normalized.get("price", 0) > 0:
-                    normalized_flights.append(normalized)
-            except Exception as e:
-                print(f"[WARN] Failed to normalize flight: {e}")
-                continue
-        
-        print(f"[INFO] Found {len(normalized_flights)} Google Flights options")
-        return normalized_flights
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return _normalize_flights(jsonstream.iter_response(response, *ITINERARY_PATHS))
         
     except requests.exceptions.RequestException as e:
         print(f"[ERROR] Google Flights API request failed: {e}")
@@ -142,6 +178,3 @@ def search_google_flights(params: dict) -> list[dict]:
     except Exception as e:
         print(f"[ERROR] Unexpected error in Google Flights search: {e}")
         return []
-
-
-
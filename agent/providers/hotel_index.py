@@ -0,0 +1,148 @@
+"""
+Local reference index of Amadeus hotels per city.
+
+The by-city Hotel List answer (hotelIds, names, star ratings, coordinates)
+changes rarely, yet every hotel search used to re-fetch it, sometimes walking
+several parameter variants first. This index keeps, per city code and lookup
+(radius, minimum stars), the hotels returned and the parameter variant that
+worked, in a SQLite file next to the provider cache. Warm lookups skip the
+Hotel List call; stale ones try the remembered variant first.
+
+HOTEL_INDEX_PATH moves the file ("" keeps the index in memory),
+HOTEL_INDEX_TTL_DAYS sets how long a city's entry stays fresh (default 14).
+Disable with HOTEL_INDEX=off.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DAY = 86400
+DEFAULT_TTL = float(os.getenv("HOTEL_INDEX_TTL_DAYS", "14")) * DAY
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "constellation-travel", "hotel_index.sqlite3")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS lookups ("
+    " city TEXT NOT NULL, radius INTEGER NOT NULL, min_stars INTEGER NOT NULL,"
+    " variant TEXT, refreshed_at REAL NOT NULL, hotel_ids TEXT NOT NULL,"
+    " PRIMARY KEY (city, radius, min_stars))",
+    "CREATE TABLE IF NOT EXISTS hotels ("
+    " hotel_id TEXT PRIMARY KEY, city TEXT NOT NULL, name TEXT, stars INTEGER,"
+    " latitude REAL, longitude REAL, chain_code TEXT, country_code TEXT, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS hotels_city ON hotels (city)",
+)
+
+
+def hotel_record(item: dict, city: str, stars: int = 0) -> dict:
+    """Reference fields kept from one Hotel List "data" item."""
+    geo = item.get("geoCode") or {}
+    return {
+        "hotelId": item.get("hotelId"),
+        "city": city,
+        "name": item.get("name"),
+        "stars": stars,
+        "latitude": geo.get("latitude"),
+        "longitude": geo.get("longitude"),
+        "chainCode": item.get("chainCode"),
+        "countryCode": (item.get("address") or {}).get("countryCode"),
+    }
+
+
+class HotelIndex:
+    def __init__(self, path=None, ttl=DEFAULT_TTL, enabled=True):
+        self.path = path or ":memory:"
+        self.enabled = enabled
+        self.ttl = ttl
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+        return self._db
+
+    def _row(self, city, radius, min_stars):
+        return self._conn().execute(
+            "SELECT variant, refreshed_at, hotel_ids FROM lookups WHERE city = ? AND radius = ? AND min_stars = ?",
+            (city.upper(), int(radius), int(min_stars))).fetchone()
+
+    def lookup(self, city: str, radius: int, min_stars: int = 0) -> Optional[Tuple[List[str], Dict[str, int]]]:
+        """(hotel_ids, stars_map) for a fresh entry, or None when missing or stale."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._row(city, radius, min_stars)
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if time.time() - row[1] > self.ttl:
+                self.stats["stale"] += 1
+                return None
+            ids = json.loads(row[2])
+            stars = dict(self._conn().execute(
+                f"SELECT hotel_id, stars FROM hotels WHERE stars > 0 AND hotel_id IN ({','.join('?' * len(ids))})",
+                ids).fetchall()) if ids else {}
+            self.stats["hits"] += 1
+            return ids, stars
+
+    def variant(self, city: str, radius: int, min_stars: int = 0) -> Optional[dict]:
+        """The parameter variant that last worked for this lookup, fresh or not."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._row(city, radius, min_stars)
+        return json.loads(row[0]) if row and row[0] else None
+
+    def store(self, city: str, radius: int, min_stars: int, variant: dict, records: List[dict]):
+        if not self.enabled:
+            return
+        now = time.time()
+        city = city.upper()
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                "INSERT OR REPLACE INTO hotels (hotel_id, city, name, stars, latitude, longitude,"
+                " chain_code, country_code, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r["hotelId"], city, r.get("name"), r.get("stars") or 0, r.get("latitude"),
+                  r.get("longitude"), r.get("chainCode"), r.get("countryCode"), now) for r in records])
+            db.execute(
+                "INSERT OR REPLACE INTO lookups (city, radius, min_stars, variant, refreshed_at, hotel_ids)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (city, int(radius), int(min_stars), json.dumps(variant), now,
+                 json.dumps([r["hotelId"] for r in records])))
+            db.commit()
+            self.stats["stores"] += 1
+
+    def hotels(self, city: str) -> List[dict]:
+        """Every indexed hotel for a city code."""
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT hotel_id, city, name, stars, latitude, longitude, chain_code, country_code"
+                " FROM hotels WHERE city = ? ORDER BY hotel_id", (city.upper(),)).fetchall()
+        keys = ("hotelId", "city", "name", "stars", "latitude", "longitude", "chainCode", "countryCode")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM lookups")
+            db.execute("DELETE FROM hotels")
+            db.commit()
+
+
+_index = HotelIndex(
+    path=os.getenv("HOTEL_INDEX_PATH", DEFAULT_PATH) or None,
+    enabled=os.getenv("HOTEL_INDEX", "on").lower() not in ("0", "off", "false"),
+)
+
+
+def get_index() -> HotelIndex:
+    return _index
@@ -0,0 +1,107 @@
+"""
+Canonical itinerary keys for flight offers.
+
+Providers name the same flight differently. Google says "Ryanair FR 4818",
+Amadeus gives the carrier code "FR" with the segment number, and Booking.com
+says "Ryanair 4818". Flights used to be deduped on carrier, price and
+departure, so one physical flight came back once per provider. Each
+normaliser now computes itinerary_key(), from the marketing carrier's IATA
+code, the flight number and the departure instant in UTC. For example
+"FR4818@2025-08-25T05:00Z".
+
+Departures are read with offers.parse_datetime, so ISO 8601 and the
+providers' own formats (Google's "25-08-2025 06:30 AM") key alike. Departure
+times with a UTC offset are converted directly. Times without one
+are local at the origin. The agent's origins are UK, Irish and Channel
+Islands airports (airports.AIRPORTS), which all keep Europe/London's
+offsets. For any other known origin, a naive time is kept as local time, with
+no "Z". An offer without a recognisable flight number gets no key.
+
+Google searches one way, while Booking.com, Amadeus and Kiwi price round
+trips. A round-trip fare is not the same offer as a one-way fare on its
+outbound flight, so round trips get a "+" suffix. The suffix is the return
+leg's local departure date, e.g. "FR4818@2025-08-25T05:00Z+2025-09-01", or
+"+return" when the provider didn't say which return flight it priced. Only
+offers with the same trip type and return date dedupe together.
+"""
+import re
+from datetime import date, datetime, timezone
+
+from .offers import parse_datetime
+
+try:
+    from zoneinfo import ZoneInfo
+    ORIGIN_ZONE = ZoneInfo("Europe/London")
+except Exception:  # no tz database on this platform: naive times stay local
+    ORIGIN_ZONE = None
+
+# Airline names providers put in front of a bare flight number
+AIRLINE_CODES = {
+    "RYANAIR": "FR", "EASYJET": "U2", "JET2": "LS", "TUI": "BY", "TUI AIRWAYS": "BY",
+    "BRITISH AIRWAYS": "BA", "WIZZ AIR": "W6", "VUELING": "VY", "IBERIA": "IB", "AER LINGUS": "EI",
+    "LOGANAIR": "LM", "NORWEGIAN": "DY", "LUFTHANSA": "LH", "KLM": "KL", "AIR FRANCE": "AF",
+    "EUROWINGS": "EW", "VOLOTEA": "V7", "AIR EUROPA": "UX", "TAP AIR PORTUGAL": "TP", "BINTER": "NT",
+    "AURIGNY": "GR", "BLUE ISLANDS": "SI", "EMERALD AIRLINES": "EA", "SAS": "SK", "SWISS": "LX",
+}
+
+# "FR 4818", "FR4818", "U2 2034": a two-character code (with a letter) then the number
+_CODED = re.compile(r"\b([A-Z][A-Z0-9]|[0-9][A-Z])\s?(\d{1,4})[A-Z]?\b")
+_NUMBER = re.compile(r"\b(\d{1,4})\b")
+
+
+def _uk_origin(origin):
+    if origin is None:
+        return True
+    try:
+        from airports import AIRPORTS
+    except ImportError:
+        from agent.airports import AIRPORTS
+    return str(origin).upper() in AIRPORTS
+
+
+def flight_designator(carrier, number=None):
+    """(IATA code, flight number) from provider carrier text and an optional separate number, else None."""
+    text = " ".join(str(part) for part in (carrier, number) if part).upper()
+    match = _CODED.search(text)
+    if match:
+        return match.group(1), int(match.group(2))
+    name = str(carrier or "").upper().strip()
+    for airline in sorted(AIRLINE_CODES, key=len, reverse=True):
+        if name.startswith(airline):
+            digits = _NUMBER.search(text[len(airline):])
+            if digits:
+                return AIRLINE_CODES[airline], int(digits.group(1))
+    return None
+
+
+def departure_utc(departure, origin=None) -> str | None:
+    """Departure instant as "YYYY-MM-DDTHH:MMZ" (UTC), or local "YYYY-MM-DDTHH:MM" when the zone is unknown."""
+    departure = parse_datetime(departure)
+    if not isinstance(departure, datetime):
+        return None
+    if departure.tzinfo is None:
+        if ORIGIN_ZONE is None or not _uk_origin(origin):
+            return departure.strftime("%Y-%m-%dT%H:%M")
+        departure = departure.replace(tzinfo=ORIGIN_ZONE)
+    return departure.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%MZ")
+
+
+def _return_suffix(returning) -> str:
+    if returning is None or returning is False:
+        return ""
+    when = parse_datetime(returning) if returning is not True else None
+    if isinstance(when, date):
+        return f"+{when.strftime('%Y-%m-%d')}"
+    return "+return"
+
+
+def itinerary_key(carrier, number=None, departure=None, origin=None, returning=None) -> str | None:
+    """
+    Canonical key for one flight, e.g. "FR4818@2025-08-25T05:00Z"; None when it can't be formed.
+    For a round trip pass `returning`: the return leg's departure, or True when it is unknown.
+    """
+    designator = flight_designator(carrier, number)
+    when = departure_utc(departure, origin)
+    if designator is None or when is None:
+        return None
+    return f"{designator[0]}{designator[1]}@{when}{_return_suffix(returning)}"
@@ -0,0 +1,179 @@
+"""
+Incremental decoding of the large result arrays in provider responses.
+
+response.json() holds the whole body and the whole decoded tree in memory
+before normalisation copies the offers out again. ArrayStream instead takes the
+body chunk by chunk and hands back the elements of selected arrays one at a
+time, e.g. ("data", "itineraries", "topFlights") for Google Flights. Only the
+objects on the way to those arrays are walked; every other value is decoded
+by the C decoder and dropped, so the largest thing held at once is one element
+(or one unrelated subtree) plus the unread tail of the current chunk.
+
+Paths are keys through nested objects; arrays are only looked into when they
+are a target themselves.
+"""
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+# Characters that can follow a complete value ("" would be the end of the buffer)
+_VALUE_END = frozenset(",]} \t\n\r")
+
+
+class _NeedMore(Exception):
+    """The buffered text ends inside the next token."""
+
+
+class ArrayStream:
+    """Push parser: feed() body chunks, get back the target arrays' elements completed so far."""
+
+    def __init__(self, *paths):
+        self.targets = {tuple(p) for p in paths}
+        self.prefixes = {tuple(p[:i]) for p in self.targets for i in range(len(p))}
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._wait_for = 0  # don't retry a pending token until the buffer reaches this size
+        self._started = False
+        self._stack = []  # [opener, path, state] per open container
+        self._out = []
+
+    def feed(self, data) -> list:
+        if isinstance(data, bytes):
+            data = self._text.decode(data)
+        self._buf += data
+        if len(self._buf) < self._wait_for:
+            return []
+        return self._run()
+
+    def close(self) -> list:
+        """Finish the document; raises ValueError if it was truncated."""
+        self._eof = True
+        self._buf += self._text.decode(b"", final=True)
+        out = self._run()
+        if not self._finished():
+            raise ValueError("Truncated JSON document")
+        return out
+
+    # ---------- Parsing ----------
+    def _finished(self):
+        return self._started and not self._stack
+
+    def _run(self):
+        self._out = out = []
+        while not self._finished():
+            try:
+                self._step()
+            except _NeedMore:
+                break
+        self._buf, self._pos = self._buf[self._pos:], 0
+        # A token that did not fit is retried once the buffer has doubled,
+        # so a huge element costs O(n) decode attempts in total, not O(n^2).
+        self._wait_for = 2 * len(self._buf) if not self._finished() else 0
+        return out
+
+    def _error(self, pos, expected):
+        return ValueError(f"Expected {expected} at char {pos} of buffered JSON")
+
+    def _skip_ws(self, pos):
+        return _WHITESPACE.match(self._buf, pos).end()
+
+    def _peek(self, pos):
+        if pos < len(self._buf):
+            return self._buf[pos]
+        if self._eof:
+            raise ValueError("Truncated JSON document")
+        raise _NeedMore
+
+    def _decode(self, pos, key=False):
+        try:
+            value, end = _DECODER.raw_decode(self._buf, pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            raise _NeedMore
+        if not (key or self._eof) and self._buf[end:end + 1] not in _VALUE_END:
+            raise _NeedMore  # a number cut short ("1.", "2e") may continue in the next chunk
+        return value, end
+
+    def _value(self, path, pos):
+        """Open the container at `path` if a target lies inside it, else decode and drop it."""
+        pos = self._skip_ws(pos)
+        ch = self._peek(pos)
+        if (ch == "[" and path in self.targets) or (ch == "{" and path in self.prefixes):
+            end, frame = pos + 1, [ch, path, "first"]
+        else:
+            _, end = self._decode(pos)
+            frame = None
+        if self._stack:
+            self._stack[-1][2] = "next"
+        if frame:
+            self._stack.append(frame)
+        return end
+
+    def _step(self):
+        """Consume one member, element, separator or closer; all or nothing."""
+        if not self._started:
+            self._pos = self._value((), self._pos)
+            self._started = True
+            return
+        frame = self._stack[-1]
+        opener, path, state = frame
+        closer = "}" if opener == "{" else "]"
+        pos = self._skip_ws(self._pos)
+        ch = self._peek(pos)
+
+        if state != "item" and ch == closer:
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][2] = "next"
+            self._pos = pos + 1
+        elif state == "next":
+            if ch != ",":
+                raise self._error(pos, f"',' or '{closer}'")
+            frame[2] = "item"
+            self._pos = pos + 1
+        elif opener == "[":
+            # Only target arrays are ever opened
+            item, self._pos = self._decode(pos)
+            frame[2] = "next"
+            self._out.append(item)
+        else:
+            if ch != '"':
+                raise self._error(pos, "property name")
+            key, end = self._decode(pos, key=True)
+            end = self._skip_ws(end)
+            if self._peek(end) != ":":
+                raise self._error(end, "':'")
+            self._pos = self._value(path + (key,), end + 1)
+
+
+def iter_items(chunks, *paths):
+    """Elements of the arrays at `paths`, in document order, from an iterable of body chunks."""
+    stream = ArrayStream(*paths)
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    yield from stream.close()
+
+
+def iter_response(response, *paths, chunk_size=CHUNK_SIZE):
+    """iter_items() over a requests response opened with stream=True; closes it when done."""
+    try:
+        yield from iter_items(response.iter_content(chunk_size=chunk_size), *paths)
+    finally:
+        response.close()
+
+
+async def aiter_response(response, *paths):
+    """Async counterpart of iter_response() for an httpx streaming response."""
+    stream = ArrayStream(*paths)
+    async for chunk in response.aiter_bytes():
+        for item in stream.feed(chunk):
+            yield item
+    for item in stream.close():
+        yield item
@@ -1,5 +1,9 @@
 import os
-import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import quota, sessions
+from .cache import cached
+from .itinerary import itinerary_key
+from .offers import FlightOffer, to_minor
 from urllib.parse import quote
 
 # Optional overrides (handy if the vendor ever changes host/path)
@@ -7,6 +11,17 @@ HOST = os.getenv("RAPIDAPI_KIWI_HOST", "kiwi-com-cheap-flights.p.rapidapi.com")
 PATH = os.getenv("RAPIDAPI_KIWI_PATH", "/round-trip")
 BASE_URL = f"https://{HOST}{PATH}"
 
+# How the origin/destination fallback matrix is walked (params["kiwiMode"] overrides):
+#   sequential  one combination at a time, first non-empty wins
+#   parallel    probe concurrently in priority order; the highest-priority
+#               non-empty combination wins and lower-priority probes are cancelled
+#   merge       probe concurrently and union the results of every combination
+PROBE_MODES = ("sequential", "parallel", "merge")
+PROBE_MODE = os.getenv("KIWI_PROBE_MODE", "sequential")
+# Probes run at once; unset (0) runs every combination together, so when all
+# of them time out the whole chain still costs about one timeout
+MAX_CONCURRENT_PROBES = int(os.getenv("KIWI_MAX_CONCURRENT_PROBES", "0"))
+
 # Map IATA to this vendor's City:slug format
 IATA_TO_CITY = {
     "EMA": "City:nottingham_gb",
@@ -31,7 +46,21 @@ ORIGIN_FALLBACK_CHAIN = [
 def _iata_to_city(iata: str | None) -> str | None:
     return IATA_TO_CITY.get((iata or "").upper())
 
-def _normalise(data_item: dict) -> dict:
+def _probe_mode(mode: str | None) -> str:
+    mode = mode or PROBE_MODE
+    if mode not in PROBE_MODES:
+        raise ValueError(f"Unknown Kiwi probe mode '{mode}', expected one of {PROBE_MODES}")
+    return mode
+
+def _result_shape(mode: str | None) -> str:
+    # sequential and parallel return the same first-hit results; merge differs
+    return "merge" if _probe_mode(mode) == "merge" else "first"
+
+# Dates aren't sent to this endpoint; airports sharing a city slug share results
+CACHE_FIELDS = ("origin", "destination", "adults", "children", "limit", "kiwiMode")
+CACHE_ALIASES = {"origin": _iata_to_city, "destination": _iata_to_city, "kiwiMode": _result_shape}
+
+def _normalise(data_item: dict) -> FlightOffer:
     price_info = data_item.get("price")
     if isinstance(price_info, dict):
         price = price_info.get("amount")
@@ -49,35 +78,36 @@ def _normalise(data_item: dict) -> dict:
     if isinstance(route, list) and route:
         departure = route[0].get("local_departure")
         arrival = route[-1].get("local_arrival")
+        back = [leg for leg in route if leg.get("return")]
+        returning = (back[0].get("local_departure") if back else None) or True  # round-trip endpoint
+        itinerary = itinerary_key(route[0].get("airline") or carrier, route[0].get("flight_no"),
+                                  route[0].get("utc_departure") or departure, route[0].get("flyFrom"), returning)
     else:
         departure = data_item.get("departure")
         arrival = data_item.get("arrival")
+        itinerary = itinerary_key(carrier, data_item.get("flight_no"), departure, returning=True)
 
     link = data_item.get("booking_link") or data_item.get("deep_link") or ""
 
-    return {
-        "provider": "Kiwi via RapidAPI",
-        "price": price,
-        "carrier": carrier or "?",
-        "departure": departure,
-        "arrival": arrival,
-        "link": link,
-    }
+    return FlightOffer(
+        provider="Kiwi via RapidAPI",
+        price_minor=to_minor(price),
+        carrier=carrier or "?",
+        departure=departure,
+        arrival=arrival,
+        link=link,
+        itinerary=itinerary,
+    )
 
-def get_kiwi_deals(params: dict) -> list[dict]:
+def _candidate_requests(params: dict):
     """
-    Calls the RapidAPI 'round-trip' endpoint with a resilient fallback chain:
-    1) Try city slug that corresponds to the requested origin IATA (e.g., EMA→City:nottingham_gb)
-    2) Fall back to BHX, MAN, then London catch (LHR/LGW) city slugs
-    3) Finally fall back to Country:GB
-    Destination tries the requested city slug (e.g., ALC→City:alicante_es) then Country:ES.
-
-    Returns a list of normalised flight dicts or [] if nothing found.
+    Build headers plus the ordered (src, dst, query) fallback combinations shared
+    by the sync and async entry points. Returns None when the API key is missing.
     """
     api_key = os.getenv("RAPIDAPI_KIWI_KEY")
     if not api_key:
         print("[Kiwi] Missing RAPIDAPI_KIWI_KEY")
-        return []
+        return None
 
     # Headers
     headers = {
@@ -89,10 +119,11 @@ def get_kiwi_deals(params: dict) -> list[dict]:
     requested_origin_iata = (params.get("origin") or "EMA").upper()
     origin_candidates_iata = [requested_origin_iata] + [c for c in ORIGIN_FALLBACK_CHAIN if c != requested_origin_iata]
 
+    # Airports sharing a city slug (LHR, LGW) would probe the same pair twice
     origin_candidates = []
     for iata in origin_candidates_iata:
         city = _iata_to_city(iata)
-        if city:
+        if city and city not in origin_candidates:
             origin_candidates.append(city)
     # Ensure country-level last
     origin_candidates.append("Country:GB")
@@ -133,35 +164,140 @@ def get_kiwi_deals(params: dict) -> list[dict]:
         "limit": params.get("limit", 5),
     }
 
-    # Try combinations until we get non-empty data
+    combos = []
     for src in origin_candidates:
         for dst in dest_candidates:
             q = base_query.copy()
             # Some vendors require these to be URL-encoded; quote() avoids issues with ":" and "_"
             q["source"] = quote(src, safe="")
             q["destination"] = quote(dst, safe="")
+            combos.append((src, dst, q))
+    return headers, combos
+
+def _payload_items(payload) -> list:
+    if isinstance(payload, list):
+        return payload
+    return payload.get("data", [])
+
+def _fallback_affordable(headers, calls=1) -> bool:
+    """Fallback combos are optional spend; stop once the key is down to its quota reserve."""
+    if quota.get_ledger().allows(BASE_URL, headers, calls=calls, optional=True):
+        return True
+    print("[Kiwi] Quota reserve reached, skipping remaining fallbacks.")
+    return False
+
+def _read_response(resp, src, dst) -> list[FlightOffer]:
+    """Normalised results from one combination's response, or [] when unusable."""
+    if resp.status_code != 200:
+        # Soft-fail and try the next combo
+        print(f"[Kiwi] HTTP {resp.status_code} for {src} -> {dst}")
+        return []
+
+    data = _payload_items(resp.json())
+    if not data:
+        print(f"[Kiwi] 200 OK but empty for {src} -> {dst}")
+        return []
+
+    results = [_normalise(item) for item in data]
+    print(f"[Kiwi] Found {len(results)} result(s) for {src} -> {dst}")
+    return results
+
+def _probe(headers, src, dst, q) -> list[FlightOffer]:
+    try:
+        resp = sessions.get(BASE_URL, headers=headers, params=q, timeout=25)
+        return _read_response(resp, src, dst)
+    except Exception as e:
+        print(f"[Kiwi] Error for {src} -> {dst}: {e}")
+        return []
 
-            try:
-                resp = requests.get(BASE_URL, headers=headers, params=q, timeout=25)
-                if resp.status_code != 200:
-                    # Soft-fail and try the next combo
-                    print(f"[Kiwi] HTTP {resp.status_code} for {src} -> {dst}")
-                    continue
-
-                payload = resp.json()
-                data = payload.get("data", payload if isinstance(payload, list) else [])
-                if not data:
-                    print(f"[Kiwi] 200 OK but empty for {src} -> {dst}")
-                    continue
-
-                # Return first non-empty result set
-                results = [_normalise(item) for item in data]
-                print(f"[Kiwi] Found {len(results)} result(s) for {src} -> {dst}")
-                return results
-
-            except Exception as e:
-                print(f"[Kiwi] Error for {src} -> {dst}: {e}")
-                continue
+def _dedupe(items) -> list[FlightOffer]:
+    seen, unique = set(), []
+    for item in items:
+        key = (item.carrier, item.price_minor, item.departure, item.arrival)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+def _select(found: dict, merge: bool) -> list[FlightOffer]:
+    """
+    Combine probe results keyed by combination priority (0 = best): the
+    highest-priority non-empty set, or for merge the union of all of them.
+    """
+    if not found:
+        print("[Kiwi] No results across all fallbacks.")
+        return []
+    if merge:
+        merged = _dedupe(item for index in sorted(found) for item in found[index])
+        print(f"[Kiwi] Merged {len(merged)} result(s) from {len(found)} combination(s)")
+        return merged
+    return found[min(found)]
+
+def _probe_workers(combos) -> int:
+    return max(1, MAX_CONCURRENT_PROBES or len(combos))
+
+def _probe_parallel(headers, combos, merge) -> list[FlightOffer]:
+    """
+    Probe combinations on up to _probe_workers() threads, submitted in
+    priority order. Unless merging, a hit cancels every lower-priority probe
+    (queued ones never start; running ones are abandoned) while higher-priority
+    probes still in flight are awaited.
+    """
+    pool = ThreadPoolExecutor(max_workers=_probe_workers(combos), thread_name_prefix="kiwi")
+    priority = {pool.submit(_probe, headers, *combo): index for index, combo in enumerate(combos)}
+    pending, found = set(priority), {}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.result():
+                    found[priority[future]] = future.result()
+            if found and not merge:
+                best = min(found)
+                for future in [f for f in pending if priority[f] > best]:
+                    future.cancel()
+                    pending.discard(future)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return _select(found, merge)
+
+def _affordable(headers, combos):
+    """The primary combination plus every fallback, if the quota reserve allows them all."""
+    if len(combos) > 1 and not _fallback_affordable(headers, calls=len(combos) - 1):
+        return combos[:1]
+    return combos
+
+@cached("kiwi", CACHE_FIELDS, CACHE_ALIASES)
+def get_kiwi_deals(params: dict) -> list[FlightOffer]:
+    """
+    Calls the RapidAPI 'round-trip' endpoint with a resilient fallback chain:
+    1) Try city slug that corresponds to the requested origin IATA (e.g., EMA→City:nottingham_gb)
+    2) Fall back to BHX, MAN, then London catch (LHR/LGW) city slugs
+    3) Finally fall back to Country:GB
+    Destination tries the requested city slug (e.g., ALC→City:alicante_es) then Country:ES.
+
+    params["kiwiMode"] (default KIWI_PROBE_MODE) picks how the chain is walked,
+    see PROBE_MODES. Returns a list of normalised flight dicts or [] if nothing found.
+    """
+    mode = _probe_mode(params.get("kiwiMode"))
+    request = _candidate_requests(params)
+    if not request:
+        return []
+    headers, combos = request
+
+    if mode != "sequential":
+        combos = _affordable(headers, combos)
+        print(f"[Kiwi] Probing {len(combos)} combinations ({mode}, up to {_probe_workers(combos)} at once)")
+        return _probe_parallel(headers, combos, merge=(mode == "merge"))
+
+    # Try combinations until we get non-empty data
+    for attempt, (src, dst, q) in enumerate(combos):
+        if attempt and not _fallback_affordable(headers):
+            break
+        results = _probe(headers, src, dst, q)
+        if results:
+            # Return first non-empty result set
+            return results
 
     # If we reach here, nothing matched across all fallbacks
     print("[Kiwi] No results across all fallbacks.")
@@ -0,0 +1,240 @@
+"""
+Typed flight and hotel offers.
+
+Provider normalisers return FlightOffer / HotelOffer records instead of
+free-form dicts. The records use __slots__. Prices are integer minor units
+(pence), so matching adds ints rather than re-parsing floats. Repeated strings
+(provider, carrier, board) are interned, and departure/arrival times are parsed
+once. Raw provider payloads are not kept.
+
+Records become the usual dicts only at the output boundary: to_dict(), the
+provider cache (encode/decode) and JSON results. Older callers can still read
+record["price"] or record.get("price") and get the dict value, e.g. the price
+in pounds.
+"""
+import sys
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+
+MINOR_UNITS = 100
+
+# Provider time formats besides ISO 8601 (Booking.com: "25-08-2025 05:00 PM")
+_DATETIME_FORMATS = ("%d-%m-%Y %I:%M %p", "%d-%m-%Y %H:%M", "%d/%m/%Y %H:%M")
+
+# Tag stored with records in the provider cache's JSON
+RECORD_TAG = "__offer__"
+
+
+def to_minor(value):
+    """Minor units from a number or numeric string; None when absent or unparsable."""
+    if value is None or value == "":
+        return None
+    try:
+        return round(float(value) * MINOR_UNITS)
+    except (TypeError, ValueError):
+        return None
+
+
+def from_minor(value):
+    return None if value is None else value / MINOR_UNITS
+
+
+def parse_datetime(value):
+    """datetime for ISO 8601 and known provider formats; anything else is kept as given."""
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        pass
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return value
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _float(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _Offer(ABC):
+    __slots__ = ()
+    KIND = ""
+    FIELDS = {}  # dict key -> constructor keyword, for from_dict()
+
+    @abstractmethod
+    def to_dict(self) -> dict:
+        """The offer as the normalised dict providers used to return."""
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Build a record from a normalised offer dict; unknown keys are kept in `extra`."""
+        kwargs, extra = {}, {}
+        for key, value in data.items():
+            if key in cls.FIELDS:
+                kwargs[cls.FIELDS[key]] = value
+            else:
+                extra[key] = value
+        if "price" in kwargs:
+            kwargs["price_minor"] = to_minor(kwargs.pop("price"))
+        return cls(extra=extra or None, **kwargs)
+
+    def _with_extra(self, out):
+        return {**self.extra, **out} if self.extra else out
+
+    # Read-only mapping view for callers that still index offers like dicts
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def get(self, key, default=None):
+        return self.to_dict().get(key, default)
+
+    def __eq__(self, other):
+        if isinstance(other, _Offer):
+            return self.KIND == other.KIND and self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class FlightOffer(_Offer):
+    __slots__ = ("provider", "price_minor", "carrier", "departure", "arrival", "link",
+                 "duration", "stops", "itinerary", "provider_code", "currency", "extra")
+    KIND = "flight"
+    FIELDS = {"provider": "provider", "price": "price", "carrier": "carrier", "departure": "departure",
+              "arrival": "arrival", "link": "link", "duration": "duration", "stops": "stops",
+              "itinerary": "itinerary", "providerCode": "provider_code", "currency": "currency"}
+
+    def __init__(self, provider=None, price_minor=None, carrier=None, departure=None, arrival=None, link=None,
+                 duration=None, stops=None, itinerary=None, provider_code=None, currency=None, extra=None):
+        self.provider = _intern(provider)
+        self.price_minor = price_minor
+        self.carrier = _intern(carrier)
+        self.departure = parse_datetime(departure)
+        self.arrival = parse_datetime(arrival)
+        self.link = link
+        self.duration = duration
+        self.stops = _int(stops)
+        self.itinerary = itinerary  # canonical flight key, see itinerary.py
+        self.provider_code = _intern(provider_code)
+        self.currency = _intern(currency)
+        self.extra = extra
+
+    def to_dict(self) -> dict:
+        out = {"provider": self.provider}
+        if self.provider_code is not None:
+            out["providerCode"] = self.provider_code
+        out.update({
+            "price": from_minor(self.price_minor),
+            "carrier": self.carrier,
+            "departure": _iso(self.departure),
+            "arrival": _iso(self.arrival),
+        })
+        for key, value in (("link", self.link), ("duration", self.duration), ("stops", self.stops),
+                           ("itinerary", self.itinerary), ("currency", self.currency)):
+            if value is not None:
+                out[key] = value
+        return self._with_extra(out)
+
+
+class HotelOffer(_Offer):
+    __slots__ = ("provider", "name", "stars", "board", "price_minor", "rating", "link", "location",
+                 "amenities", "check_in", "check_out", "hotel_id", "latitude", "longitude", "provider_code",
+                 "currency", "extra")
+    KIND = "hotel"
+    FIELDS = {"provider": "provider", "name": "name", "stars": "stars", "board": "board", "price": "price",
+              "rating": "rating", "link": "link", "location": "location", "amenities": "amenities",
+              "checkIn": "check_in", "checkOut": "check_out", "hotelId": "hotel_id",
+              "latitude": "latitude", "longitude": "longitude", "providerCode": "provider_code",
+              "currency": "currency"}
+
+    def __init__(self, provider=None, name=None, stars=0, board="", price_minor=None, rating=None, link=None,
+                 location=None, amenities=None, check_in=None, check_out=None, hotel_id=None,
+                 latitude=None, longitude=None, provider_code=None, currency=None, extra=None):
+        self.provider = _intern(provider)
+        self.name = name
+        self.stars = _int(stars, 0)
+        self.board = _intern(board or "")
+        self.price_minor = price_minor
+        self.rating = rating
+        self.link = link
+        self.location = location
+        self.amenities = tuple(amenities) if amenities else None
+        self.check_in = check_in
+        self.check_out = check_out
+        self.hotel_id = hotel_id
+        self.latitude = _float(latitude)
+        self.longitude = _float(longitude)
+        self.provider_code = _intern(provider_code)
+        self.currency = _intern(currency)
+        self.extra = extra
+
+    def to_dict(self) -> dict:
+        out = {"provider": self.provider}
+        if self.provider_code is not None:
+            out["providerCode"] = self.provider_code
+        out.update({"name": self.name, "stars": self.stars})
+        if self.rating is not None:
+            out["rating"] = self.rating
+        out.update({"board": self.board, "price": from_minor(self.price_minor)})
+        for key, value in (("link", self.link), ("location", self.location),
+                           ("amenities", list(self.amenities) if self.amenities is not None else None),
+                           ("checkIn", self.check_in), ("checkOut", self.check_out),
+                           ("hotelId", self.hotel_id), ("latitude", self.latitude),
+                           ("longitude", self.longitude), ("currency", self.currency)):
+            if value is not None:
+                out[key] = value
+        return self._with_extra(out)
+
+
+RECORD_TYPES = {FlightOffer.KIND: FlightOffer, HotelOffer.KIND: HotelOffer}
+
+
+def as_flight(offer) -> FlightOffer:
+    """A FlightOffer for a record or a legacy/cached offer dict."""
+    return FlightOffer.from_dict(offer) if isinstance(offer, dict) else offer
+
+
+def as_hotel(offer) -> HotelOffer:
+    return HotelOffer.from_dict(offer) if isinstance(offer, dict) else offer
+
+
+def encode(value):
+    """json.dumps default= hook: records become tagged dicts, anything else a string."""
+    if hasattr(value, "KIND") and hasattr(value, "to_dict"):
+        return {RECORD_TAG: value.KIND, **value.to_dict()}
+    return str(value)
+
+
+def decode(obj: dict):
+    """json.loads object_hook= counterpart of encode()."""
+    kind = obj.get(RECORD_TAG)
+    if kind not in RECORD_TYPES:
+        return obj
+    return RECORD_TYPES[kind].from_dict({k: v for k, v in obj.items() if k != RECORD_TAG})
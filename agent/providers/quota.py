@@ -0,0 +1,306 @@
+"""
+Quota ledger and request pacing for the RapidAPI and Amadeus keys.
+
+Every outbound call made through providers.sessions (and the shared async
+client from providers.aio) is recorded per account in a SQLite ledger next to
+the provider cache. An account is one API key on one host, since RapidAPI
+quotas are per subscription; the key itself is only stored as a short hash.
+
+Rate-limit headers (x-ratelimit-requests-*, x-ratelimit-*, ratelimit-*) update
+the known monthly limit and remaining count; otherwise the remaining budget is
+the configured monthly limit minus calls logged this calendar month. Calls are
+paced per account by a token bucket of `perSecond` tokens.
+
+Budgets come from DEFAULT_BUDGETS, overridden by QUOTA_BUDGETS, a JSON object
+keyed by host, e.g. {"kiwi-com-cheap-flights.p.rapidapi.com": {"monthly": 500,
+"perSecond": 1}}. Optional calls (fallbacks) are refused once an account is
+down to QUOTA_RESERVE of its monthly limit. Disable with QUOTA_LEDGER=off.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+DEFAULT_PER_SECOND = float(os.getenv("QUOTA_PER_SECOND", "5"))
+# Share of the monthly limit kept back for primary calls
+RESERVE = float(os.getenv("QUOTA_RESERVE", "0.1"))
+KEEP_DAYS = 62
+
+DEFAULT_BUDGETS = {
+    # Amadeus self-service test environment allows 10 transactions per second
+    "test.api.amadeus.com": {"perSecond": 10},
+}
+
+# Environment variables that hold keys, used to label accounts in reports
+KEY_ENV_VARS = (
+    "RAPIDAPI_KEY",
+    "RAPIDAPI_GOOGLE_FLIGHTS_KEY",
+    "RAPIDAPI_BOOKING_KEY",
+    "RAPIDAPI_SKYSCRAPER_KEY",
+    "RAPIDAPI_KIWI_KEY",
+    "RAPIDAPI_FLIGHTS_SKY_KEY",
+    "RAPIDAPI_BOOKING_TIPSTERS_KEY",
+    "AMADEUS_API_KEY",
+)
+
+# Keys config.py falls back to when their own variable is unset, in order
+KEY_FALLBACKS = {
+    "RAPIDAPI_FLIGHTS_SKY_KEY": ("RAPIDAPI_SKYSCRAPER_KEY", "RAPIDAPI_KEY"),
+    "RAPIDAPI_BOOKING_TIPSTERS_KEY": ("RAPIDAPI_BOOKING_KEY", "RAPIDAPI_KEY"),
+}
+
+RATE_LIMIT_HEADERS = (
+    ("x-ratelimit-requests-limit", "x-ratelimit-requests-remaining", "x-ratelimit-requests-reset"),
+    ("x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset"),
+    ("ratelimit-limit", "ratelimit-remaining", "ratelimit-reset"),
+)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "constellation-travel", "quota.sqlite3")
+
+
+def _fingerprint(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def _host(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return urlsplit(url_or_host).netloc.lower()
+    return url_or_host.lower()
+
+
+def account_for(url: str, headers=None) -> str:
+    """Ledger account for a request: the host, plus the RapidAPI key hash when one is sent."""
+    host = _host(url)
+    key = None
+    for name, value in (headers or {}).items():
+        if name.lower() == "x-rapidapi-key":
+            key = value
+    return f"{host}#{_fingerprint(key)}" if key else host
+
+
+def _month_start(now: float) -> float:
+    dt = datetime.fromtimestamp(now, timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def parse_rate_limit(headers):
+    """(limit, remaining, reset_seconds) from the first rate-limit header family present."""
+    for limit_name, remaining_name, reset_name in RATE_LIMIT_HEADERS:
+        remaining = _header_int(headers, remaining_name)
+        if remaining is not None:
+            return _header_int(headers, limit_name), remaining, _header_int(headers, reset_name)
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class QuotaLedger:
+    def __init__(self, path=None, enabled=True, budgets=None):
+        self.path = path
+        self.enabled = enabled
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self._buckets = {}
+        self._limits = {}  # account -> {"limit", "remaining", "resetAt"} from headers
+        self._lock = threading.Lock()
+        self._db = None
+        self._memory_calls = {}  # account -> [timestamps] when there is no L2 file
+
+    # ---------- Store ----------
+    def _conn(self):
+        if self._db is None and self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS calls ("
+                " at REAL NOT NULL, account TEXT NOT NULL, host TEXT NOT NULL, status INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS calls_account_at ON calls (account, at)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS limits ("
+                " account TEXT PRIMARY KEY, lim INTEGER, remaining INTEGER, reset_at REAL)"
+            )
+            self._db.execute("DELETE FROM calls WHERE at < ?", (time.time() - KEEP_DAYS * 86400,))
+            self._db.commit()
+            for account, lim, remaining, reset_at in self._db.execute("SELECT * FROM limits"):
+                self._limits[account] = {"limit": lim, "remaining": remaining, "resetAt": reset_at}
+        return self._db
+
+    def _budget(self, host):
+        return self.budgets.get(host, {})
+
+    # ---------- Recording and pacing ----------
+    def pace(self, url: str, headers=None) -> float:
+        """Reserve a slot in the account's token bucket; returns seconds to wait first."""
+        if not self.enabled:
+            return 0.0
+        account = account_for(url, headers)
+        bucket = self._buckets.get(account)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    account, TokenBucket(self._budget(_host(url)).get("perSecond", DEFAULT_PER_SECOND)))
+        return bucket.reserve()
+
+    def record(self, url: str, headers=None, status=None, response_headers=None):
+        if not self.enabled:
+            return
+        account, host, now = account_for(url, headers), _host(url), time.time()
+        rate_limit = parse_rate_limit(response_headers or {})
+        with self._lock:
+            db = self._conn()
+            if db is not None:
+                db.execute("INSERT INTO calls (at, account, host, status) VALUES (?, ?, ?, ?)",
+                           (now, account, host, status))
+            else:
+                self._memory_calls.setdefault(account, []).append(now)
+            if rate_limit:
+                limit, remaining, reset = rate_limit
+                known = self._limits.get(account, {})
+                entry = {
+                    "limit": limit if limit is not None else known.get("limit"),
+                    "remaining": remaining,
+                    "resetAt": now + reset if reset is not None else known.get("resetAt"),
+                }
+                self._limits[account] = entry
+                if db is not None:
+                    db.execute("INSERT OR REPLACE INTO limits VALUES (?, ?, ?, ?)",
+                               (account, entry["limit"], entry["remaining"], entry["resetAt"]))
+            if db is not None:
+                db.commit()
+
+    # ---------- Planning ----------
+    def _used_this_month(self, account, now):
+        since = _month_start(now)
+        db = self._conn()
+        if db is None:
+            return sum(1 for at in self._memory_calls.get(account, ()) if at >= since)
+        return db.execute("SELECT COUNT(*) FROM calls WHERE account = ? AND at >= ?",
+                          (account, since)).fetchone()[0]
+
+    def _accounts(self):
+        """Every account seen, mapped to its host."""
+        with self._lock:
+            db = self._conn()
+            if db is not None:
+                accounts = dict(db.execute("SELECT DISTINCT account, host FROM calls"))
+            else:
+                accounts = {a: a.partition("#")[0] for a in self._memory_calls}
+            accounts.update({a: a.partition("#")[0] for a in list(self._buckets) + list(self._limits)})
+        return accounts
+
+    def _account_budget(self, account, host):
+        now = time.time()
+        with self._lock:
+            used = self._used_this_month(account, now)
+            known = self._limits.get(account)
+        limit = self._budget(host).get("monthly")
+        remaining = None if limit is None else max(0, limit - used)
+        if known and (known["resetAt"] is None or known["resetAt"] > now):
+            limit = known["limit"] if known["limit"] is not None else limit
+            remaining = known["remaining"]
+        return {"account": account, "limit": limit, "used": used, "remaining": remaining}
+
+    def budget(self, url: str, headers=None) -> dict:
+        """
+        Known limit, calls used this month and remaining budget (None when
+        unknown). Without a key in `headers` this is the tightest budget of
+        any account seen on the host.
+        """
+        host = _host(url)
+        account = account_for(url, headers)
+        if account != host:
+            return self._account_budget(account, host)
+        budgets = [self._account_budget(a, h) for a, h in self._accounts().items() if h == host]
+        known = [b for b in budgets if b["remaining"] is not None]
+        if known:
+            return min(known, key=lambda b: b["remaining"])
+        return budgets[0] if budgets else self._account_budget(host, host)
+
+    def allows(self, url: str, headers=None, calls=1, optional=False) -> bool:
+        """
+        Whether `calls` more requests fit the remaining budget. Optional calls
+        must also leave RESERVE of the monthly limit untouched. Accounts with
+        no known budget are always allowed.
+        """
+        if not self.enabled:
+            return True
+        budget = self.budget(url, headers)
+        if budget["remaining"] is None:
+            return True
+        reserve = RESERVE * budget["limit"] if optional and budget["limit"] else 0
+        return budget["remaining"] - calls >= reserve
+
+    def snapshot(self) -> dict:
+        if not self.enabled:
+            return {}
+        labels = {}
+        for name in KEY_ENV_VARS:
+            value = next(filter(None, map(os.getenv, (name,) + KEY_FALLBACKS.get(name, ()))), None)
+            if value:
+                labels.setdefault(_fingerprint(value), []).append(name)
+        report = {}
+        for account, host in sorted(self._accounts().items()):
+            budget = self._account_budget(account, host)
+            report[account] = {
+                "host": host,
+                "keys": labels.get(account.partition("#")[2], ["AMADEUS_API_KEY"] if "amadeus" in host else []),
+                "limit": budget["limit"],
+                "usedThisMonth": budget["used"],
+                "remaining": budget["remaining"],
+                "perSecond": self._budget(host).get("perSecond", DEFAULT_PER_SECOND),
+            }
+        return report
+
+
+def _env_budgets():
+    raw = os.getenv("QUOTA_BUDGETS")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        print(f"[WARN] Ignoring invalid QUOTA_BUDGETS: {e}")
+        return {}
+
+
+_ledger = QuotaLedger(
+    path=os.getenv("QUOTA_LEDGER_PATH", DEFAULT_PATH) or None,
+    enabled=os.getenv("QUOTA_LEDGER", "on").lower() not in ("0", "off", "false"),
+    budgets=_env_budgets(),
+)
+
+
+def get_ledger() -> QuotaLedger:
+    return _ledger
+
+
+def snapshot() -> dict:
+    return _ledger.snapshot()
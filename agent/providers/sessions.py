@@ -0,0 +1,114 @@
+"""
+Shared keep-alive HTTP sessions, one connection pool per provider host.
+
+Module-level requests.get/post open a fresh TCP+TLS connection on every call.
+Routing calls through get()/post() here reuses a warm pooled connection to the
+same RapidAPI or Amadeus host instead. Pool sizes and keep-alive can be tuned
+with HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE and HTTP_KEEP_ALIVE=0.
+
+Every call is also gated by and reported to the host's circuit breaker
+(see providers.breakers); calls to an open host raise CircuitOpenError. Calls
+are paced and logged per API key by the quota ledger (providers.quota).
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import breakers, quota
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+KEEP_ALIVE = os.getenv("HTTP_KEEP_ALIVE", "1") != "0"
+
+_SESSIONS = {}
+_LOCK = threading.Lock()
+_settings = {
+    "pool_connections": POOL_CONNECTIONS,
+    "pool_maxsize": POOL_MAXSIZE,
+    "keep_alive": KEEP_ALIVE,
+}
+
+
+def _host(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return urlsplit(url_or_host).netloc.lower()
+    return url_or_host.lower()
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=_settings["pool_connections"],
+                          pool_maxsize=_settings["pool_maxsize"])
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not _settings["keep_alive"]:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def get_session(url_or_host: str) -> requests.Session:
+    """Return the pooled session for a host (or any URL on that host)."""
+    host = _host(url_or_host)
+    session = _SESSIONS.get(host)
+    if session is None:
+        with _LOCK:
+            session = _SESSIONS.get(host)
+            if session is None:
+                session = _SESSIONS[host] = _new_session()
+    return session
+
+
+def configure(pool_connections=None, pool_maxsize=None, keep_alive=None):
+    """Change pool settings; existing sessions are closed and rebuilt lazily."""
+    with _LOCK:
+        if pool_connections is not None:
+            _settings["pool_connections"] = int(pool_connections)
+        if pool_maxsize is not None:
+            _settings["pool_maxsize"] = int(pool_maxsize)
+        if keep_alive is not None:
+            _settings["keep_alive"] = bool(keep_alive)
+        _close_locked()
+
+
+def close_all():
+    with _LOCK:
+        _close_locked()
+
+
+def _close_locked():
+    for session in _SESSIONS.values():
+        session.close()
+    _SESSIONS.clear()
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    board, ledger = breakers.get_board(), quota.get_ledger()
+    board.check(url)
+    headers = kwargs.get("headers")
+    wait = ledger.pace(url, headers)
+    if wait:
+        time.sleep(wait)
+    started = time.perf_counter()
+    try:
+        response = get_session(url).request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        board.record(url, False, time.perf_counter() - started)
+        ledger.record(url, headers)
+        raise
+    board.record(url, not breakers.is_failure(response.status_code),
+                 time.perf_counter() - started,
+                 breakers.retry_after(response.status_code, response.headers))
+    ledger.record(url, headers, response.status_code, response.headers)
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
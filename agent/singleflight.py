@@ -0,0 +1,68 @@
+"""
+Single-flight request coalescing for the Flask API.
+
+Concurrent callers asking for the same key share one in-flight computation:
+the first caller (the leader) runs it, everyone else blocks until it finishes
+and receives the same result or exception. Works across the threads of a
+gunicorn gthread worker; each worker process coalesces independently.
+"""
+import hashlib
+import json
+import threading
+
+
+def body_key(route: str, body) -> str:
+    """Canonical hash of a JSON request body, scoped to a route."""
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{route}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"requests": 0, "executions": 0, "deduplicated": 0}
+
+    def do(self, key: str, fn):
+        """Run fn() once per key at a time; concurrent duplicates get its result."""
+        with self._lock:
+            self.stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["executions"] += 1
+            else:
+                call.waiters += 1
+                self.stats["deduplicated"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "inFlight": len(self._calls)}
@@ -0,0 +1,26 @@
+import os
+
+# Keep provider results out of the shared on-disk cache while testing;
+# cache tests build their own TieredCache against tmp_path.
+os.environ.setdefault("PROVIDER_CACHE", "off")
+
+# Likewise keep circuit breakers from tripping across tests on mocked failures;
+# breaker tests enable them explicitly. Never persist provider health.
+os.environ.setdefault("PROVIDER_BREAKERS", "off")
+os.environ.setdefault("PROVIDER_HEALTH_PATH", "")
+
+# Quota ledger tests build their own QuotaLedger; keep the shared one in memory.
+os.environ.setdefault("QUOTA_LEDGER_PATH", "")
+
+# Amadeus tokens stay in memory; token tests pass their own file path.
+os.environ.setdefault("AMADEUS_TOKEN_PATH", "")
+
+# The hotel reference index would let one test's by-city answer satisfy the next;
+# index tests build their own HotelIndex.
+os.environ.setdefault("HOTEL_INDEX", "off")
+os.environ.setdefault("HOTEL_INDEX_PATH", "")
+
+# Hotel aliases resolved in one test would carry over to the next;
+# identity tests build their own AliasTable.
+os.environ.setdefault("HOTEL_ALIASES", "off")
+os.environ.setdefault("HOTEL_ALIAS_PATH", "")
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import aio
+from agent.travel_deal_agent import evaluate_deals_async
+
+
+def sample_params():
+    return {
+        "origin": "EMA",
+        "destination": "ALC",
+        "startDate": "2024-09-01",
+        "nights": 4,
+        "adults": 2,
+        "children": 0,
+        "minStars": 3,
+        "board": "RO",
+        "budgetPerPerson": 500,
+    }
+
+
+GOOGLE_PAYLOAD = {
+    "data": {
+        "itineraries": {
+            "topFlights": [
+                {
+                    "price": 120,
+                    "flights": [{"airline": "Ryanair", "flight_number": "FR 4818"}],
+                    "departure_time": "01-09-2024 06:30 AM",
+                    "arrival_time": "01-09-2024 10:15 AM",
+                    "stops": 0,
+                }
+            ],
+            "otherFlights": [],
+        }
+    }
+}
+
+STAYS_PAYLOAD = {
+    "result": [
+        {"name": "Hotel Marina Delfin", "stars": 4, "board": "Room Only", "price": {"amount": 400}},
+    ]
+}
+
+
+def mock_handler(request):
+    if request.url.host == "google-flights2.p.rapidapi.com":
+        return httpx.Response(200, json=GOOGLE_PAYLOAD)
+    if request.url.path == "/web/stays/search":
+        return httpx.Response(200, json=STAYS_PAYLOAD)
+    return httpx.Response(404, json={})
+
+
+def test_evaluate_deals_async_uses_shared_client(monkeypatch):
+    monkeypatch.setenv("RAPIDAPI_GOOGLE_FLIGHTS_KEY", "dummy")
+    monkeypatch.setenv("RAPIDAPI_BOOKING_KEY", "dummy")
+    monkeypatch.delenv("RAPIDAPI_KIWI_KEY", raising=False)
+    monkeypatch.delenv("AMADEUS_API_KEY", raising=False)
+    monkeypatch.setattr("providers.amadeus_flights.CLIENT_ID", None)
+
+    async def run():
+        report = {}
+        async with httpx.AsyncClient(transport=httpx.MockTransport(mock_handler)) as client:
+            deals = await evaluate_deals_async(sample_params(), report=report, client=client)
+        return deals, report
+
+    deals, report = asyncio.run(run())
+
+    assert len(deals) == 1
+    assert deals[0]["flight"]["carrier"] == "Ryanair FR 4818"
+    assert deals[0]["hotel"]["name"] == "Hotel Marina Delfin"
+    assert deals[0]["perPerson"] == 260.0
+    statuses = {entry["provider"]: entry["status"] for entry in report["providers"]}
+    assert statuses["Google Flights"] == "ok"
+    assert statuses["Amadeus Hotels"] == "error"
+    assert "Kiwi" not in statuses
+
+
+def test_many_queries_share_one_event_loop(monkeypatch):
+    monkeypatch.setenv("RAPIDAPI_GOOGLE_FLIGHTS_KEY", "dummy")
+    monkeypatch.setenv("RAPIDAPI_BOOKING_KEY", "dummy")
+    monkeypatch.delenv("AMADEUS_API_KEY", raising=False)
+    monkeypatch.setattr("providers.amadeus_flights.CLIENT_ID", None)
+
+    async def slow_handler(request):
+        await asyncio.sleep(0.2)
+        return mock_handler(request)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(slow_handler)) as client:
+            queries = [dict(sample_params(), startDate=f"2024-09-{day:02d}") for day in range(1, 21)]
+            return await asyncio.gather(*(evaluate_deals_async(q, client=client) for q in queries))
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    assert len(results) == 20
+    assert all(len(deals) == 1 for deals in results)
+    assert elapsed < 2.0
+
+
+def test_provider_missing_a_parser_fails_when_built():
+    class NoParser(aio._RapidApiStream):
+        def _request(self, params):
+            return "https://example.invalid", {}, {}
+
+    with pytest.raises(TypeError):
+        NoParser(None)
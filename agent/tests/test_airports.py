@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent import airports, planner
+
+
+def test_nearby_airports_are_in_range_and_nearest_first():
+    index = airports.AirportIndex()
+    found = index.nearby("ema", 100)
+
+    assert [code for code, _ in found] == ["EMA", "BHX", "MAN"]
+    assert found[0][1] == 0.0
+    assert 45 < found[1][1] < 55
+    # Brute force over every airport agrees with the latitude-band lookup
+    _, lat, lon = airports.AIRPORTS["EMA"]
+    expected = {code for code, (_, la, lo) in airports.AIRPORTS.items()
+                if airports.distance_km(lat, lon, la, lo) <= 250}
+    assert {code for code, _ in index.nearby("EMA", 250)} == expected
+
+
+def test_unknown_origin_only_matches_itself():
+    assert airports.AirportIndex().nearby("XYZ", 500) == [("XYZ", 0.0)]
+
+
+def test_origin_airports_are_capped():
+    params = {"origin": "LHR", "originRadiusKm": 200, "maxOrigins": 3}
+    assert planner.origin_airports(params) == ["LHR", "LCY", "LGW"]
+    assert planner.origin_airports({"origin": "LHR"}) == ["LHR"]
@@ -6,6 +6,7 @@ import pytest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 import agent.providers.amadeus as amadeus
+from agent.providers import amadeus_auth
 
 
 def sample_params():
@@ -23,10 +24,18 @@ def mock_token_response():
   return resp
 
 
+def mock_hotel_list_response():
+  resp = Mock(status_code=200)
+  resp.raise_for_status = Mock()
+  resp.json.return_value = {"data": [{"hotelId": "HTALC001", "name": "Hotel"}]}
+  return resp
+
+
 def test_get_amadeus_hotels_success():
   os.environ["AMADEUS_API_KEY"] = "key"
   os.environ["AMADEUS_API_SECRET"] = "secret"
-  hotel_resp = Mock()
+  amadeus_auth.reset()
+  hotel_resp = Mock(status_code=200)
   hotel_resp.raise_for_status = Mock()
   hotel_resp.json.return_value = {
       "data": [
@@ -36,19 +45,23 @@ def test_get_amadeus_hotels_success():
           }
       ]
   }
-  with patch("agent.providers.amadeus.requests.post", return_value=mock_token_response()) as mock_post, \
-       patch("agent.providers.amadeus.requests.get", return_value=hotel_resp) as mock_get:
+  with patch("agent.providers.amadeus_auth.sessions.post", return_value=mock_token_response()) as mock_post, \
+       patch("agent.providers.amadeus_auth.sessions.get",
+             side_effect=[mock_hotel_list_response(), hotel_resp]) as mock_get:
       results = amadeus.get_amadeus_hotels(sample_params())
   assert results[0]["name"] == "Hotel"
   assert mock_post.call_args[0][0] == f"{amadeus.AMADEUS_BASE_URL}/v1/security/oauth2/token"
+  assert mock_get.call_args_list[0][0][0] == f"{amadeus.AMADEUS_BASE_URL}/v1/reference-data/locations/hotels/by-city"
   assert mock_get.call_args[0][0] == f"{amadeus.AMADEUS_BASE_URL}/v3/shopping/hotel-offers"
 
 
 def test_get_amadeus_hotels_error():
   os.environ["AMADEUS_API_KEY"] = "key"
   os.environ["AMADEUS_API_SECRET"] = "secret"
-  with patch("agent.providers.amadeus.requests.post", return_value=mock_token_response()) as mock_post, \
-       patch("agent.providers.amadeus.requests.get", side_effect=Exception("boom")) as mock_get:
+  amadeus_auth.reset()
+  with patch("agent.providers.amadeus_auth.sessions.post", return_value=mock_token_response()) as mock_post, \
+       patch("agent.providers.amadeus_auth.sessions.get",
+             side_effect=[mock_hotel_list_response(), Exception("boom")]) as mock_get:
       results = amadeus.get_amadeus_hotels(sample_params())
   assert results == []
   assert mock_post.call_args[0][0] == f"{amadeus.AMADEUS_BASE_URL}/v1/security/oauth2/token"
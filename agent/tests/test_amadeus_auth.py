@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import amadeus_auth
+from agent.providers.amadeus_auth import TokenManager
+
+BASE = "https://test.api.amadeus.com"
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):
+    monkeypatch.setenv("AMADEUS_API_KEY", "key")
+    monkeypatch.setenv("AMADEUS_API_SECRET", "secret")
+    yield
+    amadeus_auth.reset()
+
+
+def token_response(token, expires_in=1799):
+    resp = Mock(status_code=200)
+    resp.json.return_value = {"access_token": token, "expires_in": expires_in}
+    return resp
+
+
+def test_processes_share_one_token_through_the_file(tmp_path):
+    path = str(tmp_path / "token.json")
+    with patch("agent.providers.amadeus_auth.sessions.post", return_value=token_response("T1")) as mock_post:
+        first = TokenManager(BASE, path=path, background=False)
+        second = TokenManager(BASE, path=path, background=False)  # e.g. another gunicorn worker
+        assert first.token() == "T1"
+        assert second.token() == "T1"
+        assert first.token() == "T1"
+    assert mock_post.call_count == 1
+    assert second.stats["fileHits"] == 1
+    assert oct(os.stat(path).st_mode & 0o777) == "0o600"
+
+
+def test_concurrent_callers_fetch_once():
+    manager = TokenManager(BASE, background=False)
+
+    def slow_post(*args, **kwargs):
+        time.sleep(0.1)
+        return token_response("T1")
+
+    tokens = []
+    with patch("agent.providers.amadeus_auth.sessions.post", side_effect=slow_post) as mock_post:
+        threads = [threading.Thread(target=lambda: tokens.append(manager.token())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert tokens == ["T1"] * 8
+    assert mock_post.call_count == 1
+
+
+def test_401_invalidates_and_retries_once():
+    rejected, ok = Mock(status_code=401), Mock(status_code=200)
+    with patch("agent.providers.amadeus_auth.sessions.post",
+               side_effect=[token_response("OLD"), token_response("NEW")]) as mock_post, \
+         patch("agent.providers.amadeus_auth.sessions.get", side_effect=[rejected, ok]) as mock_get:
+        r = amadeus_auth.authorized_get(BASE, f"{BASE}/v2/shopping/flight-offers", params={"max": 1})
+    assert r is ok
+    assert mock_post.call_count == 2
+    assert [c.kwargs["headers"]["Authorization"] for c in mock_get.call_args_list] == ["Bearer OLD", "Bearer NEW"]
+
+
+def test_background_refresh_renews_before_expiry():
+    manager = TokenManager(BASE, background=True)
+    with patch("agent.providers.amadeus_auth.sessions.post",
+               side_effect=[token_response("T1", expires_in=200), token_response("T2")]) as mock_post:
+        assert manager.token() == "T1"
+        assert manager._timer is not None
+        # Still valid for callers, but inside the refresh-ahead window
+        assert manager.token() == "T1"
+        manager._background_refresh()
+        assert manager.token() == "T2"
+    assert mock_post.call_count == 2
+    manager.reset()
+
+
+def test_hotel_search_without_credentials_fails_before_any_call(monkeypatch):
+    from agent.providers import amadeus
+    monkeypatch.delenv("AMADEUS_API_KEY", raising=False)
+    monkeypatch.setenv("AMADEUS_API_SECRET", "secret")
+    assert not amadeus_auth.has_credentials()
+    with patch("agent.providers.amadeus_auth.sessions.get") as get, \
+         patch("agent.providers.amadeus_auth.sessions.post") as post:
+        with pytest.raises(RuntimeError):
+            amadeus.get_amadeus_hotels({"destination": "ALC", "startDate": "2099-09-01", "nights": 3, "adults": 2})
+    assert not get.called and not post.called
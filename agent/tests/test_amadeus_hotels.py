@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import amadeus_hotels
+from agent.providers.amadeus_hotels import chunk_hotel_ids, get_amadeus_hotels
+
+HOTEL_IDS = [f"HTALC{n:03d}" for n in range(45)]
+
+
+def sample_params():
+    return {"destination": "ALC", "startDate": "2024-09-01", "nights": 4, "adults": 2}
+
+
+def response(payload, status=200):
+    resp = Mock(status_code=status)
+    resp.json.return_value = payload
+    resp.raise_for_status = Mock(side_effect=None if status == 200 else RuntimeError(f"HTTP {status}"))
+    return resp
+
+
+def fake_amadeus(failing_chunk=None, delay=0.0):
+    calls = []
+
+    def authorized_get(base_url, url, params=None, **kwargs):
+        if url.endswith("/hotels/by-city"):
+            return response({"data": [{"hotelId": hid} for hid in HOTEL_IDS]})
+        ids = params["hotelIds"].split(",")
+        calls.append(ids)
+        time.sleep(delay)
+        if failing_chunk is not None and ids[0] == HOTEL_IDS[failing_chunk * 20]:
+            return response({}, status=500)
+        return response({"data": [
+            {"hotel": {"hotelId": hid, "name": hid},
+             "offers": [{"boardType": "HALF_BOARD", "price": {"total": "300.00"}}]}
+            for hid in ids
+        ]})
+    return authorized_get, calls
+
+
+def test_chunks_are_deduplicated_and_url_safe():
+    chunks = list(chunk_hotel_ids(HOTEL_IDS + HOTEL_IDS[:5]))
+    assert [len(c) for c in chunks] == [20, 20, 5]
+    assert sum(chunks, []) == HOTEL_IDS
+    assert all(len(",".join(c)) <= 30 for c in chunk_hotel_ids(HOTEL_IDS, size=20, max_chars=30))
+
+
+def test_every_hotel_is_priced_with_chunks_in_parallel():
+    authorized_get, calls = fake_amadeus(delay=0.2)
+    with patch.object(amadeus_hotels.amadeus_auth, "authorized_get", side_effect=authorized_get):
+        started = time.perf_counter()
+        hotels = get_amadeus_hotels(sample_params())
+        elapsed = time.perf_counter() - started
+
+    assert sorted(h["name"] for h in hotels) == HOTEL_IDS
+    assert len(calls) == 3
+    assert elapsed < 0.5
+
+
+def test_failed_chunk_is_skipped_unless_all_fail():
+    authorized_get, _ = fake_amadeus(failing_chunk=1)
+    with patch.object(amadeus_hotels.amadeus_auth, "authorized_get", side_effect=authorized_get):
+        hotels = get_amadeus_hotels(sample_params())
+    assert len(hotels) == 25
+
+    with patch.object(amadeus_hotels.amadeus_auth, "authorized_get", return_value=response({}, status=500)):
+        with pytest.raises(RuntimeError):
+            list(amadeus_hotels.iter_hotel_offers("https://x", "https://x/v3/shopping/hotel-offers",
+                                                  HOTEL_IDS, {}, workers=2))
@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.travel_deal_agent import evaluate_batch, evaluate_deals, load_configs, save_batch_results
+
+
+def sample_params(**extra):
+    return {"origin": "EMA", "destination": "ALC", "startDate": "2099-08-25", "nights": 4, "adults": 2,
+            "children": 0, "minStars": 3, "board": "RO", "budgetPerPerson": 700, **extra}
+
+
+def recording(offers):
+    """A fake provider returning `offers` (dicts) for every query; records the queries."""
+    def provider(params):
+        provider.calls.append(params)
+        return [dict(offer) for offer in offers]
+    provider.calls = []
+    return provider
+
+
+def providers():
+    flights = recording([{"price": 90, "carrier": "FR 1", "departure": "2099-08-25T06:00"},
+                         {"price": 140, "carrier": "LS 2", "departure": "2099-08-25T09:00"}])
+    hotels = recording([{"name": "Sol", "stars": 4, "board": "Room Only", "price": 400},
+                        {"name": "Mar", "stars": 5, "board": "Half Board", "price": 700},
+                        {"name": "Luna", "stars": 3, "board": "BB", "price": 250}])
+    patches = [patch("agent.travel_deal_agent.search_google_flights", flights),
+               patch("agent.travel_deal_agent.search_booking_flights", return_value=[]),
+               patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]),
+               patch("agent.travel_deal_agent.search_booking_hotels", hotels),
+               patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]),
+               patch("agent.travel_deal_agent.get_kiwi_deals", return_value=[])]
+    return flights, hotels, patches
+
+
+def run(patches, fn, *args):
+    for p in patches:
+        p.start()
+    try:
+        return fn(*args)
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def test_batch_shares_provider_calls_and_matches_each_config():
+    configs = [("ro", sample_params()),
+               ("hb", sample_params(board="HB", minStars=5, budgetPerPerson=1000)),
+               ("flexible", sample_params(flexibility=1, board=""))]
+    flights, hotels, patches = providers()
+    report = {}
+    batch = run(patches, evaluate_batch, configs, report)
+
+    # Three dates for the flexible config; the other two share its 2099-08-25 calls
+    assert sorted(q["startDate"] for q in flights.calls) == ["2099-08-24", "2099-08-25", "2099-08-26"]
+    # Booking.com hotel searches filter on minStars, so the 5-star config gets its own
+    assert sorted((q["startDate"], q["minStars"]) for q in hotels.calls) == [
+        ("2099-08-24", 3), ("2099-08-25", 3), ("2099-08-25", 5), ("2099-08-26", 3)]
+    assert report["plan"]["configs"] == 3
+    assert report["plan"]["naiveCalls"] > report["plan"]["calls"]
+
+    for name, params in configs:
+        _, _, patches = providers()
+        alone = run(patches, evaluate_deals, params)
+        strip = lambda deals: [{k: v for k, v in d.items() if k != "timestamp"} for d in deals]
+        assert strip(batch[name]) == strip(alone), name
+    assert {d["hotel"]["name"] for d in batch["hb"]} == {"Mar"}
+
+
+def test_incremental_batch_saves_each_configs_changes(tmp_path):
+    configs = [(name, sample_params(board=board, incremental=True, snapshotPath=str(tmp_path / name / "snapshot.json")))
+               for name, board in (("ro", "RO"), ("any", ""))]
+    for _ in range(2):
+        _, _, patches = providers()
+        report = {}
+        batch = run(patches, evaluate_batch, configs, report)
+        save_batch_results(batch, report, str(tmp_path), "now")
+
+    for name, _ in configs:
+        with open(tmp_path / name / "latest.json") as f:
+            saved = json.load(f)
+        assert saved["config"] == name
+        assert saved["report"]["changes"]["mode"] == "incremental"
+        assert saved["report"]["changes"]["deals"]["kept"] == len(batch[name]) > 0
+        assert "configs" not in saved["report"] and saved["report"]["plan"]["configs"] == 2
+
+
+def test_configs_load_from_a_directory_or_jsonl(tmp_path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "b.json").write_text(json.dumps(sample_params(board="BB")))
+    (tmp_path / "dir" / "a.json").write_text(json.dumps(sample_params()))
+    (tmp_path / "dir" / "notes.txt").write_text("ignored")
+    assert [name for name, _ in load_configs(str(tmp_path / "dir"))] == ["a", "b"]
+
+    lines = [json.dumps(sample_params(name="cheap")), "", json.dumps(sample_params())]
+    (tmp_path / "watch.jsonl").write_text("\n".join(lines))
+    assert [name for name, _ in load_configs(str(tmp_path / "watch.jsonl"))] == ["cheap", "config-3"]
+
+    (tmp_path / "dupes.jsonl").write_text("\n".join([json.dumps(sample_params(name="x"))] * 2))
+    with pytest.raises(ValueError):
+        load_configs(str(tmp_path / "dupes.jsonl"))
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import agent.travel_deal_agent as agent_module
+from agent.providers import breakers, sessions
+from agent.providers.breakers import CLOSED, HALF_OPEN, OPEN, BreakerBoard, CircuitBreaker, CircuitOpenError
+
+
+def test_breaker_opens_on_error_rate_and_recovers_through_half_open():
+    breaker = CircuitBreaker("api.example.com", window=10, min_calls=4, open_seconds=60)
+    for ok in (True, False, False, True):
+        breaker.record(ok, 0.1, now=0)
+    assert breaker.state == OPEN
+    assert not breaker.allow(now=30)
+    assert breaker.score == 0
+
+    # After the cool-down exactly one trial call is let through
+    assert breaker.allow(now=61)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(now=61)
+
+    breaker.record(False, 0.1, now=62)
+    assert breaker.state == OPEN
+    assert breaker.open_for == 120
+
+    assert breaker.allow(now=183)
+    breaker.record(True, 0.1, now=183)
+    assert breaker.state == CLOSED
+    assert breaker.open_for == 60
+
+
+def test_breaker_opens_on_slow_calls_and_on_retry_after():
+    slow = CircuitBreaker("slow.example.com", min_calls=3, slow_call_seconds=5)
+    for _ in range(3):
+        slow.record(True, 8.0, now=0)
+    assert slow.state == OPEN
+
+    limited = CircuitBreaker("limited.example.com")
+    limited.record(False, 0.1, retry_after=30, now=0)
+    assert limited.state == OPEN
+    assert not limited.allow(now=29)
+    assert limited.allow(now=31)
+
+
+def test_health_scores_order_fallback_chains_and_persist(tmp_path):
+    path = str(tmp_path / "health.json")
+    board = BreakerBoard(path=path)
+    for _ in range(5):
+        board.record("https://down.example.com/search", False, 0.1)
+    board.record("https://up.example.com/search", True, 0.1)
+
+    chain = [("down", "down.example.com"), ("up", "up.example.com")]
+    assert [name for name, _ in board.rank(chain, host=lambda entry: entry[1])] == ["up", "down"]
+    assert not board.available("down.example.com")
+
+    restored = BreakerBoard(path=path)
+    assert restored.get("down.example.com").state == OPEN
+    assert not restored.available("down.example.com")
+    assert restored.available("up.example.com")
+
+
+def test_concurrent_saves_leave_a_whole_file(tmp_path):
+    path = tmp_path / "health.json"
+    board = BreakerBoard(path=str(path))
+    for i in range(20):
+        board.record(f"api{i}.example.com", True, 0.1)
+
+    threads = [threading.Thread(target=lambda: [board.save() for _ in range(20)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(json.loads(path.read_text())) == 20
+    assert os.listdir(tmp_path) == ["health.json"]
+
+
+def test_sessions_fail_fast_once_a_host_circuit_opens():
+    session = MagicMock()
+    session.request.return_value = MagicMock(status_code=503, headers={})
+    with patch.object(breakers, "_board", BreakerBoard()), \
+         patch.object(sessions, "get_session", return_value=session):
+        for _ in range(breakers.MIN_CALLS):
+            assert sessions.get("https://flaky.example.com/search").status_code == 503
+        with pytest.raises(CircuitOpenError):
+            sessions.get("https://flaky.example.com/search")
+        assert breakers.snapshot()["flaky.example.com"]["state"] == OPEN
+    assert session.request.call_count == breakers.MIN_CALLS
+
+
+def test_fetch_offers_skips_providers_with_open_circuits():
+    board = agent_module.breakers.BreakerBoard()
+    board.get(agent_module.PROVIDER_HOSTS["Google Flights"]).record(False, 0.1, retry_after=60)
+    hotel = {"name": "Hotel1", "stars": 5, "board": "HB", "price": 300}
+    report = {}
+    with patch.object(agent_module.breakers, "_board", board), \
+         patch("agent.travel_deal_agent.search_google_flights") as mock_google, \
+         patch("agent.travel_deal_agent.search_booking_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_hotels", return_value=[hotel]), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_kiwi_deals", return_value=[{"price": 90}]):
+        flights, hotels = agent_module.fetch_offers({"origin": "EMA"}, report)
+
+    mock_google.assert_not_called()
+    assert flights == [{"price": 90}]
+    statuses = {entry["provider"]: entry["status"] for entry in report["providers"]}
+    assert statuses["Google Flights"] == "skipped"
+    assert statuses["Kiwi"] == "ok"
+    assert report["breakers"][agent_module.PROVIDER_HOSTS["Google Flights"]]["state"] == OPEN
@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import cache
+from agent.providers.cache import TieredCache, query_key
+from agent.providers.kiwi import CACHE_ALIASES, CACHE_FIELDS
+
+
+@pytest.fixture
+def shared_cache(tmp_path):
+    shared = cache.get_cache()
+    saved = (shared.enabled, shared.max_age, shared.path)
+    cache.configure(enabled=True, path=str(tmp_path / "shared.sqlite3"))
+    yield shared
+    shared.clear()
+    shared.enabled, shared.max_age = saved[0], saved[1]
+    cache.configure(path=saved[2])
+
+
+def test_l1_then_l2_hits(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = TieredCache(path=path)
+    key = query_key("google_flights", {"origin": "EMA", "destination": "ALC"})
+    assert first.get("google_flights", key) is None
+    first.set("google_flights", key, [{"price": 99.0}])
+    assert first.get("google_flights", key) == [{"price": 99.0}]
+
+    # A fresh process only has the on-disk tier
+    second = TieredCache(path=path)
+    assert second.get("google_flights", key) == [{"price": 99.0}]
+    assert first.stats["l1Hits"] == 1
+    assert second.stats["l2Hits"] == 1
+    assert first.stats["misses"] == 1
+
+
+def test_max_age_and_lru_eviction(tmp_path):
+    store = TieredCache(path=str(tmp_path / "cache.sqlite3"), l1_size=2)
+    for i in range(3):
+        store.set("kiwi", f"k{i}", [i])
+    assert store.stats["evictions"] == 1
+
+    store.max_age = 0
+    store._l1.clear()
+    assert store.get("kiwi", "k2") is None
+
+
+def test_purge_drops_rows_past_their_provider_ttl(shared_cache, monkeypatch):
+    shared_cache.set("kiwi", "old", [1])
+    shared_cache.set("booking_hotels", "fresh", [2])
+    later = cache.time.time() + cache.PROVIDER_TTLS["kiwi"] + 60  # past Kiwi's TTL, within the hotels' one
+    monkeypatch.setattr(cache.time, "time", lambda: later)
+    evictions = shared_cache.stats["evictions"]
+
+    assert cache.purge_expired() == 1
+    assert shared_cache.stats["evictions"] == evictions + 1
+    rows = shared_cache._conn().execute("SELECT key FROM entries").fetchall()
+    assert rows == [("fresh",)]
+
+    cache.configure(enabled=False)
+    assert cache.purge_expired() == 0
+
+
+def test_query_key_is_canonical():
+    a = query_key("kiwi", {"origin": "ema", "adults": 2.0})
+    b = query_key("kiwi", {"adults": 2, "origin": "EMA "})
+    assert a == b
+    assert a != query_key("google_flights", {"origin": "EMA", "adults": 2})
+
+
+def test_cached_decorator_is_alias_aware(shared_cache):
+    calls = []
+
+    @cache.cached("kiwi", CACHE_FIELDS, CACHE_ALIASES)
+    def search(params):
+        calls.append(params["origin"])
+        return [{"price": 120}]
+
+    assert search({"origin": "LHR", "destination": "ALC", "adults": 2}) == [{"price": 120}]
+    assert search({"origin": "LGW", "destination": "ALC", "adults": 2}) == [{"price": 120}]
+    assert calls == ["LHR"]
+
+    search({"origin": "MAN", "destination": "ALC", "adults": 2})
+    assert calls == ["LHR", "MAN"]
+
+
+def test_empty_results_are_not_cached(shared_cache):
+    calls = []
+
+    @cache.cached("google_flights", ("origin",))
+    def search(params):
+        calls.append(1)
+        return []
+
+    search({"origin": "EMA"})
+    search({"origin": "EMA"})
+    assert len(calls) == 2
+
+
+def test_peek_then_call_counts_one_miss_and_peek_hits_count(shared_cache):
+    @cache.cached("google_flights", ("origin",))
+    def search(params):
+        return [{"price": 80}]
+
+    before = dict(shared_cache.stats)
+    assert search.peek({"origin": "EMA"}) is None
+    search({"origin": "EMA"})
+    assert shared_cache.stats["misses"] - before["misses"] == 1
+
+    assert search.peek({"origin": "EMA"}) == [{"price": 80}]
+    assert shared_cache.stats["hits"] - before["hits"] == 1
+    assert shared_cache.stats["misses"] - before["misses"] == 1
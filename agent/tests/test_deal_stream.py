@@ -0,0 +1,167 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent import planner
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import (PROVIDER_FIELDS, evaluate_deals, iter_deals, iter_window_deals,
+                                     save_results_stream, select_deals)
+
+
+def sample_params(**extra):
+    return {"origin": "EMA", "destination": "ALC", "startDate": "2099-08-25", "nights": 4, "adults": 2,
+            "minStars": 3, "board": "RO", "budgetPerPerson": 10 ** 6, **extra}
+
+
+def untimed(deals):
+    return [{k: v for k, v in deal.items() if k != "timestamp"} for deal in deals]
+
+
+def offers(count):
+    flights = [FlightOffer(provider="F", carrier=f"F{i}", price_minor=10000 + 37 * i) for i in range(count)]
+    hotels = [HotelOffer(provider="H", name=f"H{i}", stars=4, board="Room Only", price_minor=20000 + 53 * i)
+              for i in range(count)]
+    return flights, hotels
+
+
+def test_deals_are_yielded_lazily_in_price_order():
+    flights, hotels = offers(2000)  # 4M pairs, all within budget
+    deals = iter_deals(sample_params(), flights, hotels)
+    first = [next(deals) for _ in range(5)]
+    assert [d["total"] for d in first] == [300.0, 300.37, 300.53, 300.74, 300.9]
+
+    small_flights, small_hotels = offers(30)
+    full = select_deals(sample_params(), small_flights, small_hotels)
+    assert untimed(select_deals(sample_params(), small_flights, small_hotels, limit=7)) == untimed(full[:7])
+
+
+def test_top_k_mode_from_the_request():
+    flights, hotels = offers(50)
+    with patch("agent.travel_deal_agent.fetch_offers", return_value=(flights, hotels)):
+        deals = evaluate_deals(sample_params(topK=3))
+    assert [d["total"] for d in deals] == [300.0, 300.37, 300.53]
+
+
+def test_window_streams_merge_in_price_order():
+    plan = planner.QueryPlan(sample_params(flexibility=1), PROVIDER_FIELDS)
+    results = {}
+    for key, query in plan.calls.items():
+        day = int(query["startDate"][-2:])
+        if key[0] == "Google Flights":
+            results[key] = [FlightOffer(carrier="FR 1", price_minor=day * 1000 + i * 7,
+                                        departure=f"{query['startDate']}T06:00") for i in range(20)]
+        elif key[0] == "Booking.com":
+            results[key] = [HotelOffer(name=f"H{i}", stars=4, board="RO", price_minor=50000 - day * 900 + i * 11)
+                            for i in range(20)]
+
+    full = list(iter_window_deals(plan, results))
+    assert len(full) == 3 * 20 * 20
+    assert [d["perPerson"] for d in full] == sorted(d["perPerson"] for d in full)
+    assert untimed(iter_window_deals(plan, results, limit=25)) == untimed(full[:25])
+    assert {d["startDate"] for d in full} == {"2099-08-24", "2099-08-25", "2099-08-26"}
+
+
+def test_streamed_results_file_matches_save_results_shape(tmp_path):
+    flights, hotels = offers(10)
+    report = {}
+
+    def deals():
+        yield from iter_deals(sample_params(), flights, hotels, limit=4)
+        report["providers"] = []  # filled in while the deals are produced
+
+    count = save_results_stream(deals(), output_dir=str(tmp_path), queriedAt="now", report=lambda: report)
+    with open(tmp_path / "latest.json") as f:
+        saved = json.load(f)
+    assert count == saved["count"] == 4
+    assert untimed(saved["deals"]) == untimed(select_deals(sample_params(), flights, hotels, limit=4))
+    assert saved["report"] == {"providers": []}
+    assert saved["queriedAt"] == "now"
+
+    save_results_stream(iter(()), output_dir=str(tmp_path))
+    with open(tmp_path / "latest.json") as f:
+        assert json.load(f) == {"deals": [], "count": 0}
+
+
+def test_api_streams_deals_as_ndjson():
+    import travel_deal_agent
+    from agent.app import app
+
+    flights, hotels = offers(5)
+    body = sample_params(topK=2)
+    with patch.object(travel_deal_agent, "fetch_offers", return_value=(flights, hotels)):
+        response = app.test_client().post("/api/deals/stream", json=body)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.mimetype == "application/x-ndjson"
+    assert [d["total"] for d in lines] == [300.0, 300.37]
+    assert app.test_client().post("/api/deals/stream", json={"origin": "EMA"}).status_code == 400
+
+
+def test_api_stream_takes_only_fixed_stay_fields_and_caps_top_k(tmp_path):
+    import travel_deal_agent
+    from agent import app as app_module
+
+    client = app_module.app.test_client()
+    snapshot = tmp_path / "snapshot.json"
+    for extra in ({"incremental": True, "snapshotPath": str(snapshot)}, {"flexibility": 30},
+                  {"originRadiusKm": 5000}, {"topK": 0}):
+        with patch.object(travel_deal_agent, "fetch_offers") as fetch:
+            assert client.post("/api/deals/stream", json=sample_params(**extra)).status_code == 400
+        assert not fetch.called
+    assert not snapshot.exists()
+
+    flights, hotels = offers(30)
+    with patch.object(travel_deal_agent, "fetch_offers", return_value=(flights, hotels)) as fetch:
+        response = client.post("/api/deals/stream", json=sample_params(topK=10 ** 6, kiwiMode="merge", pareto=3))
+        lines = response.get_data(as_text=True).splitlines()
+    assert fetch.call_args[0][0] == {**sample_params(), "topK": app_module.LIVE_MAX_TOP_K}
+    assert len(lines) == app_module.LIVE_MAX_TOP_K
+
+
+def test_api_stream_coalesces_identical_searches():
+    import travel_deal_agent
+    from agent import app as app_module
+    from agent.singleflight import SingleFlight
+
+    flights, hotels = offers(5)
+    calls = []
+
+    def slow_fetch(params):
+        calls.append(params)
+        time.sleep(0.2)
+        return flights, hotels
+
+    counts = []
+    with patch.object(app_module, "coalescer", SingleFlight()), \
+         patch.object(travel_deal_agent, "fetch_offers", slow_fetch):
+        client = app_module.app.test_client()
+
+        def post(top_k):
+            response = client.post("/api/deals/stream", json=sample_params(topK=top_k))
+            counts.append(len(response.get_data(as_text=True).splitlines()))
+
+        threads = [threading.Thread(target=post, args=(k,)) for k in (1, 2, 3, 4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert len(calls) == 1
+    assert sorted(counts) == [1, 2, 3, 4]
+
+
+def test_agent_imports_as_a_package():
+    # wsgi.py imports agent.app with only the repository root on sys.path
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    code = "import agent.app, agent.travel_deal_agent as t; print(t.planner.__name__)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": ""})
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-1] == "agent.planner"
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.hedging import run_hedged
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def provider(result, delay=0.0, calls=None, name=None):
+    def call():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+
+def statuses(log):
+    return [entry["status"] for entry in log]
+
+
+def test_sequential_falls_through_failures(executor):
+    calls = []
+    attempts = [
+        ("google", provider(RuntimeError("boom"), calls=calls, name="google")),
+        ("sky", provider(None, calls=calls, name="sky")),
+        ("tipsters", provider({"data": [1]}, calls=calls, name="tipsters")),
+    ]
+    winner, result, log = run_hedged(attempts, executor, mode="sequential")
+    assert winner == "tipsters"
+    assert result == {"data": [1]}
+    assert calls == ["google", "sky", "tipsters"]
+    assert statuses(log) == ["error", "empty", "won"]
+
+
+def test_hedged_starts_backup_after_delay(executor):
+    attempts = [
+        ("google", provider({"data": ["slow"]}, delay=1.0)),
+        ("sky", provider({"data": ["fast"]}, delay=0.05)),
+        ("tipsters", provider({"data": ["unused"]})),
+    ]
+    started = time.perf_counter()
+    winner, result, log = run_hedged(attempts, executor, mode="hedged", hedge_delay=0.1)
+    elapsed = time.perf_counter() - started
+
+    assert winner == "sky"
+    assert result == {"data": ["fast"]}
+    assert elapsed < 0.5
+    assert statuses(log) == ["cancelled", "won", "skipped"]
+    assert log[1]["latencyMs"] is not None
+
+
+def test_race_starts_everything_and_first_good_wins(executor):
+    calls = []
+    attempts = [
+        ("google", provider(None, delay=0.05, calls=calls, name="google")),
+        ("sky", provider({"data": [2]}, delay=0.1, calls=calls, name="sky")),
+        ("tipsters", provider({"data": [3]}, delay=0.5, calls=calls, name="tipsters")),
+    ]
+    winner, _, log = run_hedged(attempts, executor, mode="race")
+    assert winner == "sky"
+    assert sorted(calls) == ["google", "sky", "tipsters"]
+    assert statuses(log) == ["empty", "won", "cancelled"]
+
+
+def test_all_providers_fail(executor):
+    attempts = [("google", provider(None)), ("sky", provider(RuntimeError("down")))]
+    assert run_hedged(attempts, executor, mode="hedged", hedge_delay=0.01)[:2] == (None, None)
+    with pytest.raises(ValueError):
+        run_hedged(attempts, executor, mode="fastest")
+
+
+def test_flights_search_rejects_unknown_mode_and_bad_delay():
+    from agent.app import app
+
+    client = app.test_client()
+    body = {"origin": "EMA", "destination": "ALC", "date": "2025-08-25"}
+    response = client.post("/api/flights/search", json={**body, "searchMode": "fastest"})
+    assert response.status_code == 400
+    assert "searchMode must be one of: sequential, hedged, race" in response.get_json()["error"]
+    for delay in ("soon", None, -1, "nan"):
+        response = client.post("/api/flights/search", json={**body, "hedgeDelay": delay})
+        assert response.status_code == 400
+        assert response.get_json()["error"] == "hedgeDelay must be a number of seconds"
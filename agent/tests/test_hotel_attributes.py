@@ -0,0 +1,73 @@
+import json
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.hotel_attributes import AttributeIndex, Board, board_matches, parse_board
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import select_deals
+
+
+def test_board_descriptions_normalise_to_flags():
+    assert parse_board("HB") == parse_board("Half Board") == parse_board("HALF_BOARD") == Board.HB
+    assert parse_board("Bed & Breakfast") == parse_board("CONTINENTAL_BREAKFAST") == Board.BB
+    assert parse_board("Room only, breakfast extra") == Board.RO
+    assert parse_board("All Inclusive") == Board.AI
+    assert parse_board("Unknown") == Board(0)
+
+    assert board_matches("HB", "Half Board")
+    assert not board_matches("HB", "Room Only")
+    assert board_matches("", "anything")
+    assert board_matches("sea", "Sea view package")  # unparsed text falls back to a substring check
+
+
+def test_query_matches_a_brute_force_filter():
+    rng = random.Random(3)
+    boards = ["RO", "Room Only", "BB", "Bed & Breakfast", "Half Board", "HB", "AI", "Sea view package"]
+    hotels = [HotelOffer(name=f"H{i}", stars=rng.randint(0, 5), board=rng.choice(boards),
+                         price_minor=rng.randint(1000, 5000)) for i in range(500)]
+    index = AttributeIndex(hotels, stars=lambda h: h.stars, board=lambda h: h.board, price=lambda h: h.price_minor)
+    assert len(index) == 500
+
+    for min_stars, board, max_price in [(0, None, None), (3, "HB", None), (4, "RO", 3000), (2, "sea", 4000),
+                                        (5, "AI", 1000), (6, None, None)]:
+        expected = sorted((h for h in hotels
+                           if h.stars >= min_stars and (not board or board_matches(board, h.board))
+                           and (max_price is None or h.price_minor <= max_price)),
+                          key=lambda h: h.price_minor)
+        assert index.query(min_stars=min_stars, board=board, max_price=max_price) == expected
+
+
+def test_agent_matches_hb_against_half_board():
+    flights = [FlightOffer(carrier="FR 1", price_minor=10000)]
+    hotels = [HotelOffer(name="A", stars=4, board="Half Board", price_minor=20000),
+              HotelOffer(name="B", stars=4, board="Room Only", price_minor=15000),
+              HotelOffer(name="C", stars=2, board="HB", price_minor=12000)]
+    params = {"adults": 2, "budgetPerPerson": 1000, "minStars": 3, "board": "HB"}
+    assert [d["hotel"]["name"] for d in select_deals(params, flights, hotels)] == ["A"]
+
+
+def test_api_filters_saved_deals_by_board_stars_and_price(tmp_path):
+    from agent.app import filter_deals, load_saved_deals
+
+    deals = [{"perPerson": 150, "hotel": {"name": "A", "stars": 4, "board": "Half Board"}},
+             {"perPerson": 120, "hotel": {"name": "B", "stars": 3, "board": "RO"}},
+             {"perPerson": 300, "hotel": {"name": "C", "stars": 5, "board": "HB"}},
+             {"perPerson": 90, "hotel": {"name": "D", "stars": 4, "board": "HB"}}]
+    path = tmp_path / "latest.json"
+    path.write_text(json.dumps({"deals": deals}))
+
+    saved, index = load_saved_deals(str(path))
+    assert load_saved_deals(str(path))[1] is index  # unchanged file, same index
+
+    names = lambda found: [d["hotel"]["name"] for d in found]
+    assert names(filter_deals(saved, index)) == ["A", "B", "C", "D"]
+    assert names(filter_deals(saved, index, board="HB", max_price="200")) == ["A", "D"]  # file order kept
+    assert names(filter_deals(saved, index, min_stars="4", max_price="not a number")) == ["A", "C", "D"]
+
+    path.write_text(json.dumps({"deals": deals[:1]}))
+    os.utime(path, (0, 0))
+    assert names(load_saved_deals(str(path))[0]) == ["A"]
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.hotel_identity import AliasTable, HotelResolver, name_tokens
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import select_deals
+
+
+def hotel(name, price, stars=4, board="RO", provider="Booking.com", hotel_id=None, lat=None, lon=None):
+    return HotelOffer(provider=provider, name=name, stars=stars, board=board, price_minor=price,
+                      hotel_id=hotel_id, latitude=lat, longitude=lon)
+
+
+def test_names_normalise_to_tokens():
+    assert name_tokens("Hotel Marina Delfín") == name_tokens("MARINA DELFIN HOTEL") == {"marina", "delfin"}
+    assert name_tokens("The Hotel") == {"the", "hotel"}  # nothing but filler: keep it
+
+
+def test_resolver_merges_providers_and_keeps_distinct_properties():
+    resolver = HotelResolver()
+    offers = [hotel("Hotel Marina Delfin", 100, lat=38.3452, lon=-0.4810),
+              hotel("MARINA DELFIN HOTEL", 110, provider="Amadeus Hotels", hotel_id="ALC1", lat=38.3460, lon=-0.4815),
+              hotel("Marina Delfin", 120),                                  # no coordinates, same name
+              hotel("Marina Delfin", 130, lat=38.50, lon=-0.20),            # same name, 20 km away
+              hotel("Melia Alicante", 140, lat=38.3400, lon=-0.4770),
+              hotel("Hotel Melia Alicante Spa", 150, lat=38.3401, lon=-0.4771),  # close enough for a weaker name match
+              hotel("Melia Alicante", 160, stars=1)]                        # stars too far apart
+    ids = [resolver.resolve(h) for h in offers]
+    assert ids[0] == ids[1] == ids[2]
+    assert ids[3] != ids[0]
+    assert ids[4] == ids[5]
+    assert ids[6] != ids[4]
+    assert resolver.stats["properties"] == 4
+
+
+def test_alias_table_skips_scoring_on_later_runs(tmp_path):
+    aliases = AliasTable(path=str(tmp_path / "aliases.sqlite3"))
+    offers = [hotel("Hotel Marina Delfin", 100), hotel("MARINA DELFIN HOTEL", 110, provider="Amadeus Hotels",
+                                                       hotel_id="ALC1")]
+    first = HotelResolver(aliases)
+    first.preload(offers)
+    ids = [first.resolve(h) for h in offers]
+    first.save()
+    assert first.stats["scored"] == 2
+
+    later = HotelResolver(AliasTable(path=str(tmp_path / "aliases.sqlite3")))
+    later.preload(offers[::-1])
+    assert [later.resolve(h) for h in offers[::-1]] == ids[::-1]
+    assert later.stats == {"aliased": 2, "scored": 0, "comparisons": 0, "properties": 1}
+
+
+def test_select_deals_keeps_the_cheapest_offer_per_property_and_board():
+    flights = [FlightOffer(carrier="FR 1", price_minor=10000)]
+    hotels = [hotel("MARINA DELFIN HOTEL", 30000, provider="Amadeus Hotels", hotel_id="ALC1", board="RO"),
+              hotel("Hotel Marina Delfin", 25000, board="Room Only"),
+              hotel("Hotel Marina Delfin", 40000, board="Half Board"),
+              hotel("Hotel Sol", 28000)]
+    params = {"adults": 2, "budgetPerPerson": 1000, "minStars": 0, "board": ""}
+    deals = select_deals(params, flights, hotels)
+    assert [(d["hotel"]["name"], d["hotel"]["board"]) for d in deals] == [
+        ("Hotel Marina Delfin", "Room Only"), ("Hotel Sol", "RO"), ("Hotel Marina Delfin", "Half Board")]
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+from unittest.mock import Mock, patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import amadeus_hotels, hotel_index
+from agent.providers.hotel_index import HotelIndex
+
+
+def response(payload, status=200):
+    resp = Mock(status_code=status, text="")
+    resp.json.return_value = payload
+    return resp
+
+
+HOTEL_LIST = {"data": [
+    {"hotelId": "HTALC001", "name": "Sol", "rating": "4", "geoCode": {"latitude": 38.5, "longitude": -0.1},
+     "address": {"countryCode": "ES"}},
+    {"hotelId": "HTALC002", "name": "Mar", "geoCode": {"latitude": 38.6, "longitude": -0.2}},
+]}
+
+
+def fake_by_city(accept=lambda q: True):
+    """by-city answers only queries `accept` likes; records every query sent."""
+    calls = []
+
+    def authorized_get(base_url, url, params=None, **kwargs):
+        calls.append(params)
+        return response(HOTEL_LIST if accept(params) else {"data": []})
+    return authorized_get, calls
+
+
+def test_warm_index_skips_hotel_list(tmp_path):
+    index = HotelIndex(path=str(tmp_path / "hotels.sqlite3"))
+    authorized_get, calls = fake_by_city()
+    with patch.object(hotel_index, "_index", index), \
+         patch.object(amadeus_hotels.amadeus_auth, "authorized_get", side_effect=authorized_get):
+        cold = amadeus_hotels._city_hotels_with_meta("ALC", radius_km=30)
+        warm = amadeus_hotels._city_hotels_with_meta("ALC", radius_km=30)
+
+    assert cold == warm == (["HTALC001", "HTALC002"], {"HTALC001": 4})
+    assert len(calls) == 1
+    assert index.stats["hits"] == 1
+
+    # A new process (new index object on the same file) is warm too
+    reopened = HotelIndex(path=str(tmp_path / "hotels.sqlite3"))
+    assert reopened.lookup("alc", 30) == warm
+    hotels = reopened.hotels("ALC")
+    assert hotels[0]["name"] == "Sol" and hotels[0]["latitude"] == 38.5 and hotels[0]["countryCode"] == "ES"
+
+
+def test_stale_entry_retries_winning_variant_first():
+    index = HotelIndex(ttl=60)
+    # Only the bare query (no hotelSource, no page limit, no ratings) succeeds
+    authorized_get, calls = fake_by_city(lambda q: set(q) == {"cityCode", "radius", "radiusUnit"})
+    with patch.object(hotel_index, "_index", index), \
+         patch.object(amadeus_hotels.amadeus_auth, "authorized_get", side_effect=authorized_get):
+        amadeus_hotels._city_hotels_with_meta("ALC", radius_km=30, min_stars=3)
+        assert len(calls) == 5
+        assert index.variant("ALC", 30, 3) == {"radius": 20, "source": False, "limit": False, "ratings": False}
+
+        with patch.object(hotel_index.time, "time", return_value=time.time() + 120):
+            ids, _ = amadeus_hotels._city_hotels_with_meta("ALC", radius_km=30, min_stars=3)
+    assert ids == ["HTALC001", "HTALC002"]
+    assert len(calls) == 6
+    assert index.stats["stale"] == 1
+
+
+def test_disabled_index_stores_nothing():
+    index = HotelIndex(enabled=False)
+    index.store("ALC", 30, 0, {}, [hotel_index.hotel_record(HOTEL_LIST["data"][0], "ALC", 4)])
+    assert index.lookup("ALC", 30) is None
+    assert index.hotels("ALC") == []
@@ -0,0 +1,117 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent import planner
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import PROVIDER_FIELDS, select_deals, select_deals_incremental, select_window_deals
+
+
+def sample_params(path, **extra):
+    return {"adults": 2, "budgetPerPerson": 250, "minStars": 3, "board": "", "snapshotPath": str(path), **extra}
+
+
+def offers(rng, count):
+    flights = [FlightOffer(carrier=f"FR {i}", price_minor=rng.randint(4000, 20000),
+                           itinerary=f"FR{i}@2099-08-25T05:00Z") for i in range(count)]
+    hotels = [HotelOffer(name=f"Hotel {i}", stars=rng.randint(2, 5), board="RO",
+                         price_minor=rng.randint(20000, 60000)) for i in range(count)]
+    return flights, hotels
+
+
+def untimed(deals):
+    return [{k: v for k, v in deal.items() if k != "timestamp"} for deal in deals]
+
+
+def test_incremental_run_matches_a_full_run(tmp_path):
+    rng = random.Random(11)
+    flights, hotels = offers(rng, 40)
+    params = sample_params(tmp_path / "snapshot.json")
+    report = {}
+    first = select_deals_incremental(params, flights, hotels, report)
+    assert report["changes"]["mode"] == "full" and report["changes"]["reason"] == "no previous snapshot"
+    assert untimed(first) == untimed(select_deals(params, flights, hotels))
+
+    # 12 hours later: two flights repriced, one gone, three new; one hotel repriced
+    flights[3].price_minor += 500
+    flights[7].price_minor -= 700
+    del flights[10]
+    flights += [FlightOffer(carrier=f"LS {i}", price_minor=rng.randint(4000, 20000),
+                            itinerary=f"LS{i}@2099-08-25T07:00Z") for i in range(3)]
+    hotels[5].price_minor -= 1000
+    report = {}
+    second = select_deals_incremental(params, flights, hotels, report)
+
+    changes = report["changes"]
+    assert changes["mode"] == "incremental"
+    assert changes["flights"] == {"new": 3, "repriced": 2, "unchanged": 37, "gone": 1}
+    assert changes["hotels"]["repriced"] == (1 if hotels[5].stars >= 3 else 0)
+    assert changes["deals"]["kept"] > 0 and changes["deals"]["dropped"] > 0
+    assert untimed(second) == untimed(select_deals(params, flights, hotels))
+
+
+def test_snapshot_is_not_reused_for_other_search_fields_or_cut_top_k(tmp_path):
+    rng = random.Random(5)
+    flights, hotels = offers(rng, 20)
+    path = tmp_path / "snapshot.json"
+
+    select_deals_incremental(sample_params(path), flights, hotels)
+    report = {}
+    cheaper = sample_params(path, budgetPerPerson=200)
+    deals = select_deals_incremental(cheaper, flights, hotels, report)
+    assert report["changes"]["reason"] == "search fields changed"
+    assert untimed(deals) == untimed(select_deals(cheaper, flights, hotels))
+
+    top = sample_params(path, topK=5)
+    select_deals_incremental(top, flights, hotels)
+    cheapest = select_deals(top, flights, hotels, limit=1)[0]["flight"]["carrier"]
+    flights = [f for f in flights if f.carrier != cheapest]  # one of the kept top 5 disappears
+    report = {}
+    deals = select_deals_incremental(top, flights, hotels, report)
+    assert report["changes"]["reason"] == "topK deals dropped"
+    assert untimed(deals) == untimed(select_deals(top, flights, hotels, limit=5))
+
+
+def window_results(plan, rng):
+    results = {}
+    for key, query in plan.calls.items():
+        day = query["startDate"]
+        if key[0] == "Google Flights":
+            results[key] = [FlightOffer(carrier=f"FR {i}", price_minor=rng.randint(4000, 20000),
+                                        itinerary=f"FR{i}@{day}T05:00Z", departure=f"{day}T06:00")
+                            for i in range(15)]
+        elif key[0] == "Booking.com":
+            results[key] = [HotelOffer(name=f"Hotel {i}", stars=4, board="RO", price_minor=rng.randint(20000, 60000))
+                            for i in range(15)]
+    return results
+
+
+def test_flexible_request_keeps_one_snapshot_per_stay(tmp_path):
+    rng = random.Random(3)
+    params = {**sample_params(tmp_path / "snapshot.json", incremental=True, topK=40),
+              "origin": "EMA", "destination": "ALC", "startDate": "2099-08-25", "nights": 4, "flexibility": 1}
+    plan = planner.QueryPlan(params, PROVIDER_FIELDS)
+    full_plan = planner.QueryPlan({**params, "incremental": False}, PROVIDER_FIELDS)
+    results = window_results(plan, rng)
+
+    report = {}
+    first = select_window_deals(plan, results, 40, report)
+    assert report["changes"]["mode"] == "full" and len(report["changes"]["stays"]) == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"snapshot-EMA-2099-08-{day}-4n.json" for day in (24, 25, 26)]
+    assert untimed(first) == untimed(select_window_deals(full_plan, results, 40))
+
+    # One flight of one stay is repriced; the other two stays reuse all their pairs
+    repriced = next(key for key, query in plan.calls.items()
+                    if key[0] == "Google Flights" and query["startDate"] == "2099-08-25")
+    results[repriced][2].price_minor -= 900
+    report = {}
+    second = select_window_deals(plan, results, 40, report)
+    changes = report["changes"]
+    assert changes["mode"] == "incremental" and changes["deals"]["kept"] > 0
+    assert changes["flights"]["repriced"] == 1 and changes["flights"]["new"] == 0
+    assert changes["stays"]["EMA 2099-08-25/4n"]["flights"]["repriced"] == 1
+    assert changes["stays"]["EMA 2099-08-24/4n"]["flights"]["repriced"] == 0
+    assert untimed(second) == untimed(select_window_deals(full_plan, results, 40))
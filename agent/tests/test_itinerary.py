@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import amadeus_flights, booking_com_flights, google_flights, kiwi
+from agent.providers.itinerary import flight_designator, itinerary_key
+from agent.providers.offers import FlightOffer
+from agent.travel_deal_agent import select_deals
+
+
+def test_carrier_text_parses_to_a_designator():
+    assert flight_designator("Ryanair FR 4818") == ("FR", 4818)
+    assert flight_designator("FR", "4818") == ("FR", 4818)
+    assert flight_designator("Ryanair 4818") == ("FR", 4818)
+    assert flight_designator("U2 0203") == ("U2", 203)
+    assert flight_designator("Jet2") is None
+    assert flight_designator("?") is None
+
+
+def test_departure_is_keyed_in_utc():
+    summer = "FR4818@2025-08-25T05:00Z"
+    assert itinerary_key("FR", "4818", "2025-08-25T06:00:00", "EMA") == summer  # BST
+    assert itinerary_key("FR", "4818", "2025-08-25T05:00:00.000Z") == summer
+    assert itinerary_key("FR", "4818", "2025-08-25T07:00:00+02:00", "EMA") == summer
+    assert itinerary_key("Ryanair FR 4818", departure="25-08-2025 06:00 AM", origin="EMA") == summer  # Google
+    assert itinerary_key("FR", "4818", "2025-01-25T06:00:00", "EMA") == "FR4818@2025-01-25T06:00Z"  # GMT
+    assert itinerary_key("FR", "4819", "2025-08-25T06:00:00", "ALC") == "FR4819@2025-08-25T06:00"  # zone unknown
+    assert itinerary_key("FR", "4818", None) is None
+
+
+def test_providers_agree_on_the_same_flight():
+    google = google_flights._normalize_flight_data({
+        "price": 60, "departure_time": "25-08-2025 06:00 AM",
+        "flights": [{"airline": "Ryanair", "flight_number": "FR 4818", "departure_airport": {"airport_code": "EMA"}}]})
+    amadeus = amadeus_flights._normalize_offers([{
+        "price": {"grandTotal": "118.00"},
+        "itineraries": [{"segments": [{"carrierCode": "FR", "number": "4818",
+                                       "departure": {"iataCode": "EMA", "at": "2025-08-25T06:00:00"}}]},
+                        {"segments": [{"carrierCode": "FR", "number": "4819",
+                                       "departure": {"iataCode": "ALC", "at": "2025-09-01T10:00:00"}}]}]}])[0]
+    booking = booking_com_flights._normalize_flight_data({
+        "travelerPrices": [{"price": {"price": {"value": 12100}}}],
+        "bounds": [{"segments": [{"marketingCarrier": {"name": "Ryanair"}, "flightNumber": "4818",
+                                  "departuredAt": "2025-08-25T06:00:00"}]},
+                   {"segments": [{"marketingCarrier": {"name": "Ryanair"}, "flightNumber": "4819",
+                                  "departuredAt": "2025-09-01T10:00:00"}]}]})
+    kiwi_offer = kiwi._normalise({"price": 125, "route": [
+        {"airline": "FR", "flight_no": 4818, "utc_departure": "2025-08-25T05:00:00.000Z", "flyFrom": "EMA"},
+        {"airline": "FR", "flight_no": 4819, "local_departure": "2025-09-01T10:00:00.000Z", "return": 1}]})
+    assert google.itinerary == "FR4818@2025-08-25T05:00Z"  # one way
+    assert amadeus.itinerary == booking.itinerary == kiwi_offer.itinerary == "FR4818@2025-08-25T05:00Z+2025-09-01"
+
+
+def test_one_way_and_round_trip_fares_key_apart():
+    one_way = itinerary_key("FR", "4818", "2025-08-25T06:00:00", "EMA")
+    assert itinerary_key("FR", "4818", "2025-08-25T06:00:00", "EMA", returning="2025-09-01T10:00:00") != one_way
+    assert itinerary_key("FR", "4818", "2025-08-25T06:00:00", "EMA", returning=True) == one_way + "+return"
+    assert itinerary_key("FR", "4818", "2025-08-25T06:00:00", "EMA", returning="2025-09-08") == one_way + "+2025-09-08"
+
+
+def test_dedup_keeps_the_cheapest_offer_per_itinerary():
+    flights = [FlightOffer(provider="Google", carrier="Ryanair FR 4818", price_minor=6000, itinerary="FR4818@X"),
+               FlightOffer(provider="Amadeus", carrier="FR", price_minor=5800, itinerary="FR4818@X"),
+               FlightOffer(provider="Booking", carrier="Ryanair 4818", price_minor=6100, itinerary="FR4818@X"),
+               FlightOffer(provider="Kiwi", carrier="?", price_minor=7000),
+               FlightOffer(provider="Kiwi", carrier="?", price_minor=7000)]
+    hotels = [{"name": "Sol", "stars": 4, "board": "RO", "price": 100}]
+    params = {"adults": 2, "budgetPerPerson": 1000, "minStars": 0, "board": ""}
+    deals = select_deals(params, flights, hotels)
+    assert [d["flight"]["provider"] for d in deals] == ["Amadeus", "Kiwi"]
+
+
+def test_dedup_keeps_a_one_way_fare_apart_from_the_round_trip():
+    flights = [FlightOffer(provider="Google", carrier="Ryanair FR 4818", price_minor=6000, itinerary="FR4818@X"),
+               FlightOffer(provider="Amadeus", carrier="FR", price_minor=11800, itinerary="FR4818@X+2025-09-01")]
+    hotels = [{"name": "Sol", "stars": 4, "board": "RO", "price": 100}]
+    params = {"adults": 2, "budgetPerPerson": 1000, "minStars": 0, "board": ""}
+    deals = select_deals(params, flights, hotels)
+    assert sorted(d["flight"]["provider"] for d in deals) == ["Amadeus", "Google"]
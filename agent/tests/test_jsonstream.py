@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import aio, google_flights, jsonstream
+
+ITINERARIES = {
+    "status": True,
+    "data": {
+        "itineraries": {
+            "topFlights": [{"price": 120, "flights": [{"airline": "Jet2", "flight_number": "LS 1"}]}],
+            "skipped": {"topFlights": [{"price": 1}]},
+            "otherFlights": [{"price": 89.5, "stops": 1}, {"price": 0}, {"price": 1e3, "note": "café \"quoted\""}],
+        },
+        "priceHistory": [1, 2, 3],
+    },
+}
+
+
+def chunked(payload, size):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 100000])
+def test_items_match_full_decode_at_any_chunk_size(size):
+    items = list(jsonstream.iter_items(chunked(ITINERARIES, size), *google_flights.ITINERARY_PATHS))
+    itineraries = ITINERARIES["data"]["itineraries"]
+    assert items == itineraries["topFlights"] + itineraries["otherFlights"]
+
+
+def test_numbers_split_across_chunks_are_not_cut_short():
+    assert list(jsonstream.iter_items([b'{"data": [12', b'3.5e', b'2, -', b'7]}'], ("data",))) == [12350.0, -7]
+
+
+def test_truncated_or_malformed_body_raises():
+    with pytest.raises(ValueError):
+        list(jsonstream.iter_items([b'{"data": [1, 2'], ("data",)))
+    with pytest.raises(ValueError):
+        list(jsonstream.iter_items([b'{"data": [1 2]}'], ("data",)))
+
+
+def test_google_flights_search_streams_the_response():
+    os.environ["RAPIDAPI_GOOGLE_FLIGHTS_KEY"] = "dummy"
+    response = Mock(status_code=200)
+    response.iter_content.side_effect = lambda chunk_size: iter(chunked(ITINERARIES, 16))
+    response.json.side_effect = AssertionError("body should be streamed, not loaded")
+    params = {"origin": "EMA", "destination": "ALC", "startDate": "2024-09-01", "nights": 3, "adults": 2}
+    with patch("agent.providers.google_flights.sessions.get", return_value=response) as mock_get:
+        flights = google_flights.search_google_flights(params)
+    assert mock_get.call_args[1]["stream"] is True
+    assert [f["price"] for f in flights] == [120.0, 89.5, 1000.0]
+    response.close.assert_called_once()
+
+
+def test_google_flights_closes_the_response_on_an_http_error():
+    os.environ["RAPIDAPI_GOOGLE_FLIGHTS_KEY"] = "dummy"
+    response = Mock(status_code=429)
+    response.raise_for_status.side_effect = requests.HTTPError("429 Too Many Requests")
+    params = {"origin": "EMA", "destination": "ALC", "startDate": "2024-09-01", "nights": 3, "adults": 2}
+    with patch("agent.providers.google_flights.sessions.get", return_value=response):
+        assert google_flights.search_google_flights(params) == []
+    response.close.assert_called_once()
+
+
+def test_async_stream_normalises_each_item_as_it_is_decoded():
+    events = []
+
+    class Body(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for chunk in chunked(ITINERARIES, 16):
+                events.append("chunk")
+                yield chunk
+
+    class Recording(aio.GoogleFlights):
+        def _parse_item(self, params, item):
+            events.append(item["price"])
+            return super()._parse_item(params, item)
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=Body()))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await Recording(client)._fetch({}, "https://google-flights2.p.rapidapi.com/x", {}, {})
+
+    flights = asyncio.run(run())
+    assert [e for e in events if e != "chunk"] == [120, 89.5, 0, 1000.0]
+    assert events.index(120) < len(events) - 1 - events[::-1].index("chunk")  # before the body has all arrived
+    assert [f["price"] for f in flights] == [120.0, 89.5, 1000.0]
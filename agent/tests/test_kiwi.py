@@ -1,10 +1,12 @@
 import os
 import sys
+import time
 from unittest.mock import Mock, patch
-import pytest
+from urllib.parse import unquote
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
+from agent.providers import kiwi
 from agent.providers.kiwi import get_kiwi_deals
 
 
@@ -21,8 +23,7 @@ def sample_params():
 
 def test_get_kiwi_deals_success():
   os.environ["RAPIDAPI_KIWI_KEY"] = "dummy"
-  mock_resp = Mock()
-  mock_resp.raise_for_status = Mock()
+  mock_resp = Mock(status_code=200)
   mock_resp.json.return_value = {
       "data": [
           {
@@ -33,27 +34,106 @@ def test_get_kiwi_deals_success():
           }
       ]
   }
-  with patch("agent.providers.kiwi.requests.get", return_value=mock_resp) as mock_get:
+  with patch("agent.providers.kiwi.sessions.get", return_value=mock_resp) as mock_get:
       deals = get_kiwi_deals(sample_params())
   assert deals[0]["price"] == 100
+  assert deals[0]["carrier"] == "XY"
+  assert deals[0]["link"] == "link"
+  # The first combination (requested origin and destination) hit, so no fallbacks ran
   mock_get.assert_called_once()
   called_url = mock_get.call_args[0][0]
   called_headers = mock_get.call_args[1]["headers"]
   called_params = mock_get.call_args[1]["params"]
-  assert called_url == "https://kiwi-com-cheap-flights.p.rapidapi.com/v2/search"
+  assert called_url == "https://kiwi-com-cheap-flights.p.rapidapi.com/round-trip"
   assert called_headers["X-RapidAPI-Host"] == "kiwi-com-cheap-flights.p.rapidapi.com"
-  assert called_params["date_from"] == "01/09/2024"
-  assert called_params["date_to"] == "01/09/2024"
+  assert unquote(called_params["source"]) == "City:nottingham_gb"
+  assert unquote(called_params["destination"]) == "City:alicante_es"
+  assert called_params["adults"] == 2
 
 
 def test_get_kiwi_deals_error():
   os.environ["RAPIDAPI_KIWI_KEY"] = "dummy"
-  with patch("agent.providers.kiwi.requests.get", side_effect=Exception("boom")):
+  with patch("agent.providers.kiwi.sessions.get", side_effect=Exception("boom")):
       deals = get_kiwi_deals(sample_params())
   assert deals == []
 
 
 def test_get_kiwi_deals_missing_key():
   os.environ.pop("RAPIDAPI_KIWI_KEY", None)
-  with pytest.raises(RuntimeError):
-      get_kiwi_deals(sample_params())
+  with patch("agent.providers.kiwi.sessions.get") as mock_get:
+      assert get_kiwi_deals(sample_params()) == []
+  mock_get.assert_not_called()
+
+
+def kiwi_response(price, delay=0.0):
+  def respond():
+      time.sleep(delay)
+      resp = Mock(status_code=200)
+      resp.json.return_value = {"data": [{"price": price, "airlines": ["XY"], "route": []}]} if price else {"data": []}
+      return resp
+  return respond
+
+
+def fake_kiwi_get(responses, empty_delay=0.0):
+  """responses: (source, destination) slug pair -> kiwi_response(); anything else is empty."""
+  calls = []
+
+  def get(url, headers=None, params=None, timeout=None):
+      pair = (unquote(params["source"]), unquote(params["destination"]))
+      calls.append(pair)
+      return responses.get(pair, kiwi_response(None, empty_delay))()
+  return get, calls
+
+
+def test_parallel_probe_prefers_highest_priority_hit():
+  os.environ["RAPIDAPI_KIWI_KEY"] = "dummy"
+  get, calls = fake_kiwi_get({
+      ("City:nottingham_gb", "City:alicante_es"): kiwi_response(150, delay=0.3),
+      ("City:birmingham_gb", "City:alicante_es"): kiwi_response(90, delay=0.05),
+  }, empty_delay=0.2)
+  with patch("agent.providers.kiwi.sessions.get", side_effect=get), \
+       patch.object(kiwi, "MAX_CONCURRENT_PROBES", 4):
+      deals = get_kiwi_deals({**sample_params(), "kiwiMode": "parallel"})
+  # Birmingham lands first, but Nottingham is the requested origin and still wins
+  assert [d["price"] for d in deals] == [150]
+  # Queued combinations below the Birmingham hit are cancelled (one may have
+  # been picked up by the worker Birmingham freed)
+  assert len(calls) <= 4 + 1
+
+
+def test_parallel_probe_worst_case_is_about_one_timeout():
+  os.environ["RAPIDAPI_KIWI_KEY"] = "dummy"
+  get, calls = fake_kiwi_get({})
+  # The default cap: every combination at once
+  with patch("agent.providers.kiwi.sessions.get", side_effect=lambda *a, **k: time.sleep(0.2) or get(*a, **k)):
+      started = time.perf_counter()
+      deals = get_kiwi_deals({**sample_params(), "kiwiMode": "parallel"})
+      elapsed = time.perf_counter() - started
+  assert deals == []
+  assert len(calls) == 10
+  assert elapsed < 0.4  # one 0.2 s round, not three
+
+
+def test_merge_unions_every_successful_combination():
+  os.environ["RAPIDAPI_KIWI_KEY"] = "dummy"
+  get, calls = fake_kiwi_get({
+      ("City:nottingham_gb", "City:alicante_es"): kiwi_response(150),
+      ("City:manchester_gb", "Country:ES"): kiwi_response(80),
+      ("City:london_gb", "City:alicante_es"): kiwi_response(150),
+  })
+  with patch("agent.providers.kiwi.sessions.get", side_effect=get):
+      deals = get_kiwi_deals({**sample_params(), "kiwiMode": "merge"})
+  assert sorted(d["price"] for d in deals) == [80, 150]
+  assert len(calls) == 10
+
+
+def test_airports_sharing_a_city_are_probed_once():
+  os.environ["RAPIDAPI_KIWI_KEY"] = "dummy"
+  _, combos = kiwi._candidate_requests(sample_params())
+  pairs = [(src, dst) for src, dst, _ in combos]
+  assert len(pairs) == len(set(pairs)) == 10
+  assert pairs[:2] == [("City:nottingham_gb", "City:alicante_es"), ("City:nottingham_gb", "Country:ES")]
+  # Requested from Gatwick, London is probed first and not again for Heathrow
+  _, combos = kiwi._candidate_requests({**sample_params(), "origin": "LGW"})
+  sources = [src for src, _, _ in combos]
+  assert sources[0] == "City:london_gb" and sources.count("City:london_gb") == 2
@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.matching import iter_matches
+from agent.providers.offers import FlightOffer, HotelOffer
+
+
+def nested_loop(flights, hotels, adults, budget):
+    """The matcher select_deals used before: every pair, then a stable sort."""
+    results = []
+    for flight in flights:
+        for hotel in hotels:
+            total = flight.price_minor + hotel.price_minor
+            per_person = total / adults / 100
+            if per_person <= budget:
+                results.append((round(per_person, 2), flight.carrier, hotel.name, total))
+    return sorted(results, key=lambda x: x[0])
+
+
+def offers(rng, count, kind, low, high):
+    prices = sorted(rng.randint(low, high) * rng.choice([1, 100]) for _ in range(count))
+    if kind == "flight":
+        return [FlightOffer(carrier=f"F{i}", price_minor=p) for i, p in enumerate(prices)]
+    return [HotelOffer(name=f"H{i}", price_minor=p) for i, p in enumerate(prices)]
+
+
+def test_matches_equal_the_nested_loop_in_order():
+    rng = random.Random(7)
+    for _ in range(200):
+        flights = offers(rng, rng.randint(0, 30), "flight", 1, 400)
+        hotels = offers(rng, rng.randint(0, 30), "hotel", 1, 400)
+        adults = rng.choice([1, 2, 3, 7])
+        budget = rng.choice([0, 50, 133.33, 250, 10 ** 6])
+        got = [(round(pp, 2), f.carrier, h.name, total) for pp, f, h, total in
+               iter_matches(flights, hotels, adults, budget)]
+        assert got == nested_loop(flights, hotels, adults, budget)
+
+
+def test_scans_stop_at_the_budget():
+    class CountingList(list):
+        reads = 0
+
+        def __getitem__(self, index):
+            CountingList.reads += 1
+            return super().__getitem__(index)
+
+    flights = [FlightOffer(carrier=f"F{i}", price_minor=10000 + i * 100) for i in range(1000)]
+    hotels = CountingList(HotelOffer(name=f"H{i}", price_minor=10000 + i * 100) for i in range(1000))
+    matches = list(iter_matches(flights, hotels, 2, 105))
+
+    # Pairs within 210.00 in total: flight i + hotel j with i + j <= 10
+    assert len(matches) == 66
+    assert CountingList.reads <= 2 * len(matches) + 1  # not 1,000,000 pairs
@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+pytest.importorskip("numpy")
+
+from agent import matching_numpy
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import select_deals
+
+BOARDS = ["Room Only", "Bed & Breakfast", "Half Board", "HB", "All Inclusive", ""]
+
+
+def random_offers(rng, flights, hotels):
+    return (
+        [FlightOffer(provider="F", carrier=f"F{i % 40}", departure=f"2099-08-25T{i % 24:02d}:00",
+                     price_minor=rng.randint(1, 300) * rng.choice([1, 50, 100]), stops=rng.choice([0, 1, 2, None]))
+         for i in range(flights)],
+        [HotelOffer(provider="H", name=f"H{i}", stars=rng.randint(0, 5), board=rng.choice(BOARDS),
+                    price_minor=rng.randint(1, 600) * rng.choice([1, 50, 100])) for i in range(hotels)],
+    )
+
+
+def random_params(rng):
+    params = {"adults": rng.choice([1, 2, 3, 7]), "budgetPerPerson": rng.choice([5, 33.33, 120, 400]),
+              "minStars": rng.randint(0, 5), "board": rng.choice(["HB", "b", "room only", ""])}
+    if rng.random() < 0.5:
+        params["maxStops"] = rng.choice([0, 1])
+    return params
+
+
+def test_numpy_engine_matches_the_python_engine():
+    rng = random.Random(11)
+    for _ in range(150):
+        flights, hotels = random_offers(rng, rng.randint(0, 60), rng.randint(0, 60))
+        params = random_params(rng)
+        limit = rng.choice([None, 1, 5, 50])
+        expected = select_deals(params, flights, hotels, limit=limit, engine="python")
+        got = select_deals(params, flights, hotels, limit=limit, engine="numpy")
+        strip = lambda deals: [{k: v for k, v in d.items() if k != "timestamp"} for d in deals]
+        assert strip(got) == strip(expected)
+
+
+def test_blocks_and_top_k_pruning_keep_the_order(monkeypatch):
+    # Small blocks force many rounds of argpartition pruning across blocks
+    monkeypatch.setattr(matching_numpy, "BLOCK_CELLS", 64)
+    rng = random.Random(3)
+    flights, hotels = random_offers(rng, 400, 300)
+    params = {"adults": 2, "budgetPerPerson": 250, "minStars": 0, "board": ""}
+    for limit in (None, 1, 10, 333):
+        expected = select_deals(params, flights, hotels, limit=limit, engine="python")
+        got = select_deals(params, flights, hotels, limit=limit, engine="numpy")
+        assert [(d["perPerson"], d["flight"], d["hotel"]) for d in got] == \
+            [(d["perPerson"], d["flight"], d["hotel"]) for d in expected]
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import google_flights, offers
+from agent.providers.cache import TieredCache, query_key
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import select_deals
+
+
+def sample_params():
+    return {"minStars": 4, "board": "HB", "adults": 2, "budgetPerPerson": 250}
+
+
+def test_normalizer_builds_compact_record():
+    flight = google_flights._normalize_flight_data({
+        "price": "150.50",
+        "flights": [{"airline": "British Airways", "flight_number": "BA 123"}],
+        "departure_time": "2024-09-01 10:00",
+        "arrival_time": "2024-09-01 12:30",
+        "stops": 0,
+    })
+    assert isinstance(flight, FlightOffer)
+    assert not hasattr(flight, "__dict__")
+    assert flight.price_minor == 15050
+    assert flight.departure == datetime(2024, 9, 1, 10, 0)
+    # Dict view and JSON output keep the old field names and units
+    assert flight["price"] == 150.5
+    assert flight.get("carrier") == "British Airways BA 123"
+    assert flight.to_dict()["departure"] == "2024-09-01T10:00:00"
+
+
+def test_records_survive_the_on_disk_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    key = query_key("booking_hotels", {"destination": "ALC"})
+    hotel = HotelOffer(provider="Booking.com via RapidAPI", name="Sol", stars=4, board="Half Board",
+                       price_minor=30000, amenities=["pool"])
+    TieredCache(path=path).set("booking_hotels", key, [hotel])
+
+    restored = TieredCache(path=path).get("booking_hotels", key)
+    assert restored == [hotel]
+    assert isinstance(restored[0], offers.HotelOffer)
+
+
+def test_select_deals_matches_records_and_dicts():
+    flights = [
+        FlightOffer(provider="Google", price_minor=10000, carrier="FR 1", departure="2024-09-01T06:00"),
+        {"provider": "Kiwi", "price": "100.00", "carrier": "FR 1", "departure": "2024-09-01T06:00"},
+        FlightOffer(provider="Amadeus", price_minor=None, carrier="LS 2"),
+    ]
+    hotels = [
+        HotelOffer(provider="Booking", name="Hotel1", stars=5, board="HB", price_minor=30000),
+        {"name": "Hotel2", "stars": 5, "board": "BB", "price": 100},
+    ]
+    deals = select_deals(sample_params(), flights, hotels)
+
+    # The Kiwi dict duplicates the Google record; the unpriced flight is skipped
+    assert len(deals) == 1
+    assert deals[0]["perPerson"] == 200.0
+    assert deals[0]["total"] == 400.0
+    json.dumps(deals)
+    assert deals[0]["flight"]["price"] == 100.0
+    assert deals[0]["hotel"]["name"] == "Hotel1"
+
+
+def test_booking_links_read_record_departures():
+    from agent.app import generate_working_booking_links
+    for departure in ("01-09-2099 06:30 AM", "2099-09-01T06:30"):
+        flight = FlightOffer(carrier="Ryanair FR 4818", price_minor=9000, departure=departure).to_dict()
+        links = generate_working_booking_links(flight["carrier"], "FR", date_str=flight["departure"], nights=4)
+        assert "dateOut=2099-09-01&dateIn=2099-09-05&" in links[0]["url"]
+        assert links[2]["url"].endswith("/EMA/ALC/2099-09-01")
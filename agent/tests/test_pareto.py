@@ -0,0 +1,67 @@
+import os
+import random
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent import pareto
+from agent.providers.offers import FlightOffer, HotelOffer
+from agent.travel_deal_agent import evaluate_deals
+
+
+def deal(price, stars, stops, duration):
+    return {"perPerson": price, "hotel": {"stars": stars}, "flight": {"stops": stops, "duration": duration}}
+
+
+def brute_force_frontier(deals):
+    rows = [pareto.criteria(d) for d in deals]
+
+    def dominates(a, b):
+        no_worse = a[0] <= b[0] and a[1] >= b[1] and a[2] <= b[2] and a[3] <= b[3]
+        return no_worse and (a[0], -a[1], a[2], a[3]) != (b[0], -b[1], b[2], b[3])
+
+    return [d for d, row in zip(deals, rows) if not any(dominates(other, row) for other in rows)]
+
+
+def test_durations_parse():
+    assert pareto.duration_minutes("2h 45m") == pareto.duration_minutes("2 hr 45 min") == 165
+    assert pareto.duration_minutes("PT2H45M") == pareto.duration_minutes("165 min") == pareto.duration_minutes(165)
+    assert pareto.duration_minutes("") == pareto.duration_minutes(None) == pareto.UNKNOWN_MINUTES
+
+
+def test_frontier_matches_brute_force():
+    rng = random.Random(7)
+    deals = [deal(rng.choice(range(100, 130)), rng.randint(2, 5), rng.choice([0, 1, 2, None]),
+                  rng.choice(["2h 30m", "3h", "150 min", "", "5h 10m"])) for _ in range(400)]
+    front, rest = pareto.frontier(deals)
+    expected = brute_force_frontier(deals)
+    assert sorted(map(id, front)) == sorted(map(id, expected))
+    assert [d["perPerson"] for d in front] == sorted(d["perPerson"] for d in front)
+    assert len(front) + len(rest) == len(deals)
+
+
+def test_layers_and_per_layer_cut():
+    deals = [deal(100, 3, 1, "3h"), deal(100, 3, 1, "3h"),  # equal, neither dominates the other
+             deal(120, 4, 1, "3h"), deal(130, 4, 1, "3h"), deal(140, 5, 0, "2h"), deal(150, 5, 0, "2h")]
+    kept = pareto.select(deals, layers=2)
+    assert [(d["perPerson"], d["paretoLayer"]) for d in kept] == [(100, 1), (100, 1), (120, 1), (140, 1),
+                                                                  (130, 2), (150, 2)]
+    assert [d["perPerson"] for d in pareto.select(deals, layers=2, per_layer=1)] == [100, 130]
+
+
+def test_evaluate_deals_pareto_mode():
+    flights = [FlightOffer(carrier="FR 1", price_minor=10000, stops=0, duration="2h 30m"),
+               FlightOffer(carrier="LS 2", price_minor=12000, stops=1, duration="5h")]
+    hotels = [HotelOffer(name="Sol", stars=3, board="RO", price_minor=20000),
+              HotelOffer(name="Mar", stars=5, board="RO", price_minor=30000)]
+    params = {"adults": 2, "budgetPerPerson": 1000, "minStars": 0, "board": "", "origin": "EMA",
+              "destination": "ALC", "startDate": "2099-08-25", "nights": 4, "pareto": True}
+    with patch("agent.travel_deal_agent.fetch_offers", return_value=(flights, hotels)):
+        deals = evaluate_deals(params)
+        capped = evaluate_deals({**params, "topK": 1})
+    # The LS 2 flight is dearer, longer and has more stops: both its packages are dominated
+    assert [(d["flight"]["carrier"], d["hotel"]["name"]) for d in deals] == [("FR 1", "Sol"), ("FR 1", "Mar")]
+    assert [d["paretoLayer"] for d in deals] == [1, 1]
+    assert len(capped) == 1
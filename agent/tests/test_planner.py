@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent import planner
+from agent.travel_deal_agent import PROVIDER_DEADLINES, PROVIDER_FIELDS, evaluate_deals, fetch_offers
+
+
+def sample_params(**extra):
+    return {
+        "origin": "EMA",
+        "destination": "ALC",
+        "startDate": "2099-08-25",
+        "nights": 4,
+        "adults": 2,
+        "children": 0,
+        "minStars": 3,
+        "board": "RO",
+        "budgetPerPerson": 700,
+        **extra,
+    }
+
+
+def test_stay_window_spans_dates_and_nights():
+    stays = planner.stay_window(sample_params(flexibility=1, nightsRange=[3, 4]))
+    assert stays == [("2099-08-24", 3), ("2099-08-24", 4), ("2099-08-25", 3),
+                     ("2099-08-25", 4), ("2099-08-26", 3), ("2099-08-26", 4)]
+    # No departures in the past, unless the request itself is
+    assert planner.stay_window(sample_params(startDate="2099-08-25", flexibility=2),
+                               today=date(2099, 8, 24))[0] == ("2099-08-24", 4)
+    assert planner.stay_window(sample_params(startDate="2024-08-25", flexibility=1))[0] == ("2024-08-24", 4)
+
+
+def test_plan_shares_calls_that_ignore_part_of_the_stay():
+    plan = planner.QueryPlan(sample_params(flexibility=1, nightsRange=[3, 5]), PROVIDER_FIELDS)
+    calls = Counter(name for name, _ in plan.calls)
+
+    assert len(plan.stays) == 9
+    assert calls["Google Flights"] == 3  # one-way outbound leg per date
+    assert calls["Amadeus Flights"] == calls["Booking.com"] == 9
+    assert calls["Kiwi"] == 1
+    assert plan.describe(plan.calls_for("Google Flights")[0][0]) == "2099-08-24"
+    assert plan.describe(plan.calls_for("Booking.com")[0][0]) == "2099-08-24/3n"
+
+
+def _by_date(prices, kind):
+    """A fake provider whose price depends on the searched date (and nights for hotels)."""
+    calls = []
+
+    def provider(params):
+        calls.append((params["startDate"], params["nights"]))
+        price = prices[params["startDate"]]
+        if kind == "flights":
+            return [{"price": price, "carrier": "FR 1", "departure": f"{params['startDate']}T06:00"}]
+        return [{"name": "Sol", "stars": 4, "board": "Room Only", "price": price * params["nights"]}]
+
+    provider.calls = calls
+    return provider
+
+
+def test_flexible_search_finds_the_cheapest_stay_with_deduplicated_calls():
+    google = _by_date({"2099-08-24": 200, "2099-08-25": 80, "2099-08-26": 150}, "flights")
+    hotels = _by_date({"2099-08-24": 60, "2099-08-25": 70, "2099-08-26": 50}, "hotels")
+    report = {}
+    with patch("agent.travel_deal_agent.search_google_flights", google), \
+         patch("agent.travel_deal_agent.search_booking_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_hotels", hotels), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_kiwi_deals") as mock_kiwi:
+        deals = evaluate_deals(sample_params(flexibility=1, nightsRange=[3, 4]), report)
+
+    mock_kiwi.assert_not_called()
+    assert sorted({d for d, _ in google.calls}) == ["2099-08-24", "2099-08-25", "2099-08-26"]
+    assert len(google.calls) == 3
+    assert len(hotels.calls) == 6
+    assert report["plan"] == {"stays": 6, "calls": 27, "naiveCalls": 30}
+
+    # Flights only pair with hotels checking in on their departure date
+    assert len(deals) == 6
+    best = deals[0]
+    assert (best["startDate"], best["nights"]) == ("2099-08-25", 3)
+    assert best["total"] == 80 + 210
+    assert [d["perPerson"] for d in deals] == sorted(d["perPerson"] for d in deals)
+
+
+def test_cached_calls_are_served_without_running():
+    hotel = {"name": "Sol", "stars": 4, "board": "Room Only", "price": 100}
+
+    def cached_search(params):
+        raise AssertionError("cached call should not run")
+    cached_search.peek = lambda params: [hotel]
+
+    report = {}
+    with patch("agent.travel_deal_agent.search_google_flights", return_value=[{"price": 50}]), \
+         patch("agent.travel_deal_agent.search_booking_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_hotels", cached_search), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]):
+        _, hotels = fetch_offers(sample_params(), report)
+
+    assert hotels == [hotel]
+    statuses = {entry["provider"]: entry["status"] for entry in report["providers"]}
+    assert statuses["Booking.com"] == "cached"
+
+
+def test_deadlines_start_when_a_queued_call_starts():
+    def slow(params):
+        time.sleep(0.3)
+        return [{"price": 1}]
+
+    report = {}
+    deadlines = {name: 0.5 for name in PROVIDER_DEADLINES}
+    with patch("agent.travel_deal_agent.MAX_PROVIDER_WORKERS", 1), \
+         patch.dict("agent.travel_deal_agent.PROVIDER_DEADLINES", deadlines), \
+         patch("agent.travel_deal_agent.search_google_flights", slow), \
+         patch("agent.travel_deal_agent.search_booking_flights", slow), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]):
+        flights, _ = fetch_offers(sample_params(), report)
+
+    assert len(flights) == 2
+    assert all(entry["status"] == "ok" for entry in report["providers"])
+
+
+def test_multi_origin_search_adds_ground_transfer_and_shares_hotel_calls():
+    flight_calls, hotel_calls = [], []
+
+    def flights(params):
+        flight_calls.append(params["origin"])
+        price = {"EMA": 300, "BHX": 200, "MAN": 150}[params["origin"]]
+        return [{"price": price, "carrier": f"{params['origin']} 1", "departure": "2099-08-25T06:00"}]
+
+    def hotels(params):
+        hotel_calls.append(params["origin"])
+        return [{"name": "Sol", "stars": 4, "board": "Room Only", "price": 400}]
+
+    params = sample_params(originRadiusKm=100, groundTransfer={"BHX": 10, "MAN": 60})
+    report = {}
+    with patch("agent.travel_deal_agent.search_google_flights", flights), \
+         patch("agent.travel_deal_agent.search_booking_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_hotels", hotels), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]):
+        deals = evaluate_deals(params, report)
+
+    assert sorted(flight_calls) == ["BHX", "EMA", "MAN"]
+    assert len(hotel_calls) == 1
+    # MAN has the cheapest flight but the dearest transfer
+    assert [(d["origin"], d["total"]) for d in deals] == [("BHX", 620.0), ("MAN", 670.0), ("EMA", 700.0)]
+    assert deals[0]["perPerson"] == 310.0
+    assert deals[0]["groundTransfer"] == 10
+    assert "groundTransfer" not in deals[-1]
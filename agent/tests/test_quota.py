@@ -0,0 +1,92 @@
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import agent.travel_deal_agent as agent_module
+from agent.providers.quota import QuotaLedger, TokenBucket, account_for, parse_rate_limit
+
+SEARCH_URL = "https://kiwi-com-cheap-flights.p.rapidapi.com/round-trip"
+KEY = {"X-RapidAPI-Key": "secret-key"}
+
+
+def test_accounts_are_per_key_and_host_without_storing_the_key():
+    account = account_for(SEARCH_URL, KEY)
+    assert account.startswith("kiwi-com-cheap-flights.p.rapidapi.com#")
+    assert "secret-key" not in account
+    assert account != account_for(SEARCH_URL, {"X-RapidAPI-Key": "other-key"})
+    assert account_for("https://test.api.amadeus.com/v1/security/oauth2/token") == "test.api.amadeus.com"
+
+
+def test_rate_limit_headers_drive_the_remaining_budget():
+    headers = {"x-ratelimit-requests-limit": "500", "x-ratelimit-requests-remaining": "60",
+               "x-ratelimit-requests-reset": "86400"}
+    assert parse_rate_limit(headers) == (500, 60, 86400)
+
+    ledger = QuotaLedger()
+    ledger.record(SEARCH_URL, KEY, 200, headers)
+    budget = ledger.budget(SEARCH_URL, KEY)
+    assert (budget["limit"], budget["remaining"], budget["used"]) == (500, 60, 1)
+    # Optional (fallback) calls must leave 10% of the monthly limit untouched
+    assert ledger.allows(SEARCH_URL, KEY, calls=10)
+    assert not ledger.allows(SEARCH_URL, KEY, calls=11, optional=True)
+    # Host-only queries see the tightest account on that host
+    assert ledger.budget(SEARCH_URL)["remaining"] == 60
+
+
+def test_configured_monthly_budget_counts_persisted_calls(tmp_path):
+    path = str(tmp_path / "quota.sqlite3")
+    budgets = {"kiwi-com-cheap-flights.p.rapidapi.com": {"monthly": 5}}
+    ledger = QuotaLedger(path=path, budgets=budgets)
+    for _ in range(3):
+        ledger.record(SEARCH_URL, KEY, 200)
+
+    reopened = QuotaLedger(path=path, budgets=budgets)
+    assert reopened.budget(SEARCH_URL, KEY)["remaining"] == 2
+    assert reopened.allows(SEARCH_URL, KEY, calls=2)
+    assert not reopened.allows(SEARCH_URL, KEY, calls=3)
+    snapshot = reopened.snapshot()[account_for(SEARCH_URL, KEY)]
+    assert snapshot["usedThisMonth"] == 3
+
+
+def test_every_configured_key_gets_its_own_label(monkeypatch):
+    for name in ("RAPIDAPI_KEY", "RAPIDAPI_SKYSCRAPER_KEY", "RAPIDAPI_BOOKING_TIPSTERS_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("RAPIDAPI_FLIGHTS_SKY_KEY", "sky-key")
+    monkeypatch.setenv("RAPIDAPI_BOOKING_KEY", "booking-key")
+    ledger = QuotaLedger()
+    ledger.record("https://flights-sky.p.rapidapi.com/flights/search-one-way", {"X-RapidAPI-Key": "sky-key"}, 200)
+    ledger.record("https://tipsters.p.rapidapi.com/search", {"X-RapidAPI-Key": "booking-key"}, 200)
+
+    labels = {entry["host"]: entry["keys"] for entry in ledger.snapshot().values()}
+    assert labels["flights-sky.p.rapidapi.com"] == ["RAPIDAPI_FLIGHTS_SKY_KEY"]
+    # The Tipsters key falls back to the Booking.com one, as config.py resolves it
+    assert labels["tipsters.p.rapidapi.com"] == ["RAPIDAPI_BOOKING_KEY", "RAPIDAPI_BOOKING_TIPSTERS_KEY"]
+
+
+def test_token_bucket_paces_bursts():
+    bucket = TokenBucket(rate=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert 0.4 < bucket.reserve() <= 0.5
+
+
+def test_fetch_offers_skips_kiwi_fallback_when_quota_is_low():
+    ledger = agent_module.quota.QuotaLedger(budgets={agent_module.kiwi.HOST: {"monthly": 100}})
+    for _ in range(95):
+        ledger.record(agent_module.kiwi.BASE_URL, KEY, 200)
+    report = {}
+    with patch.object(agent_module.quota, "_ledger", ledger), \
+         patch("agent.travel_deal_agent.search_google_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.search_booking_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_kiwi_deals") as mock_kiwi:
+        agent_module.fetch_offers({"origin": "EMA"}, report)
+
+    mock_kiwi.assert_not_called()
+    statuses = {entry["provider"]: entry["status"] for entry in report["providers"]}
+    assert statuses["Kiwi"] == "quota"
@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.providers import sessions
+
+
+def test_one_pooled_session_per_host():
+    a = sessions.get_session("https://google-flights2.p.rapidapi.com/api/v1/searchFlights")
+    b = sessions.get_session("google-flights2.p.rapidapi.com")
+    c = sessions.get_session("https://test.api.amadeus.com/v1/security/oauth2/token")
+    assert a is b
+    assert a is not c
+
+
+def test_configure_rebuilds_sessions_with_new_pool_settings():
+    before = sessions.get_session("kiwi-com-cheap-flights.p.rapidapi.com")
+    try:
+        sessions.configure(pool_maxsize=3, keep_alive=False)
+        after = sessions.get_session("kiwi-com-cheap-flights.p.rapidapi.com")
+        assert after is not before
+        assert after.get_adapter("https://kiwi-com-cheap-flights.p.rapidapi.com")._pool_maxsize == 3
+        assert after.headers["Connection"] == "close"
+    finally:
+        sessions.configure(pool_maxsize=sessions.POOL_MAXSIZE, keep_alive=sessions.KEEP_ALIVE)
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from agent.singleflight import SingleFlight, body_key
+
+
+def run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"deals": [1, 2, 3]}
+
+    run_concurrently(8, lambda: results.append(flight.do("k", work)))
+
+    assert len(calls) == 1
+    assert results == [{"deals": [1, 2, 3]}] * 8
+    assert flight.snapshot() == {"requests": 8, "executions": 1, "deduplicated": 7, "inFlight": 0}
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    errors = []
+
+    def work():
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    def call():
+        with pytest.raises(ValueError):
+            flight.do("k", work)
+        errors.append(1)
+
+    run_concurrently(3, call)
+    assert len(errors) == 3
+    # A later call with the same key runs again
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_body_key_ignores_field_order():
+    assert body_key("/api/search", {"a": 1, "b": 2}) == body_key("/api/search", {"b": 2, "a": 1})
+    assert body_key("/api/search", {"a": 1}) != body_key("/api/flights/search", {"a": 1})
+
+
+def test_flights_search_endpoint_coalesces_identical_bodies():
+    from agent import app as app_module
+
+    calls = []
+
+    def slow_search(origin, destination, date, adults, currency):
+        calls.append(origin)
+        time.sleep(0.2)
+        return {"data": ["flight"]}
+
+    body = {"origin": "EMA", "destination": "ALC", "date": "2025-08-25", "adults": 2}
+    statuses = []
+    with patch.object(app_module, "coalescer", SingleFlight()), \
+         patch.object(app_module, "search_flights_realtime", slow_search):
+        client = app_module.app.test_client()
+        run_concurrently(5, lambda: statuses.append(
+            client.post("/api/flights/search", json=body).get_json()["success"]))
+        diagnostics = client.get("/api/diagnostics").get_json()
+
+    assert calls == ["EMA"]
+    assert statuses == [True] * 5
+    assert diagnostics["coalescing"]["deduplicated"] == 4
@@ -1,11 +1,12 @@
 import os
 import sys
+import time
 from unittest.mock import patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from agent.travel_deal_agent import evaluate_deals
+from agent.travel_deal_agent import PROVIDER_DEADLINES, evaluate_deals, fetch_offers
 
 
 def sample_params():
@@ -50,3 +51,54 @@ def test_evaluate_deals_filters_and_sorts():
         assert "hb" in deal["hotel"]["board"].lower()
         assert deal["perPerson"] <= 250
         assert deal["hotel"]["name"] == "Hotel1"
+
+
+def _slow(results, delay):
+    def provider(params):
+        time.sleep(delay)
+        return results
+    return provider
+
+
+def test_fetch_offers_runs_providers_concurrently():
+    hotel = {"name": "Hotel1", "stars": 5, "board": "HB", "price": 300}
+    report = {}
+    with patch("agent.travel_deal_agent.search_google_flights", _slow([{"price": 100}], 0.3)), \
+         patch("agent.travel_deal_agent.search_booking_flights", _slow([], 0.3)), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", _slow([], 0.3)), \
+         patch("agent.travel_deal_agent.search_booking_hotels", _slow([hotel], 0.3)), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", _slow([], 0.3)), \
+         patch("agent.travel_deal_agent.get_kiwi_deals") as mock_kiwi:
+        started = time.perf_counter()
+        flights, hotels = fetch_offers(sample_params(), report)
+        elapsed = time.perf_counter() - started
+
+    assert flights == [{"price": 100}]
+    assert hotels == [hotel]
+    assert elapsed < 1.0
+    mock_kiwi.assert_not_called()
+    assert {entry["provider"] for entry in report["providers"]} == {
+        "Google Flights", "Booking.com Flights", "Amadeus Flights", "Booking.com", "Amadeus Hotels"}
+    assert all(entry["latencyMs"] >= 250 for entry in report["providers"])
+
+
+def test_fetch_offers_enforces_deadlines_and_falls_back_to_kiwi():
+    report = {}
+    deadlines = {**PROVIDER_DEADLINES, "Google Flights": 0.2}
+    with patch.dict("agent.travel_deal_agent.PROVIDER_DEADLINES", deadlines), \
+         patch("agent.travel_deal_agent.search_google_flights", _slow([{"price": 1}], 2)), \
+         patch("agent.travel_deal_agent.search_booking_flights", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_flights", side_effect=RuntimeError("boom")), \
+         patch("agent.travel_deal_agent.search_booking_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_amadeus_hotels", return_value=[]), \
+         patch("agent.travel_deal_agent.get_kiwi_deals", return_value=[{"price": 50}]):
+        started = time.perf_counter()
+        flights, _ = fetch_offers(sample_params(), report)
+        elapsed = time.perf_counter() - started
+
+    assert flights == [{"price": 50}]
+    assert elapsed < 1.5
+    statuses = {entry["provider"]: entry["status"] for entry in report["providers"]}
+    assert statuses["Google Flights"] == "timeout"
+    assert statuses["Amadeus Flights"] == "error"
+    assert statuses["Kiwi"] == "ok"
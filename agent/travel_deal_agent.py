@@ -1,17 +1,114 @@
 import os
 import json
+import time
+import asyncio
+import heapq
 import argparse
+import importlib
+import shutil
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import requests
-from providers.kiwi import get_kiwi_deals
-from providers.amadeus import get_amadeus_hotels
-from providers.google_flights import search_google_flights
-from providers.booking_com import search_booking_hotels
+try:
+    from providers.kiwi import get_kiwi_deals
+    from providers.amadeus import get_amadeus_hotels
+    from providers.google_flights import search_google_flights
+    from providers.booking_com import search_booking_hotels
+    from providers.booking_com_flights import search_booking_flights
+    from providers.amadeus_flights import search_roundtrip as get_amadeus_flights
+    from providers import amadeus, amadeus_flights, booking_com, booking_com_flights, breakers, cache, google_flights, kiwi, quota
+    from providers.offers import MINOR_UNITS, as_flight, as_hotel
+    import incremental
+    import pareto
+    import planner
+    from matching import iter_matches
+    from hotel_attributes import AttributeIndex, parse_board
+    from hotel_identity import HotelResolver, get_aliases
+except ImportError:
+    # Imported as agent.travel_deal_agent (e.g. via wsgi.py)
+    from agent.providers.kiwi import get_kiwi_deals
+    from agent.providers.amadeus import get_amadeus_hotels
+    from agent.providers.google_flights import search_google_flights
+    from agent.providers.booking_com import search_booking_hotels
+    from agent.providers.booking_com_flights import search_booking_flights
+    from agent.providers.amadeus_flights import search_roundtrip as get_amadeus_flights
+    from agent.providers import amadeus, amadeus_flights, booking_com, booking_com_flights, breakers, cache, google_flights, kiwi, quota
+    from agent.providers.offers import MINOR_UNITS, as_flight, as_hotel
+    from agent import incremental
+    from agent import pareto
+    from agent import planner
+    from agent.matching import iter_matches
+    from agent.hotel_attributes import AttributeIndex, parse_board
+    from agent.hotel_identity import HotelResolver, get_aliases
+
+# Provider calls are blocking HTTP round trips; cap how many run at once.
+MAX_PROVIDER_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "6"))
+
+# Package matcher: "python" (matching.py) or "numpy" (matching_numpy.py, needs NumPy)
+MATCH_ENGINE = os.getenv("MATCH_ENGINE", "python")
+
+# Wall-clock deadline per provider call, in seconds. Amadeus hotels chains
+# several requests (token, by-city retries, offers) so it gets the most room.
+DEFAULT_PROVIDER_DEADLINE = 40
+PROVIDER_DEADLINES = {
+    "Google Flights": 35,
+    "Booking.com Flights": 35,
+    "Amadeus Flights": 45,
+    "Kiwi": 90,
+    "Booking.com": 35,
+    "Amadeus Hotels": 90,
+}
+
+# Host behind each provider, for its circuit breaker (see providers/breakers.py)
+PROVIDER_HOSTS = {
+    "Google Flights": google_flights.HOST,
+    "Booking.com Flights": booking_com_flights.HOST,
+    "Amadeus Flights": amadeus_flights.AMADEUS_BASE,
+    "Kiwi": kiwi.HOST,
+    "Booking.com": booking_com.HOST,
+    "Amadeus Hotels": amadeus.AMADEUS_BASE_URL,
+}
+
+# Query fields each provider's results depend on, for the flexible-date planner
+PROVIDER_FIELDS = {
+    "Google Flights": google_flights.CACHE_FIELDS,
+    "Booking.com Flights": booking_com_flights.CACHE_FIELDS,
+    "Amadeus Flights": amadeus_flights.CACHE_FIELDS,
+    "Booking.com": booking_com.CACHE_FIELDS,
+    "Amadeus Hotels": amadeus.CACHE_FIELDS,
+    "Kiwi": kiwi.CACHE_FIELDS,
+}
+
+# Only searched once every primary flight provider has come back empty
+FALLBACK_PROVIDERS = ("Kiwi",)
 
 def load_config(path):
     with open(path, 'r') as f:
         return json.load(f)
 
+def load_configs(path):
+    """
+    (name, config) pairs for a batch: a directory of *.json configs, named after
+    their files, or a JSONL file with one config per line, named by its "name"
+    field or line number.
+    """
+    if os.path.isdir(path):
+        configs = [(os.path.splitext(f)[0], load_config(os.path.join(path, f)))
+                   for f in sorted(os.listdir(path)) if f.endswith(".json")]
+    else:
+        configs = []
+        with open(path, 'r') as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    config = json.loads(line)
+                    configs.append((str(config.get("name") or f"config-{number}"), config))
+    names = [name for name, _ in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate config names in {path}: {', '.join(duplicates)}")
+    return configs
+
 def save_results(data, output_dir="results"):
     os.makedirs(output_dir, exist_ok=True)
     timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
@@ -24,126 +121,782 @@ def save_results(data, output_dir="results"):
         json.dump(data, f, indent=2)
     print(f"[INFO] Results saved to {output_file} and latest.json")
 
-def evaluate_deals(params):
-    # --- FLIGHTS ---
-    ### Multi-provider flight search with fallbacks
-    print("[INFO] Fetching flight data from multiple providers...")
-    all_flights = []
-    
-    # Try Google Flights first (often has good deals)
-    try:
-        google_flights = search_google_flights(params) or []
-        all_flights.extend(google_flights)
-        print(f"[INFO] Google Flights: {len(google_flights)} options")
-    except Exception as e:
-        print(f"[ERROR] Google Flights failed: {e}")
-    
-    # Try Booking.com Flights
+def save_results_stream(deals, output_dir="results", **fields):
+    """
+    save_results for a deal iterator: each deal is written as it arrives, so
+    the list is never held in memory. The file has the same shape as
+    save_results' ({"deals": [...], "count": n, ...}); `fields` follow the deals,
+    and callables among them are called only then, e.g. for a run report that
+    is filled in while the deals are produced. Returns the number of deals.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    output_file = f"{output_dir}/results-{timestamp}.json"
+    latest_file = f"{output_dir}/latest.json"
+
+    count = 0
+    with open(output_file, 'w') as f:
+        f.write('{"deals": [')
+        for deal in deals:
+            f.write(",\n  " if count else "\n  ")
+            json.dump(deal, f)
+            count += 1
+        f.write(f'\n], "count": {count}')
+        for key, value in fields.items():
+            f.write(f", {json.dumps(key)}: ")
+            json.dump(value() if callable(value) else value, f, indent=2)
+        f.write("}\n")
+    shutil.copyfile(output_file, latest_file)
+    print(f"[INFO] {count} deals streamed to {output_file} and latest.json")
+    return count
+
+def _timed_call(fn, params, started=None):
+    """Run one provider call, returning (results, error, seconds)."""
+    if started is not None:
+        started.append(time.monotonic())
+    began = time.perf_counter()
     try:
-        from providers.booking_com_flights import search_booking_flights
-        booking_flights = search_booking_flights(params) or []
-        all_flights.extend(booking_flights)
-        print(f"[INFO] Booking.com Flights: {len(booking_flights)} options")
+        return fn(params) or [], None, time.perf_counter() - began
     except Exception as e:
-        print(f"[ERROR] Booking.com Flights failed: {e}")
-    
-    # Try Amadeus Flights
+        return [], e, time.perf_counter() - began
+
+def _provider_outcome(name, kind, status, results, error, seconds, query=None):
+    """Log one provider result and return its run report entry."""
+    label = f"{name} [{query}]" if query else name
+    if status == "error":
+        print(f"[ERROR] {label} failed: {error}")
+    elif status == "timeout":
+        print(f"[ERROR] {label} timed out after {seconds:g}s")
+    elif status == "skipped":
+        print(f"[WARN] {label} skipped: circuit open for {PROVIDER_HOSTS.get(name, name)}")
+    elif status == "quota":
+        print(f"[WARN] {label} skipped: monthly quota too low for {PROVIDER_HOSTS.get(name, name)}")
+    elif status == "cached":
+        print(f"[INFO] {label}: {len(results)} options (cached)")
+    else:
+        print(f"[INFO] {label}: {len(results)} options ({seconds:.1f}s)")
+    entry = {
+        "provider": name,
+        "kind": kind,
+        "status": status,
+        "count": len(results),
+        "latencyMs": round(seconds * 1000),
+    }
+    if query:
+        entry["query"] = query
+    return entry
+
+def _cached_result(fn, params):
+    """The provider cache's offers for fn(params) when it is a @cached search, else None."""
+    peek = getattr(fn, "peek", None)
+    hit = peek(params) if callable(peek) else None
+    return hit if isinstance(hit, list) else None
+
+def _providers():
+    """(kind, name, search function) per provider, looked up at call time so tests can patch them."""
+    return [
+        ("flights", "Google Flights", search_google_flights),
+        ("flights", "Booking.com Flights", search_booking_flights),
+        ("flights", "Amadeus Flights", get_amadeus_flights),
+        ("hotels", "Booking.com", search_booking_hotels),
+        ("hotels", "Amadeus Hotels", get_amadeus_hotels),
+        ("flights", "Kiwi", get_kiwi_deals),
+    ]
+
+def _fan_out(calls, fallback=()):
+    """
+    Run provider calls on a bounded thread pool; the engine behind fetch_offers
+    and fetch_window. Each call is a (kind, name, fn, params, query) tuple.
+
+    Every call gets its provider's deadline from PROVIDER_DEADLINES, counted from
+    when it starts running, so calls queued behind a busy pool don't time out.
+    A call that overruns is reported as a timeout and its late result is
+    discarded. `fallback` calls (Kiwi) are only submitted once every primary
+    flight call has finished empty-handed. Calls whose host circuit is open are
+    skipped, and unhealthy hosts are queued last. So are calls whose key is out
+    of monthly quota; Kiwi, being a fallback, is also skipped once its key is
+    down to the quota reserve. Calls already in the provider cache are answered
+    from it straight away, whatever the state of their host.
+
+    Returns (results, timings): the offers of each call in calls + fallback
+    order (None for a fallback that was not needed), and the run report entries.
+    """
+    calls, fallback = list(calls), list(fallback)
+    board, ledger = breakers.get_board(), quota.get_ledger()
+    pool = ThreadPoolExecutor(max_workers=MAX_PROVIDER_WORKERS, thread_name_prefix="provider")
+    results = [None] * (len(calls) + len(fallback))
+    pending, timings = {}, []
+
+    def finish(index, status, found, error, seconds):
+        kind, name, _, _, query = (calls + fallback)[index]
+        results[index] = found
+        timings.append(_provider_outcome(name, kind, status, found, error, seconds, query))
+
+    def submit(index):
+        kind, name, fn, params, _ = (calls + fallback)[index]
+        hit = _cached_result(fn, params)
+        if hit is not None:
+            finish(index, "cached", hit, None, 0.0)
+            return
+        host = PROVIDER_HOSTS[name]
+        if not board.available(host):
+            finish(index, "skipped", [], None, 0.0)
+            return
+        if not ledger.allows(host, optional=(name == "Kiwi")):
+            finish(index, "quota", [], None, 0.0)
+            return
+        started = []
+        future = pool.submit(_timed_call, fn, params, started)
+        pending[future] = (index, PROVIDER_DEADLINES.get(name, DEFAULT_PROVIDER_DEADLINE), started)
+
+    def by_health(indexes):
+        return board.rank(indexes, host=lambda i: PROVIDER_HOSTS[calls[i][1]])
+
+    flight_calls = [i for i, call in enumerate(calls) if call[0] == "flights"]
+    hotel_calls = [i for i, call in enumerate(calls) if call[0] != "flights"]
+    for index in by_health(flight_calls) + by_health(hotel_calls):
+        submit(index)
+
+    fallback_sent = not fallback
     try:
-        from providers.amadeus_flights import search_roundtrip as get_amadeus_flights
-        amadeus_flights = get_amadeus_flights(params) or []
-        all_flights.extend(amadeus_flights)
-        print(f"[INFO] Amadeus Flights: {len(amadeus_flights)} options")
-    except Exception as e:
-        print(f"[ERROR] Amadeus Flights failed: {e}")
-    
-    # Fallback to Kiwi if needed
-    if not all_flights:
-        print("[WARN] No primary flight results, trying Kiwi...")
+        while True:
+            # Fall back to Kiwi as soon as the primaries are exhausted with nothing to show
+            if not fallback_sent and not any(calls[i][0] == "flights" for i, _, _ in pending.values()) \
+                    and not any(results[i] for i in flight_calls):
+                print("[WARN] No primary flight results, trying Kiwi...")
+                for index in range(len(calls), len(calls) + len(fallback)):
+                    submit(index)
+                fallback_sent = True
+            if not pending:
+                break
+
+            # A call still waiting for a worker can't expire before a full deadline from now
+            now = time.monotonic()
+            next_deadline = min((started[0] if started else now) + deadline
+                                for _, deadline, started in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(pending):
+                index, deadline, started = pending[future]
+                if future in done:
+                    found, error, seconds = future.result()
+                    status = "error" if error else "ok"
+                elif started and now >= started[0] + deadline:
+                    future.cancel()
+                    found, error, status, seconds = [], None, "timeout", float(deadline)
+                else:
+                    continue
+                del pending[future]
+                finish(index, status, found, error, seconds)
+    finally:
+        # Don't block on providers that blew their deadline; their results are ignored.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, timings
+
+def _fill_report(report, timings, elapsed):
+    report["providers"] = timings
+    report["fetchMs"] = round(elapsed * 1000)
+    report["cache"] = cache.stats()
+    report["breakers"] = breakers.snapshot()
+    report["quota"] = quota.snapshot()
+
+def fetch_offers(params, report=None):
+    """
+    Fan out to every flight and hotel provider on a bounded thread pool (see
+    _fan_out for deadlines, the Kiwi fallback, breakers and quota).
+
+    Returns (all_flights, all_hotels). When `report` is a dict, per-provider
+    status, count and latency are recorded under report["providers"].
+    """
+    print("[INFO] Fetching flight and hotel data from multiple providers...")
+    started = time.perf_counter()
+    calls = [(kind, name, fn, params, None) for kind, name, fn in _providers() if name not in FALLBACK_PROVIDERS]
+    fallback = [(kind, name, fn, params, None) for kind, name, fn in _providers() if name in FALLBACK_PROVIDERS]
+    results, timings = _fan_out(calls, fallback)
+
+    all_flights, all_hotels = [], []
+    for (kind, *_), found in zip(calls + fallback, results):
+        (all_flights if kind == "flights" else all_hotels).extend(found or [])
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Provider fan-out finished in {elapsed:.1f}s")
+    if report is not None:
+        _fill_report(report, timings, elapsed)
+    return all_flights, all_hotels
+
+def plan_window(params):
+    """The QueryPlan for a flexible request (see planner.py)."""
+    return planner.QueryPlan(params, PROVIDER_FIELDS)
+
+def _plan_report(report, plan, results):
+    primaries = [name for name in PROVIDER_FIELDS if name not in FALLBACK_PROVIDERS]
+    report["plan"] = {
+        "stays": len(plan.stays),
+        "calls": sum(1 for key in plan.calls if key[0] not in FALLBACK_PROVIDERS or key in results),
+        "naiveCalls": plan.naive_calls(primaries),
+    }
+
+def _fetch_planned(planned, describe):
+    """
+    Run each {call key: params} call once on _fan_out, fallback providers last.
+    Returns ({call key: offers} for the calls that ran, timings).
+    """
+    calls, fallback = [], []
+    for kind, name, fn in _providers():
+        for key, params in planned.items():
+            if key[0] == name:
+                call = (kind, name, fn, params, describe(key))
+                (fallback if name in FALLBACK_PROVIDERS else calls).append((key, call))
+    found, timings = _fan_out([call for _, call in calls], [call for _, call in fallback])
+    return {key: offers for (key, _), offers in zip(calls + fallback, found) if offers is not None}, timings
+
+def fetch_window(plan, report=None):
+    """
+    Run the distinct provider calls of a QueryPlan concurrently, as fetch_offers
+    does for a single stay. Kiwi, which ignores dates, is one fallback call per
+    origin for the whole window.
+
+    Returns {call key: offers} for the calls that ran.
+    """
+    print(f"[INFO] Searching {len(plan.stays)} origin/date/night combinations "
+          f"with {len(plan.calls)} provider calls...")
+    started = time.perf_counter()
+    results, timings = _fetch_planned(plan.calls, plan.describe)
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Provider fan-out finished in {elapsed:.1f}s")
+    if report is not None:
+        _fill_report(report, timings, elapsed)
+        _plan_report(report, plan, results)
+    return results
+
+def print_report(report):
+    if "plan" in report:
+        plan = report["plan"]
+        configs = f"{plan['configs']} configs, " if "configs" in plan else ""
+        print(f"[INFO] Plan: {configs}{plan['stays']} stays, {plan['calls']} provider calls "
+              f"(instead of {plan['naiveCalls']})")
+    print("[INFO] Provider latency report:")
+    for entry in sorted(report.get("providers", []), key=lambda x: -x["latencyMs"]):
+        print(f"  {entry['provider']:<20} {entry['kind']:<8} {entry['status']:<8} "
+              f"{entry['count']:>4} options  {entry['latencyMs']:>6} ms  {entry.get('query', '')}".rstrip())
+    if "fetchMs" in report:
+        print(f"  {'wall clock':<20} {'':<8} {'':<8} {'':>12}  {report['fetchMs']:>6} ms")
+    if "changes" in report:
+        print(f"[INFO] Changes since the last run: {incremental.describe(report['changes'])}")
+    for name, config_report in report.get("configs", {}).items():
+        if "changes" in config_report:
+            print(f"[INFO] Changes since the last run ({name}): {incremental.describe(config_report['changes'])}")
+    if "cache" in report:
+        stats = report["cache"]
+        print(f"[INFO] Cache: {stats['hits']} hits ({stats['l1Hits']} L1, {stats['l2Hits']} L2), "
+              f"{stats['misses']} misses, {stats['evictions']} evictions")
+    for host, state in report.get("breakers", {}).items():
+        if state["state"] != breakers.CLOSED:
+            print(f"[WARN] Circuit {state['state']} for {host}, retry in {state['retryInSeconds']}s")
+    for account, usage in report.get("quota", {}).items():
+        remaining = "unknown" if usage["remaining"] is None else usage["remaining"]
+        print(f"[INFO] Quota {usage['host']} ({', '.join(usage['keys']) or account}): "
+              f"{usage['usedThisMonth']} calls this month, {remaining} remaining")
+
+async def _gather_calls(calls, timings):
+    """
+    Asyncio counterpart of _fan_out: run (provider, params, query) calls as
+    tasks, each under its own deadline, and return their offers in order;
+    Kiwi calls run once the primary flight calls have all returned empty.
+    """
+    async def timed(provider, params, query):
+        hit = _cached_result(provider.search, params)
+        if hit is not None:
+            timings.append(_provider_outcome(provider.name, provider.kind, "cached", hit, None, 0.0, query))
+            return hit
+        host = PROVIDER_HOSTS[provider.name]
+        if not board.available(host):
+            timings.append(_provider_outcome(provider.name, provider.kind, "skipped", [], None, 0.0, query))
+            return []
+        if not ledger.allows(host, optional=(provider.name == "Kiwi")):
+            timings.append(_provider_outcome(provider.name, provider.kind, "quota", [], None, 0.0, query))
+            return []
+        deadline = PROVIDER_DEADLINES.get(provider.name, DEFAULT_PROVIDER_DEADLINE)
+        started = time.perf_counter()
+        results, error, status = [], None, "ok"
         try:
-            kiwi_flights = get_kiwi_deals(params) or []
-            all_flights.extend(kiwi_flights)
-            print(f"[INFO] Kiwi: {len(kiwi_flights)} options")
+            results = await asyncio.wait_for(provider.search(params), deadline) or []
+        except asyncio.TimeoutError:
+            status = "timeout"
         except Exception as e:
-            print(f"[ERROR] Kiwi provider failed: {e}")
-    
-    # Remove duplicates and sort by price
-    unique_flights = []
-    seen_prices = set()
-    for flight in sorted(all_flights, key=lambda x: x.get("price", 0)):
-        price_key = f"{flight.get('carrier', '')}-{flight.get('price', 0)}-{flight.get('departure', '')}"
-        if price_key not in seen_prices:
-            unique_flights.append(flight)
-            seen_prices.add(price_key)
-    
-    print(f"[INFO] Total unique flights found: {len(unique_flights)}")
+            error, status = e, "error"
+        seconds = float(deadline) if status == "timeout" else time.perf_counter() - started
+        timings.append(_provider_outcome(provider.name, provider.kind, status, results, error, seconds, query))
+        return results
 
-    # --- HOTELS ---
-    ### Multi-provider hotel search
-    print("[INFO] Fetching hotel data from multiple providers...")
-    all_hotels = []
-    
-    # Try Booking.com first (often has competitive rates)
-    try:
-        booking_hotels = search_booking_hotels(params) or []
-        all_hotels.extend(booking_hotels)
-        print(f"[INFO] Booking.com: {len(booking_hotels)} options")
-    except Exception as e:
-        print(f"[ERROR] Booking.com failed: {e}")
-    
-    # Try Amadeus Hotels
+    primary = [i for i, (p, _, _) in enumerate(calls) if p.name not in FALLBACK_PROVIDERS]
+    fallback = [i for i, (p, _, _) in enumerate(calls) if p.name in FALLBACK_PROVIDERS]
+    results = [None] * len(calls)
+
+    async def flights():
+        indexes = [i for i in primary if calls[i][0].kind == "flights"]
+        for i, found in zip(indexes, await asyncio.gather(*(timed(*calls[i]) for i in indexes))):
+            results[i] = found
+        if fallback and not any(results[i] for i in indexes):
+            print("[WARN] No primary flight results, trying Kiwi...")
+            for i, found in zip(fallback, await asyncio.gather(*(timed(*calls[i]) for i in fallback))):
+                results[i] = found
+
+    async def hotels():
+        indexes = [i for i in primary if calls[i][0].kind != "flights"]
+        for i, found in zip(indexes, await asyncio.gather(*(timed(*calls[i]) for i in indexes))):
+            results[i] = found
+
+    board, ledger = breakers.get_board(), quota.get_ledger()
+    await asyncio.gather(flights(), hotels())
+    return results
+
+def _sibling(name):
+    """Import an agent module lazily, as the imports above resolved (top-level, or under agent.)."""
+    package = planner.__name__.rpartition(".")[0]
+    return importlib.import_module(f"{package}.{name}" if package else name)
+
+def _async_providers(client):
+    aio = _sibling("providers.aio")
+    return aio.flight_providers(client) + aio.hotel_providers(client) + [aio.Kiwi(client)]
+
+async def fetch_offers_async(params, client, report=None):
+    """
+    Asyncio counterpart of fetch_offers, driven by the providers in providers.aio.
+
+    Every provider runs as a task on `client` under its own deadline; Kiwi runs
+    once the primary flight providers have all returned empty.
+    """
+    timings = []
+    started = time.perf_counter()
+    calls = [(provider, params, None) for provider in _async_providers(client)]
+    results = await _gather_calls(calls, timings)
+    all_flights, all_hotels = [], []
+    for (provider, _, _), found in zip(calls, results):
+        (all_flights if provider.kind == "flights" else all_hotels).extend(found or [])
+    elapsed = time.perf_counter() - started
+    if report is not None:
+        _fill_report(report, timings, elapsed)
+    return all_flights, all_hotels
+
+async def fetch_window_async(plan, client, report=None):
+    """Asyncio counterpart of fetch_window."""
+    timings = []
+    started = time.perf_counter()
+    keys, calls = [], []
+    for provider in _async_providers(client):
+        for key, params in plan.calls_for(provider.name):
+            keys.append(key)
+            calls.append((provider, params, plan.describe(key)))
+    found = await _gather_calls(calls, timings)
+    results = {key: offers for key, offers in zip(keys, found) if offers is not None}
+    elapsed = time.perf_counter() - started
+    if report is not None:
+        _fill_report(report, timings, elapsed)
+        _plan_report(report, plan, results)
+    return results
+
+def _select_stay(params, all_flights, all_hotels, report=None):
+    """Match a fixed-date request, incrementally when params["incremental"] is set."""
+    if params.get("incremental"):
+        return select_deals_incremental(params, all_flights, all_hotels, report)
+    return select_deals(params, all_flights, all_hotels, limit=params.get("topK"))
+
+def _select_window(params, plan, results, report=None):
+    return select_window_deals(plan, results, params.get("topK"), report)
+
+def _pareto_layers(params):
+    """Pareto layers requested by params["pareto"] (true means 1); 0 when off."""
+    layers = params.get("pareto")
+    return int(layers) if layers else 0
+
+def _select_pareto(params, deals):
+    """Keep params["pareto"] Pareto layers of `deals` (see pareto.py), then the first topK."""
+    deals = list(deals)
+    selected = pareto.select(deals, _pareto_layers(params), params.get("paretoPerLayer"))
+    print(f"[INFO] Pareto: {len(selected)} of {len(deals)} deals kept on up to {_pareto_layers(params)} layer(s)")
+    return selected[:params.get("topK")]
+
+def evaluate_deals(params, report=None):
+    """
+    Search and match one request; params["topK"] keeps only the K cheapest deals.
+    params["pareto"] keeps only the non-dominated deals (on price, stars, stops and
+    flight duration) of that many layers, params["paretoPerLayer"] the cheapest N of each.
+    """
+    if _pareto_layers(params):
+        return _select_pareto(params, evaluate_deals({**params, "pareto": None, "topK": None}, report))
+    if planner.is_flexible(params):
+        plan = plan_window(params)
+        return _select_window(params, plan, fetch_window(plan, report), report)
+    all_flights, all_hotels = fetch_offers(params, report)
+    return _select_stay(params, all_flights, all_hotels, report)
+
+def stream_deals(params, report=None):
+    """
+    Generator form of evaluate_deals: deals are yielded one at a time, cheapest
+    per person first, and never collected into a list. The provider calls finish
+    before the first deal; matching then runs only as far as the caller reads.
+    Pareto mode has to see every deal first, so it collects them before yielding.
+    """
+    if _pareto_layers(params):
+        yield from _select_pareto(params, stream_deals({**params, "pareto": None, "topK": None}, report))
+        return
+    limit = params.get("topK")
+    if planner.is_flexible(params):
+        plan = plan_window(params)
+        yield from iter_window_deals(plan, fetch_window(plan, report), limit, report)
+    else:
+        all_flights, all_hotels = fetch_offers(params, report)
+        if params.get("incremental"):
+            # Matched in full first, so the snapshot is saved before the first deal is yielded
+            yield from select_deals_incremental(params, all_flights, all_hotels, report)
+        else:
+            yield from iter_deals(params, all_flights, all_hotels, limit=limit)
+
+async def evaluate_deals_async(params, report=None, client=None):
+    """
+    Async evaluate_deals. Pass a shared client from providers.aio.make_client()
+    to run many queries concurrently on one event loop, e.g.
+
+        async with aio.make_client() as client:
+            await asyncio.gather(*(evaluate_deals_async(p, client=client) for p in queries))
+    """
+    if client is None:
+        async with _sibling("providers.aio").make_client() as own_client:
+            return await evaluate_deals_async(params, report, own_client)
+    if _pareto_layers(params):
+        return _select_pareto(params, await evaluate_deals_async({**params, "pareto": None, "topK": None},
+                                                                 report, client))
+    if planner.is_flexible(params):
+        plan = plan_window(params)
+        return _select_window(params, plan, await fetch_window_async(plan, client, report), report)
+    all_flights, all_hotels = await fetch_offers_async(params, client, report)
+    return _select_stay(params, all_flights, all_hotels, report)
+
+def _match_plan(params, plan, results, report=None):
+    """evaluate_deals' matching step for a QueryPlan whose calls have run."""
+    if _pareto_layers(params):
+        return _select_pareto(params, _match_plan({**params, "pareto": None, "topK": None}, plan, results, report))
+    if planner.is_flexible(params):
+        return _select_window(params, plan, results, report)
+    kinds = {name: kind for kind, name, _ in _providers()}
+    all_flights, all_hotels = [], []
+    for key in plan.stay_calls[plan.stays[0]]:
+        (all_flights if kinds[key[0]] == "flights" else all_hotels).extend(results.get(key) or [])
+    return _select_stay(params, all_flights, all_hotels, report)
+
+def evaluate_batch(configs, report=None):
+    """
+    Search and match many configs with one set of provider calls. Each config's
+    QueryPlan keys its calls on the fields the provider's results depend on, so
+    configs that differ only in board, budget or star filters share every call,
+    and configs for the same route and dates share most of them. The union of
+    the calls runs once, concurrently, and each config is then matched against
+    its own calls' offers as evaluate_deals would.
+
+    `configs` are (name, params) pairs, as from load_configs. Returns {name: deals};
+    a config that can't be planned is reported and left out. Each config's own
+    report (e.g. its incremental "changes") goes under report["configs"][name].
+    """
+    plans = {}
+    for name, params in configs:
+        try:
+            plans[name] = plan_window(params)
+        except (KeyError, ValueError) as e:
+            print(f"[ERROR] Skipping config {name}: {e}")
+
+    planned, owners = {}, {}
+    for plan in plans.values():
+        for key, query in plan.calls.items():
+            planned.setdefault(key, query)
+            owners.setdefault(key, plan)
+    separate = sum(1 for plan in plans.values() for key in plan.calls if key[0] not in FALLBACK_PROVIDERS)
+    print(f"[INFO] Batch of {len(plans)} configs: {len(planned)} distinct provider calls...")
+    started = time.perf_counter()
+    results, timings = _fetch_planned(planned, lambda key: owners[key].describe(key))
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Provider fan-out finished in {elapsed:.1f}s")
+    if report is not None:
+        _fill_report(report, timings, elapsed)
+        report["plan"] = {
+            "configs": len(plans),
+            "stays": sum(len(plan.stays) for plan in plans.values()),
+            "calls": sum(1 for key in planned if key[0] not in FALLBACK_PROVIDERS or key in results),
+            "naiveCalls": separate,
+        }
+    config_reports = {name: {} for name in plans}
+    if report is not None:
+        report["configs"] = config_reports
+    return {name: _match_plan(plan.params, plan, results, config_reports[name]) for name, plan in plans.items()}
+
+def save_batch_results(batch, report, output_dir="results", queried_at=None):
+    """save_results for each config of a batch, under output_dir/<name>, with the shared and its own report."""
+    shared = {key: value for key, value in report.items() if key != "configs"}
+    for name, deals in batch.items():
+        save_results({"deals": deals, "count": len(deals), "queriedAt": queried_at, "config": name,
+                      "report": {**shared, **report.get("configs", {}).get(name, {})}},
+                     output_dir=os.path.join(output_dir, name))
+
+def _departs_on(flight, start):
+    """False only for a flight known to leave on another day than `start`."""
+    departure = flight.departure
+    return not isinstance(departure, datetime) or departure.date().isoformat() == start
+
+def _stay_deals(plan, stay, results, kinds, transfers, limit, changes=None):
+    """
+    The deals of one stay in a QueryPlan, cheapest per person first. When the
+    plan is incremental the stay is matched against its own snapshot, and its
+    change summary goes to changes[label].
+    """
+    origin, start, nights = stay
+    flights, hotels = [], []
+    for key in plan.stay_calls[stay]:
+        offers = results.get(key) or []
+        if kinds[key[0]] == "flights":
+            flights.extend(f for f in map(as_flight, offers) if _departs_on(f, start))
+        else:
+            hotels.extend(offers)
+
+    params = plan.stay_params(stay)
+    transfer = transfers.get(origin.upper(), 0)
+    if transfer:
+        params["budgetPerPerson"] = params["budgetPerPerson"] - transfer
+    print(f"[INFO] Matching {origin} on {start} for {nights} nights")
+    if params.get("incremental"):
+        path = incremental.stay_path(params.get("snapshotPath") or incremental.DEFAULT_PATH, origin, start, nights)
+        run = incremental.Run(params, incremental.load(path))
+        deals = list(iter_deals(params, flights, hotels, limit=limit, run=run))
+        incremental.save(path, run.snapshot())
+        if changes is not None:
+            changes[f"{origin} {start}/{nights}n"] = run.changes
+    else:
+        deals = iter_deals(params, flights, hotels, limit=limit)
+    for deal in deals:
+        if transfer:
+            deal["groundTransfer"] = transfer
+            deal["perPerson"] = round(deal["perPerson"] + transfer, 2)
+            deal["total"] = round(deal["total"] + transfer * params["adults"], 2)
+        deal["origin"], deal["startDate"], deal["nights"] = origin, start, nights
+        yield deal
+
+def iter_window_deals(plan, results, limit=None, report=None):
+    """
+    Match each stay in a QueryPlan against the offers of its own calls and
+    yield the deals of the whole window, cheapest per person first (the party
+    size is fixed, so this is also total price order). Each deal records its
+    origin, startDate and nights. Flights from calls that don't pin the date
+    (Kiwi) are kept for a stay only if they depart on its startDate.
+
+    params["groundTransfer"] maps an origin airport to the cost, per person, of
+    getting there; it counts towards the budget and is included in the deal's
+    perPerson and total.
+
+    The stays' deal streams are merged lazily, so at most `limit` deals are
+    built in total. With params["incremental"] each stay is matched against its
+    own snapshot (see incremental.py) before the first deal is yielded, and the
+    combined change summary goes to report["changes"].
+    """
+    kinds = {name: kind for kind, name, _ in _providers()}
+    transfers = {code.upper(): cost for code, cost in (plan.params.get("groundTransfer") or {}).items()}
+    if plan.params.get("incremental"):
+        changes = {}
+        streams = [list(_stay_deals(plan, stay, results, kinds, transfers, limit, changes)) for stay in plan.stays]
+        summary = incremental.combine(changes)
+        print(f"[INFO] Changes since the last run: {incremental.describe(summary)}")
+        if report is not None:
+            report["changes"] = summary
+    else:
+        streams = [_stay_deals(plan, stay, results, kinds, transfers, limit) for stay in plan.stays]
+    yield from islice(heapq.merge(*streams, key=lambda deal: deal["perPerson"]), limit)
+
+def select_window_deals(plan, results, limit=None, report=None):
+    """iter_window_deals as a list."""
+    deals = list(iter_window_deals(plan, results, limit, report))
+    print(f"[INFO] {len(deals)} matching deals across {len(plan.stays)} origin/date/night combinations.")
+    return deals
+
+def _matcher(engine):
+    """The numpy matcher module when `engine` asks for it and NumPy is installed, else None."""
+    if (engine or MATCH_ENGINE) != "numpy":
+        return None
     try:
-        amadeus_hotels = get_amadeus_hotels(params) or []
-        all_hotels.extend(amadeus_hotels)
-        print(f"[INFO] Amadeus Hotels: {len(amadeus_hotels)} options")
-    except Exception as e:
-        print(f"[ERROR] Amadeus Hotels failed: {e}")
+        return _sibling("matching_numpy")
+    except ImportError:
+        print("[WARN] NumPy is not installed, using the pure-Python matcher")
+        return None
+
+def iter_deals(params, all_flights, all_hotels, limit=None, engine=None, run=None):
+    """
+    Dedupe provider offers, then match flights with hotels under budget.
+    Offers are FlightOffer/HotelOffer records (plain offer dicts are converted);
+    deals are yielded as JSON-ready dicts, cheapest per person first, at most
+    `limit` of them when set. Pairs are only matched as the deals are read, so
+    memory grows with the offers read, not with flights x hotels.
+    `engine` ("python" or "numpy") overrides MATCH_ENGINE; both give the same deals.
+    `run` (an incremental.Run) reuses the previous run's pairs; it implies the Python engine.
+    """
+    # Keep the cheapest offer per physical flight (normalisers set the itinerary
+    # key, see providers/itinerary.py); offers without one only lose exact
+    # repeats. Unpriced offers can't be matched.
+    cheapest = {}
+    for flight in map(as_flight, all_flights):
+        if flight.price_minor is None:
+            continue
+        flight_key = flight.itinerary or (flight.carrier, flight.price_minor, flight.departure)
+        kept = cheapest.get(flight_key)
+        if kept is None or flight.price_minor < kept.price_minor:
+            cheapest[flight_key] = flight
+    unique_flights = sorted(cheapest.values(), key=lambda f: f.price_minor)
     
-    # Remove duplicates and sort by price
+    print(f"[INFO] Total unique flights found: {len(unique_flights)}")
+
+    # Resolve offers for the same property across providers and keep the
+    # cheapest per property and board (see hotel_identity.py)
     unique_hotels = []
     seen_hotel_keys = set()
-    for hotel in sorted(all_hotels, key=lambda x: x.get("price", 0)):
-        hotel_key = f"{hotel.get('name', '')}-{hotel.get('stars', 0)}-{hotel.get('board', '')}"
+    hotels = sorted((h for h in map(as_hotel, all_hotels) if h.price_minor is not None), key=lambda h: h.price_minor)
+    resolver = HotelResolver(get_aliases())
+    resolver.preload(hotels)
+    for hotel in hotels:
+        hotel_key = (resolver.resolve(hotel), parse_board(hotel.board) or hotel.board.lower())
         if hotel_key not in seen_hotel_keys:
             unique_hotels.append(hotel)
             seen_hotel_keys.add(hotel_key)
+    resolver.save()
     
-    print(f"[INFO] Total unique hotels found: {len(unique_hotels)}")
+    print(f"[INFO] Total unique hotels found: {len(unique_hotels)} "
+          f"({resolver.stats['properties']} properties, {resolver.stats['aliased']} offers from the alias table)")
 
     # --- MATCH & FILTER ---
-    results = []
-    for flight in unique_flights:
-        for hotel in unique_hotels:
-            if hotel["stars"] >= params["minStars"] and params["board"].lower() in hotel["board"].lower():
-                total = float(flight["price"]) + float(hotel["price"])
-                per_person = total / params["adults"]
-                if per_person <= params["budgetPerPerson"]:
-                    results.append({
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "perPerson": round(per_person, 2),
-                        "total": round(total, 2),
-                        "flight": flight,
-                        "hotel": hotel
-                    })
-
-    sorted_results = sorted(results, key=lambda x: x["perPerson"])
+    adults = params["adults"]
+    budget = params["budgetPerPerson"]
+    vectorized = None if run is not None else _matcher(engine)
+    if vectorized:
+        matches = vectorized.match(unique_flights, unique_hotels, params, limit)
+    else:
+        # Star, board and stop filters don't depend on the pairing, so apply them once
+        hotel_index = AttributeIndex(unique_hotels, stars=lambda h: h.stars, board=lambda h: h.board,
+                                     price=lambda h: h.price_minor)
+        eligible_hotels = hotel_index.query(min_stars=params["minStars"], board=params["board"])
+        max_stops = params.get("maxStops")
+        eligible_flights = [f for f in unique_flights if max_stops is None or f.stops is None or f.stops <= max_stops]
+        # Sorted by price, so pairs come out cheapest per person first and
+        # each flight stops at its first hotel over budget (see matching.py)
+        if run is not None:
+            matches = run.matches(eligible_flights, eligible_hotels, adults, budget)
+        else:
+            matches = iter_matches(eligible_flights, eligible_hotels, adults, budget)
+        matches = islice(matches, limit)
+
+    timestamp = datetime.utcnow().isoformat()
+    as_json = {}  # id(record) -> dict, so an offer in many deals is serialised once
+
+    def to_json(offer):
+        out = as_json.get(id(offer))
+        if out is None:
+            out = as_json[id(offer)] = offer.to_dict()
+        return out
+
+    for per_person, flight, hotel, total in matches:
+        yield {
+            "timestamp": timestamp,
+            "perPerson": round(per_person, 2),
+            "total": round(total / MINOR_UNITS, 2),
+            "flight": to_json(flight),
+            "hotel": to_json(hotel)
+        }
+
+def select_deals(params, all_flights, all_hotels, limit=None, engine=None):
+    """iter_deals as a list."""
+    sorted_results = list(iter_deals(params, all_flights, all_hotels, limit, engine))
     print(f"[INFO] {len(sorted_results)} matching deals found.")
     return sorted_results
 
+def select_deals_incremental(params, all_flights, all_hotels, report=None):
+    """
+    select_deals against the snapshot of the previous run at params["snapshotPath"]
+    (see incremental.py), which is then replaced by this run's. The change summary
+    goes to report["changes"].
+    """
+    path = params.get("snapshotPath") or incremental.DEFAULT_PATH
+    run = incremental.Run(params, incremental.load(path))
+    deals = list(iter_deals(params, all_flights, all_hotels, params.get("topK"), run=run))
+    incremental.save(path, run.snapshot())
+    print(f"[INFO] {len(deals)} matching deals found.")
+    print(f"[INFO] Changes since the last run: {incremental.describe(run.changes)}")
+    if report is not None:
+        report["changes"] = run.changes
+    return deals
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", default="config/request.json", help="Path to config JSON")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the provider result cache")
+    parser.add_argument("--max-age", type=int, default=None,
+                        help="Accept cached provider results up to this many seconds old (overrides per-provider TTLs)")
+    parser.add_argument("--engine", choices=("python", "numpy"), default=None,
+                        help="Package matcher (default: MATCH_ENGINE or python)")
+    parser.add_argument("--top", type=int, default=None, help="Keep only the K cheapest deals (config topK)")
+    parser.add_argument("--pareto", type=int, nargs="?", const=1, default=None, metavar="LAYERS",
+                        help="Keep only non-dominated deals, on this many Pareto layers (config pareto)")
+    parser.add_argument("--pareto-top", type=int, default=None, metavar="N",
+                        help="Keep the cheapest N deals of each Pareto layer (config paretoPerLayer)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-match only offers that are new or repriced since the last run's snapshot")
+    parser.add_argument("--batch", default=None, metavar="PATH",
+                        help="Run every config in a directory of JSON files or a JSONL file with shared provider calls")
+    parser.add_argument("--output-dir", default="results",
+                        help="Results directory (batch runs write one subdirectory per config)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write deals to the results file as they are matched instead of collecting them first")
     args = parser.parse_args()
 
-    if not os.path.exists(args.config):
-        print(f"[ERROR] Config file not found at {args.config}")
+    if args.engine:
+        MATCH_ENGINE = args.engine
+    if args.no_cache:
+        cache.configure(enabled=False)
+    if args.max_age is not None:
+        cache.configure(max_age=args.max_age)
+
+    def apply_overrides(config, output_dir=args.output_dir):
+        if args.incremental:
+            config["incremental"] = True
+            config.setdefault("snapshotPath", os.path.join(output_dir, "snapshot.json"))
+        if args.top is not None:
+            config["topK"] = args.top
+        if args.pareto is not None:
+            config["pareto"] = args.pareto
+        if args.pareto_top is not None:
+            config["paretoPerLayer"] = args.pareto_top
+        return config
+
+    config_path = args.batch or args.config
+    if not os.path.exists(config_path):
+        print(f"[ERROR] Config file not found at {config_path}")
         exit(1)
 
-    config = load_config(args.config)
     try:
-        deals = evaluate_deals(config)
-        output = {"deals": deals, "count": len(deals), "queriedAt": datetime.utcnow().isoformat()}
-        save_results(output)
+        report = {}
+        cache.purge_expired()
+        if args.batch:
+            configs = [(name, apply_overrides(config, os.path.join(args.output_dir, name)))
+                       for name, config in load_configs(args.batch)]
+            queried_at = datetime.utcnow().isoformat()
+            batch = evaluate_batch(configs, report=report)
+            print_report(report)
+            save_batch_results(batch, report, args.output_dir, queried_at)
+        elif args.stream:
+            config = apply_overrides(load_config(args.config))
+            save_results_stream(stream_deals(config, report=report), output_dir=args.output_dir,
+                                queriedAt=datetime.utcnow().isoformat(), report=lambda: report)
+            print_report(report)
+        else:
+            config = apply_overrides(load_config(args.config))
+            deals = evaluate_deals(config, report=report)
+            print_report(report)
+            output = {"deals": deals, "count": len(deals), "queriedAt": datetime.utcnow().isoformat(),
+                      "report": report}
+            save_results(output, output_dir=args.output_dir)
     except Exception as e:
         print(f"[ERROR] Agent failed: {e}")
         exit(1)